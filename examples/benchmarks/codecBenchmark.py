@@ -0,0 +1,34 @@
+#!/usr/bin/python
+#Compares the JSON codecs vra7_rest_wrapper can use on realistic resource and request payloads.
+#Install orjson and/or ujson to include them.
+from __future__ import print_function
+
+import json
+import timeit
+
+from payloads import request, resourcePage
+from vra7_rest_wrapper import codec
+
+documents = {
+    'resource page (100)': resourcePage(100),
+    'resource page (1000)': resourcePage(1000),
+    'request': request(1),
+}
+
+print('{0:<22}{1:<8}{2:>14}{3:>14}'.format('payload', 'codec', 'decode ms', 'encode ms'))
+
+for label, document in documents.items():
+    body = json.dumps(document).encode('utf-8')
+    number = max(1, int(2000000 / len(body)))
+
+    #What requests does for r.json(): bytes -> str -> json.loads
+    baseline = timeit.timeit(lambda: json.loads(body.decode('utf-8')), number=number) / number
+    print('{0:<22}{1:<8}{2:>14.3f}{3:>14}'.format(label, 'r.json', baseline * 1000, '-'))
+
+    for name in sorted(codec.CODECS):
+        codec.setCodec(name)
+        decode = timeit.timeit(lambda: codec.decode(body), number=number) / number
+        encode = timeit.timeit(lambda: codec.encode(document), number=number) / number
+        print('{0:<22}{1:<8}{2:>14.3f}{3:>14.3f}'.format(label, name, decode * 1000, encode * 1000))
+
+codec.setCodec()
@@ -0,0 +1,38 @@
+#!/usr/bin/python
+#Shows the effect of transport.HedgingSession on tail latency against a local stub
+#where a few responses are very slow, like a busy appliance node.
+from __future__ import print_function
+
+import random
+import time
+
+from stubServer import StubServer
+from vra7_rest_wrapper.helpers import newSession
+from vra7_rest_wrapper.transport import HedgingSession
+
+random.seed(1)
+stub = StubServer(latency=lambda: 0.5 if random.random() < 0.03 else random.uniform(0.005, 0.015))
+headers = {'Accept': 'application/json', 'Authorization': 'Bearer stub-token'}
+
+
+def run(session, count=400):
+    latencies = []
+    for i in range(count):
+        url = stub.url('/catalog-service/api/consumer/requests/{0}'.format(i))
+        started = time.time()
+        session.get(url, headers=headers, verify=False).content
+        latencies.append(time.time() - started)
+    latencies.sort()
+    return [latencies[int(len(latencies) * p / 100.0)] * 1000 for p in (50, 90, 99)] + [sum(latencies)]
+
+
+print('{0:<12}{1:>10}{2:>10}{3:>10}{4:>10}{5:>10}'.format('session', 'p50 ms', 'p90 ms', 'p99 ms', 'total s', 'hedged'))
+
+p50, p90, p99, total = run(newSession())
+print('{0:<12}{1:>10.1f}{2:>10.1f}{3:>10.1f}{4:>10.2f}{5:>10}'.format('plain', p50, p90, p99, total, '-'))
+
+session = HedgingSession(newSession(), percentile=95)
+p50, p90, p99, total = run(session)
+print('{0:<12}{1:>10.1f}{2:>10.1f}{3:>10.1f}{4:>10.2f}{5:>10}'.format(
+    'hedged', p50, p90, p99, total, '{0}/{1}'.format(session.hedged, session.requests)))
+session.close()
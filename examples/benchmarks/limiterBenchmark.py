@@ -0,0 +1,37 @@
+#!/usr/bin/python
+#Compares fixed worker counts with limiter.AdaptiveLimiter against a local stub that
+#serves 8 GETs at a time at full speed, slows down beyond that and rejects with 503
+#beyond 16, like an appliance under load.
+from __future__ import print_function
+
+import time
+
+from stubServer import StubServer
+from vra7_rest_wrapper.helpers import mapConcurrently, newSession
+from vra7_rest_wrapper.limiter import AdaptiveLimiter
+
+stub = StubServer(latency=0.02, capacity=8)
+headers = {'Accept': 'application/json', 'Authorization': 'Bearer stub-token'}
+
+
+def run(session, maxWorkers, count=1000):
+    def getOne(i):
+        url = stub.url('/catalog-service/api/consumer/resources/{0}'.format(i))
+        return session.get(url, headers=headers, verify=False).status_code
+
+    stub.reset()
+    started = time.time()
+    statuses = mapConcurrently(getOne, range(count), maxWorkers=maxWorkers)
+    return time.time() - started, sum(1 for status in statuses if status != 200)
+
+
+print('{0:<20}{1:>10}{2:>10}{3:>12}'.format('concurrency', 'seconds', 'failed', 'final limit'))
+
+for workers in (2, 8, 32):
+    seconds, failed = run(newSession(poolSize=workers), workers)
+    print('{0:<20}{1:>10.2f}{2:>10}{3:>12}'.format('fixed {0}'.format(workers), seconds, failed, '-'))
+
+limiter = AdaptiveLimiter(initial=2, maxLimit=32)
+seconds, failed = run(newSession(limiter=limiter), limiter.maxLimit)
+print('{0:<20}{1:>10.2f}{2:>10}{3:>12}'.format('adaptive', seconds, failed, limiter.limit))
+print(limiter.metrics())
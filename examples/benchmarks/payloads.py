@@ -0,0 +1,92 @@
+#!/usr/bin/python
+#Realistic looking catalog-service documents for the benchmarks in this directory
+
+
+def resource(index):
+    """
+    A catalog resource with the kind of resourceData a vSphere machine carries.
+    """
+
+    entries = [
+        {'key': 'MachineName', 'value': {'type': 'string', 'value': 'vm-{index:05d}'.format(index=index)}},
+        {'key': 'MachineStatus', 'value': {'type': 'string', 'value': 'On'}},
+        {'key': 'ip_address', 'value': {'type': 'string', 'value': '10.0.{0}.{1}'.format(index // 250, index % 250)}},
+        {'key': 'MachineCPU', 'value': {'type': 'integer', 'value': 2}},
+        {'key': 'MachineMemory', 'value': {'type': 'integer', 'value': 4096}},
+        {'key': 'MachineStorage', 'value': {'type': 'integer', 'value': 60}},
+        {'key': 'MachineGuestOperatingSystem', 'value': {'type': 'string', 'value': 'CentOS 7 (64-bit)'}},
+        {'key': 'Expire', 'value': {'type': 'boolean', 'value': False}},
+        {'key': 'NETWORK_LIST', 'value': {'type': 'multiple', 'elementTypeId': 'COMPLEX', 'items': [{
+            'type': 'complex', 'componentTypeId': 'com.vmware.csp.component.iaas.proxy.provider',
+            'classId': 'dynamicops.api.model.NetworkViewModel', 'typeFilter': None,
+            'values': {'entries': [
+                {'key': 'NETWORK_ADDRESS', 'value': {'type': 'string', 'value': '10.0.0.{0}'.format(index % 250)}},
+                {'key': 'NETWORK_MAC_ADDRESS', 'value': {'type': 'string', 'value': '00:50:56:aa:bb:{0:02x}'.format(index % 256)}},
+                {'key': 'NETWORK_NAME', 'value': {'type': 'string', 'value': 'dvPortGroup-Prod'}},
+            ]}
+        }]}},
+    ]
+    for disk in range(4):
+        entries.append({'key': 'DISK_VOLUMES', 'value': {'type': 'complex', 'values': {'entries': [
+            {'key': 'DISK_CAPACITY', 'value': {'type': 'integer', 'value': 20 * (disk + 1)}},
+            {'key': 'DISK_INPUT_ID', 'value': {'type': 'string', 'value': 'DISK_INPUT_ID{0}'.format(disk)}},
+        ]}}})
+
+    return {
+        '@type': 'CatalogResource',
+        'id': '{0:08x}-1b5b-44e8-ac20-b559da4c1ef3'.format(index),
+        'iconId': 'Infrastructure.CatalogItem.Machine.Virtual.vSphere',
+        'resourceTypeRef': {'id': 'Infrastructure.Virtual', 'label': 'Virtual Machine'},
+        'name': 'vm-{index:05d}'.format(index=index),
+        'description': u'Benchmark machine é',
+        'status': 'ACTIVE',
+        'catalogItem': {'id': 'a2b7c3f1-9a0e-4c55-8a3d-0b5cc7f1e2d4', 'label': 'CentOS 7'},
+        'requestId': 'ee1c3a67-3d4e-4f2a-9a85-0d5c9bfa1{0:03d}'.format(index % 1000),
+        'providerBinding': {'bindingId': '{0}'.format(index), 'providerRef': {'id': 'p', 'label': 'Infrastructure Service'}},
+        'owners': [{'tenantName': 'vsphere.local', 'ref': 'user@vsphere.local', 'type': 'USER', 'value': 'User'}],
+        'organization': {'tenantRef': 'vsphere.local', 'tenantLabel': 'vsphere.local',
+                         'subtenantRef': 'b8b3c1a0-6a3e-4a8f-bd3a-7a3c9f5e0d21', 'subtenantLabel': 'Development'},
+        'dateCreated': '2017-06-13T09:40:45.231Z',
+        'lastUpdated': '2017-06-14T11:02:13.518Z',
+        'hasLease': True,
+        'lease': {'start': '2017-06-13T09:38:06.000Z', 'end': '2017-07-13T09:38:06.000Z'},
+        'leaseForDisplay': None,
+        'hasCosts': True,
+        'totalCost': {'type': 'moneyTimeRate', 'cost': {'type': 'money', 'currencyCode': 'USD', 'amount': 12.5}},
+        'resourceData': {'entries': entries},
+    }
+
+
+def resourcePage(count, page=1):
+    """
+    A page of catalog resources as returned by consumer/resources.
+    """
+
+    return {
+        'links': [],
+        'content': [resource(index) for index in range((page - 1) * count, page * count)],
+        'metadata': {'size': count, 'totalElements': count, 'totalPages': 1, 'number': page, 'offset': 0},
+    }
+
+
+def request(index):
+    """
+    A catalog item request as returned by consumer/requests.
+    """
+
+    return {
+        '@type': 'CatalogItemRequest',
+        'id': 'ee1c3a67-3d4e-4f2a-9a85-0d5c9bfa{0:04d}'.format(index),
+        'requestNumber': index,
+        'state': 'SUCCESSFUL',
+        'requestedItemName': 'CentOS 7',
+        'requestedFor': 'user@vsphere.local',
+        'requestedBy': 'user@vsphere.local',
+        'dateSubmitted': '2017-06-13T09:38:06.000Z',
+        'lastUpdated': '2017-06-13T09:40:45.231Z',
+        'requestData': {'entries': [
+            {'key': 'provider-VirtualMachine.CPU.Count', 'value': {'type': 'integer', 'value': 2}},
+            {'key': 'provider-VirtualMachine.Memory.Size', 'value': {'type': 'integer', 'value': 4096}},
+            {'key': 'provider-__Notes', 'value': {'type': 'string', 'value': 'benchmark'}},
+        ]},
+    }
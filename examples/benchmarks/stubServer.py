@@ -0,0 +1,144 @@
+#!/usr/bin/python
+#A local stand-in for a vRA appliance used by the benchmarks in this directory.
+#It speaks plain http on 127.0.0.1, so point sessions at stub.url(...) rather than
+#at a client, which always uses https.
+from __future__ import print_function
+
+import gzip
+import json
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+from payloads import request, resource, resourcePage
+
+
+def _index(id):
+    # Numeric ids map to the payload with that index, so callers can check what they got back
+    return int(id) % 10000 if id.isdigit() else sum(map(ord, id)) % 10000
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, without this every response waits for a delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, document, headers=None):
+        body = json.dumps(document).encode('utf-8') if document is not None else b''
+        encoding = self.headers.get('Accept-Encoding', '')
+        extra = dict(headers or {})
+        if body and 'gzip' in encoding:
+            body = gzip.compress(body)
+            extra['Content-Encoding'] = 'gzip'
+        elif body and 'deflate' in encoding:
+            body = zlib.compress(body)
+            extra['Content-Encoding'] = 'deflate'
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in extra.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.record(len(body))
+
+    def do_GET(self):
+        if not self.server.enter():
+            return self._send(503, {'errors': [{'code': 503, 'message': 'Service unavailable'}]})
+        try:
+            time.sleep(self.server.delay())
+        finally:
+            self.server.leave()
+        path = self.path.split('?')[0]
+        parts = path.rstrip('/').split('/')
+
+        if path.endswith('/consumer/resources'):
+            return self._send(200, resourcePage(self.server.pageSize))
+        if '/consumer/resources/' in path:
+            return self._send(200, resource(_index(parts[-1])))
+        if '/consumer/requests/' in path:
+            return self._send(200, request(_index(parts[-1])))
+        self._send(404, {'errors': [{'code': 404, 'message': 'Not found'}]})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        self.rfile.read(length)
+        time.sleep(self.server.delay())
+
+        if self.path.endswith('/identity/api/tokens'):
+            with self.server.lock:
+                self.server.authentications += 1
+                number = self.server.authentications
+            return self._send(200, {'id': 'stub-token-{0}'.format(number), 'expires': '2099-01-01T00:00:00.000Z'})
+        with self.server.lock:
+            self.server.submitted += 1
+            number = self.server.submitted
+        self._send(201, None, {'Location': 'https://stub/catalog-service/api/consumer/requests/{0:08d}'.format(number)})
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, latency=0.0, pageSize=100, capacity=None):
+        """
+        Starts a stub appliance on a free localhost port in a background thread.
+        Parameters:
+            latency = seconds every response is delayed by, or a callable returning them
+            pageSize = number of resources returned by consumer/resources
+            capacity = GETs served at full speed at the same time. beyond that GETs slow down
+                       with the square of the overload and beyond twice that they fail with 503
+        """
+
+        HTTPServer.__init__(self, ('127.0.0.1', 0), _Handler)
+        self.latency = latency
+        self.pageSize = pageSize
+        self.capacity = capacity
+        self.inFlight = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+        self.submitted = 0
+        self.authentications = 0
+        self.responses = 0
+        self.bytesSent = 0
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def enter(self):
+        with self.lock:
+            if self.capacity is not None and self.inFlight >= 2 * self.capacity:
+                self.rejected += 1
+                return False
+            self.inFlight += 1
+            return True
+
+    def leave(self):
+        with self.lock:
+            self.inFlight -= 1
+
+    def delay(self):
+        latency = self.latency() if callable(self.latency) else self.latency
+        if self.capacity is not None:
+            latency *= max(1.0, float(self.inFlight) / self.capacity) ** 2
+        return latency
+
+    def record(self, size):
+        with self.lock:
+            self.responses += 1
+            self.bytesSent += size
+
+    def reset(self):
+        with self.lock:
+            self.responses = 0
+            self.bytesSent = 0
+            self.rejected = 0
+
+    def url(self, path):
+        return 'http://127.0.0.1:{port}{path}'.format(port=self.server_address[1], path=path)
@@ -0,0 +1,108 @@
+#!/usr/bin/python
+#Hammers one shared ConsumerClient from many threads against a local stub and checks
+#that every call got its own response back, that concurrent first use and concurrent
+#refreshes of the token authenticate once, and compares with a client per thread.
+from __future__ import print_function
+
+import re
+import sys
+import threading
+import time
+
+from stubServer import StubServer
+from vra7_rest_wrapper.catalog import ConsumerClient
+from vra7_rest_wrapper.helpers import newSession
+
+THREADS = 64
+CALLS = 100
+
+stub = StubServer(latency=0.002)
+
+
+class StubSession(object):
+    def __init__(self, session):
+        """
+        Sends the https requests of a client to the plain http stub.
+        """
+
+        self.session = session
+
+    def request(self, method, url, **kwargs):
+        return self.session.request(method, re.sub(r'^https://[^/]+', stub.url(''), url), **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+
+def hammer(getClient):
+    errors = []
+    mismatches = []
+    start = threading.Event()
+
+    def work(worker):
+        try:
+            client = getClient()
+            start.wait()
+            token = client.token
+            for call in range(CALLS):
+                index = worker * CALLS + call
+                if call == CALLS // 2:
+                    # Every thread sees its token rejected at the same time
+                    client.tokenManager.refresh(stale=token)
+                if call % 2:
+                    resource = client.getResource(str(index))
+                    if resource['name'] != 'vm-{0:05d}'.format(index % 10000):
+                        mismatches.append((index, resource['name']))
+                else:
+                    request = client.getRequest(str(index), show='json')
+                    if request['requestNumber'] != index % 10000:
+                        mismatches.append((index, request['requestNumber']))
+        except Exception as e:
+            errors.append(e)
+
+    stub.authentications = 0
+    started = time.time()
+    threads = [threading.Thread(target=work, args=(worker,)) for worker in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    start.set()
+    for thread in threads:
+        thread.join()
+
+    return time.time() - started, errors, mismatches
+
+
+def report(label, result):
+    seconds, errors, mismatches = result
+    print('{0:<24}{1:>10.2f}{2:>10.0f}{3:>8}{4:>12}{5:>18}'.format(
+        label, seconds, THREADS * CALLS / seconds, len(errors), len(mismatches), stub.authentications))
+    for error in errors[:3]:
+        print('  ', repr(error))
+    for mismatch in mismatches[:3]:
+        print('   asked for {0}, got {1}'.format(*mismatch))
+    return not errors and not mismatches
+
+
+print('{0} threads x {1} calls'.format(THREADS, CALLS))
+print('{0:<24}{1:>10}{2:>10}{3:>8}{4:>12}{5:>18}'.format(
+    'clients', 'seconds', 'calls/s', 'errors', 'mismatches', 'authentications'))
+
+perThread = hammer(lambda: ConsumerClient('stub', 'user', 'password', session=StubSession(newSession())))
+ok = report('client per thread', perThread)
+
+shared = ConsumerClient('stub', 'user', 'password', session=StubSession(newSession(poolSize=THREADS)))
+# Start without a token so the threads race for the first authentication as well
+shared.token = ''
+result = hammer(lambda: shared)
+ok = report('one shared client', result) and ok
+if stub.authentications != 2:
+    print('expected 2 authentications for the shared client, one on first use and one refresh')
+    ok = False
+
+sys.exit(0 if ok else 1)
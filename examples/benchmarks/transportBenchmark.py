@@ -0,0 +1,50 @@
+#!/usr/bin/python
+#Compares bytes on the wire and latency of the transport options against a local stub.
+#HTTP/2 needs TLS (ALPN) so against the plain http stub httpx falls back to HTTP/1.1;
+#run the same comparison against a real appliance to see the multiplexing gain.
+from __future__ import print_function
+
+import time
+
+from stubServer import StubServer
+from vra7_rest_wrapper.helpers import mapConcurrently, newSession
+from vra7_rest_wrapper.codec import decodeResponse
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+stub = StubServer(latency=0.005, pageSize=200)
+headers = {'Accept': 'application/json', 'Authorization': 'Bearer stub-token'}
+
+transports = [
+    ('requests, identity', lambda: newSession(compression=False)),
+    ('requests, compressed', lambda: newSession(compression=True)),
+]
+if httpx is not None:
+    from vra7_rest_wrapper.transport import HttpxSession
+    transports.append(('httpx, compressed', lambda: HttpxSession(http2=False)))
+
+print('{0:<24}{1:>16}{2:>16}{3:>20}'.format('transport', 'list bytes', 'list ms', '200 small GETs ms'))
+
+for label, factory in transports:
+    session = factory()
+    listUrl = stub.url('/catalog-service/api/consumer/resources')
+
+    stub.reset()
+    started = time.time()
+    for i in range(20):
+        decodeResponse(session.get(listUrl, headers=headers, verify=False))
+    listTime = (time.time() - started) / 20
+    listBytes = stub.bytesSent / stub.responses
+
+    def getOne(i):
+        url = stub.url('/catalog-service/api/consumer/resources/{0}'.format(i))
+        return decodeResponse(session.get(url, headers=headers, verify=False))
+
+    started = time.time()
+    mapConcurrently(getOne, range(200), maxWorkers=16)
+    smallTime = time.time() - started
+
+    print('{0:<24}{1:>16.0f}{2:>16.2f}{3:>20.1f}'.format(label, listBytes, listTime * 1000, smallTime * 1000))
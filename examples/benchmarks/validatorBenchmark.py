@@ -0,0 +1,54 @@
+#!/usr/bin/python
+#Times PayloadValidator on a batch of request payloads against a form of bounded integer,
+#permitted value and mandatory string fields.
+from __future__ import print_function
+
+import timeit
+
+from vra7_rest_wrapper.validator import PayloadValidator
+
+
+def constant(type, value):
+    return {'type': 'constantClause', 'value': {'type': type, 'value': value}}
+
+
+def field(id, typeId, facets=(), values=None):
+    field = {'id': id, 'label': id, 'dataType': {'type': 'primitive', 'typeId': typeId},
+             'state': {'facets': [{'type': type, 'value': value} for type, value in facets]}}
+    if values is not None:
+        field['permissibleValues'] = {'type': 'static', 'customAllowed': False, 'values': [
+            {'underlyingValue': {'type': 'string', 'value': value}} for value in values]}
+    return field
+
+
+fields = []
+for i in range(10):
+    fields.append(field('Custom.Size{0}'.format(i), 'INTEGER',
+                        [('mandatory', constant('boolean', True)),
+                         ('minValue', constant('integer', 1)), ('maxValue', constant('integer', 64))]))
+    fields.append(field('Custom.Tier{0}'.format(i), 'STRING', values=['bronze', 'silver', 'gold']))
+    fields.append(field('Custom.Owner{0}'.format(i), 'STRING',
+                        [('mandatory', constant('boolean', True)), ('maxLength', constant('integer', 32))]))
+    fields.append(field('Custom.Note{0}'.format(i), 'STRING'))
+
+
+def payload(index):
+    entries = []
+    for i in range(10):
+        entries.append({'key': 'provider-Custom.Size{0}'.format(i), 'value': {'type': 'integer', 'value': 1 + index % 64}})
+        entries.append({'key': 'provider-Custom.Tier{0}'.format(i), 'value': {'type': 'string', 'value': 'gold'}})
+        entries.append({'key': 'provider-Custom.Owner{0}'.format(i), 'value': {'type': 'string', 'value': 'user{0}'.format(index)}})
+    # One payload in a hundred has a problem
+    if index % 100 == 0:
+        entries[0]['value']['value'] = 100
+    return {'requestData': {'entries': entries}}
+
+
+validator = PayloadValidator(fields)
+
+for count in (100, 1000, 10000):
+    payloads = [payload(index) for index in range(count)]
+    number = max(1, int(20000 / count))
+    batch = timeit.timeit(lambda: validator.validateMany(payloads), number=number) / number
+    single = timeit.timeit(lambda: [validator.validate(p) for p in payloads], number=number) / number
+    print('{0:>6} payloads  validateMany {1:8.2f} ms  validate each {2:8.2f} ms'.format(count, batch * 1000, single * 1000))
@@ -16,8 +16,8 @@ requestsJSONObject = client.getAllRequests(show='json')
 
 #Loop through object and print values
 for i in requestsJSONObject:
-    print i['id'], i['requestNumber'], i['requestedItemName'], i['state']
+    print(i['id'], i['requestNumber'], i['requestedItemName'], i['state'])
 
 #Use json.dumps() to get json string
 requestsJSONString = json.dumps(requestsJSONObject)
-print requestsJSONString
+print(requestsJSONString)
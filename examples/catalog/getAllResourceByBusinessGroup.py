@@ -19,9 +19,9 @@ resource = client.getResourceByBusinessGroup(name=business_group, limit='1000' )
 
 #Print id and name
 for item in resource['content']:
-    print item['id']
-    print item['name']
+    print(item['id'])
+    print(item['name'])
 
 #Use json.dumps() to get json strong
 resourceJSONString = json.dumps(resource, sort_keys=True, indent=4)
-print resourceJSONString
+print(resourceJSONString)
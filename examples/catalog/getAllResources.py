@@ -16,8 +16,8 @@ resourcesJSONObject = client.getAllResources(show='json')
 
 #Loop through object and print name
 for i in resourcesJSONObject:
-    print i['name']
+    print(i['name'])
 
 #Use json.dumps() to get json string
 resourcesJSONString = json.dumps(resourcesJSONObject)
-print resourcesJSONString
+print(resourcesJSONString)
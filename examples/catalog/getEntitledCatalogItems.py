@@ -17,9 +17,9 @@ entitledCatalogItems = client.getEntitledCatalogItems(show='json')
 #Loop through object and print id and name
 for i in entitledCatalogItems:
 
-	print i['catalogItem']['id']
-	print i['catalogItem']['name']
+	print(i['catalogItem']['id'])
+	print(i['catalogItem']['name'])
 
 #Use json.dumps() to get json string
 entitledCatalogItemsJSONString = json.dumps(entitledCatalogItems)
-print entitledCatalogItemsJSONString
+print(entitledCatalogItemsJSONString)
@@ -17,9 +17,9 @@ client.getResource(id=resourceId)
 resource = client.getResource(id=resourceId, show='json')
 
 #Print id and name
-print resource['id']
-print resource['name']
+print(resource['id'])
+print(resource['name'])
 
 #Use json.dumps() to get json string
 resourceJSONString = json.dumps(resource)
-print resourceJSONString
+print(resourceJSONString)
@@ -17,9 +17,9 @@ client.getResourceByName(name=resourceName, show='table')
 resource = client.getResourceByName(name=resourceName)
 
 #Print id and name
-print resource['id']
-print resource['name']
+print(resource['id'])
+print(resource['name'])
 
 #Use json.dumps() to get json strong
 resourceJSONString = json.dumps(resource)
-print resourceJSONString
+print(resourceJSONString)
@@ -22,4 +22,4 @@ for i in resource:
 
 #Use json.dumps() to get json string
 resourceNetworkingJSONString = json.dumps(resource)
-print resourceNetworkingJSONString
+print(resourceNetworkingJSONString)
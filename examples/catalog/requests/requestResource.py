@@ -17,4 +17,4 @@ with open('requestFormatted.json') as f:
 
 request = client.requestResource(payload)
 
-print "Request submitted: {id}".format(id=request)
+print("Request submitted: {id}".format(id=request))
@@ -29,12 +29,12 @@ payload = json.loads(template.render(params=params))
 #Submit request
 requestId = client.requestResource(payload)
 
-print "Request submitted: {id}".format(id=requestId)
+print("Request submitted: {id}".format(id=requestId))
 
 acceptedStates = ['FAILED', 'SUCCESSFUL']
 
 #Wait for the request to finish
-print "Waiting for the request to complete..."
+print("Waiting for the request to complete...")
 
 while True:
     request = client.getRequest(requestId)
@@ -44,7 +44,7 @@ while True:
         if requestState != 'SUCCESSFUL':
             exit(request)
         else:
-            print "Request successful"
+            print("Request successful")
             break
 
     sleep(2)
@@ -56,4 +56,4 @@ resourceId = resource[0]['id']
 resourceNetworking = client.getResourceNetworking(resourceId)
 
 for i in resourceNetworking:
-    print "{key} : {value}".format(key=i['key'], value=i['value']['value'])
+    print("{key} : {value}".format(key=i['key'], value=i['value']['value']))
@@ -26,4 +26,4 @@ payload = json.loads(template.render(params=params))
 
 request = client.requestResource(payload)
 
-print "Request submitted: {id}".format(id=request)
+print("Request submitted: {id}".format(id=request))
@@ -13,4 +13,4 @@ with open('reservationTemplate.json') as json_data:
 
 reservation = client.createReservation(payload)
 
-print "Reservation created: {id}".format(id=reservation)
+print("Reservation created: {id}".format(id=reservation))
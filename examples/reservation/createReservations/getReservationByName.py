@@ -16,9 +16,9 @@ client.getReservationByName(name=reservationName)
 reservation = client.getReservationByName(name=reservationName, show='json')
 
 #Print id and name
-print reservation['id']
-print reservation['name']
+print(reservation['id'])
+print(reservation['name'])
 
 #Use json.dumps() to get json string
 reservationJSONString = json.dumps(reservation)
-print reservationJSONString
+print(reservationJSONString)
@@ -41,8 +41,8 @@ for group in businessGroups:
         #Attempt to create each reservation. Catch any errors and continue
         try:
                 reservation = client.createReservation(payload)
-                print "Reservation created: {id}".format(id=reservation)
+                print("Reservation created: {id}".format(id=reservation))
 
-        except Exception, e:
+        except Exception as e:
 
             pass
@@ -59,4 +59,4 @@ if __name__ == '__main__':
 
     reservation = client.createReservation(payload)
 
-    print "Reservation created: {id}".format(id=reservation)
+    print("Reservation created: {id}".format(id=reservation))
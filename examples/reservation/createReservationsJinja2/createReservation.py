@@ -30,5 +30,5 @@ payload = json.loads(template.render(params=params))
 
 reservation = client.createReservation(payload)
 
-print "Reservation created: {id}".format(id=reservation)
+print("Reservation created: {id}".format(id=reservation))
 
@@ -12,8 +12,11 @@ setup(name='vra7_rest_wrapper',
       description='vRealize Automation API Client',
       author='torchedplatypi',
       author_email='torchedplatypi@gmail.com',
+      python_requires='>=3.7',
       install_requires=['requests', 'prettytable'],
+      extras_require={'fastjson': ['orjson'], 'http2': ['httpx[http2]'], 'brotli': ['brotli']},
       packages=['vra7_rest_wrapper'],
+      test_suite='tests',
       long_description=read('README.md'),
       keywords=['VMWare', 'vRealize Automation', 'vRA'],
       classifiers=[
@@ -21,6 +24,12 @@ setup(name='vra7_rest_wrapper',
           'Intended Audience :: Information Technology',
           'Intended Audience :: System Administrators',
           'Topic :: Software Development :: Libraries :: Python Modules',
-          'Programming Language :: Python :: 2.7',
+          'Programming Language :: Python :: 3',
+          'Programming Language :: Python :: 3 :: Only',
+          'Programming Language :: Python :: 3.7',
+          'Programming Language :: Python :: 3.8',
+          'Programming Language :: Python :: 3.9',
+          'Programming Language :: Python :: 3.10',
+          'Programming Language :: Python :: 3.11',
       ],
       zip_safe=True)
@@ -0,0 +1,92 @@
+import json
+import re
+from datetime import datetime, timedelta
+
+from vra7_rest_wrapper.helpers import formatTimestamp, parseTimestamp
+
+
+class FakeResponse(object):
+    def __init__(self, document, status_code=200, headers=None):
+        self.status_code = status_code
+        self.content = json.dumps(document).encode('utf-8')
+        self.text = self.content.decode('utf-8')
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.text)
+
+    def close(self):
+        pass
+
+
+def _param(url, name, default):
+    match = re.search(r'[?&]{0}=(\d+)'.format(name), url)
+    return int(match.group(1)) if match is not None else default
+
+
+class FakeCollection(object):
+    """
+    A paged vRA collection: filters on lastUpdated ge, orders by lastUpdated and pages by
+    limit and page like vRA does. Single entries are served from <collection>/<id>.
+    """
+
+    def __init__(self, start=None):
+        self.clock = start or datetime(2026, 1, 1)
+        self.entries = {}
+        self.gets = 0
+        self.onGet = None
+
+    def update(self, id, **fields):
+        self.clock += timedelta(milliseconds=10)
+        entry = self.entries.setdefault(id, {'id': id})
+        entry.update(fields, lastUpdated=formatTimestamp(self.clock))
+        return entry
+
+    def delete(self, id):
+        del self.entries[id]
+
+    def get(self, url, headers=None, verify=None, **kwargs):
+        self.gets += 1
+        if self.onGet is not None:
+            self.onGet(self)
+        path = url.split('?')[0]
+        id = path.rsplit('/', 1)[-1]
+        if id in self.entries:
+            return FakeResponse(self.entries[id])
+
+        matching = list(self.entries.values())
+        since = re.search(r"lastUpdated%20ge%20'([^']+)'", url)
+        if since is not None:
+            since = parseTimestamp(since.group(1))
+            matching = [entry for entry in matching if parseTimestamp(entry['lastUpdated']) >= since]
+        matching.sort(key=lambda entry: entry['lastUpdated'])
+        limit = _param(url, 'limit', 20)
+        page = _param(url, 'page', 1)
+        content = matching[(page - 1) * limit:page * limit]
+        return FakeResponse({'content': content, 'metadata': {
+            'size': limit, 'number': page, 'totalElements': len(matching),
+            'totalPages': max(1, (len(matching) + limit - 1) // limit)}})
+
+
+class FakeRequests(FakeCollection):
+    def __init__(self, count, state='IN_PROGRESS', start=None):
+        FakeCollection.__init__(self, start)
+        for i in range(count):
+            self.update('request{0:04d}'.format(i), state=state)
+
+    @property
+    def requests(self):
+        return self.entries
+
+
+class FakeClient(object):
+    host = 'vra.example.com'
+    tenant = 'vsphere.local'
+    username = 'user'
+    token = 'Bearer test'
+
+    def __init__(self, session):
+        self.session = session
+
+    def getRequest(self, id, show='json'):
+        return json.loads(self.session.get('https://{0}/catalog-service/api/consumer/requests/{1}'.format(self.host, id)).content)
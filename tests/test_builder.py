@@ -0,0 +1,104 @@
+import json
+import unittest
+
+from vra7_rest_wrapper.builder import CatalogRequestBuilder
+from vra7_rest_wrapper.catalog import ConsumerClient
+
+CATALOG_ITEM = {'id': 'item-1', 'providerBinding': {'bindingId': 'blueprint-1'},
+                'organization': {'tenantRef': 'vsphere.local', 'subtenantRef': 'bg-1'}}
+
+
+def _template():
+    return {'type': 'com.vmware.vcac.catalog.domain.request.CatalogItemProvisioningRequest',
+            'businessGroupId': 'bg-1', 'description': None,
+            'data': {'vSphere_Machine_1': {'data': {'cpu': 1, 'memory': 1024,
+                                                    'VirtualMachine.Disk0.Size': 20,
+                                                    'disks': [{'data': {'capacity': 20}}]}}}}
+
+
+class _Client(object):
+    def __init__(self):
+        self.templates = 0
+
+    def getCatalogItemTemplate(self, catalogItem):
+        self.templates += 1
+        return _template()
+
+
+class _Response(object):
+    status_code = 201
+    headers = {'location': 'https://vra/catalog-service/api/consumer/requests/request-1'}
+
+
+class _Session(object):
+    def __init__(self):
+        self.bodies = []
+
+    def post(self, url, data=None, **kwargs):
+        self.bodies.append(data)
+        return _Response()
+
+
+class CatalogRequestBuilderTest(unittest.TestCase):
+    def setUp(self):
+        self.client = _Client()
+        self.builder = CatalogRequestBuilder(self.client, CATALOG_ITEM)
+
+    def test_slots_are_filled_without_touching_the_template(self):
+        payloads = list(self.builder.buildMany([{'data.vSphere_Machine_1.data.cpu': n,
+                                                 'data.vSphere_Machine_1.data.VirtualMachine.Disk0.Size': 40}
+                                                for n in (2, 4)]))
+
+        self.assertEqual([p['data']['vSphere_Machine_1']['data']['cpu'] for p in payloads], [2, 4])
+        self.assertEqual(payloads[0]['data']['vSphere_Machine_1']['data']['VirtualMachine.Disk0.Size'], 40)
+        self.assertEqual(self.builder.getTemplate(), _template())
+        self.assertEqual(self.client.templates, 1)
+
+    def test_slots_inside_lists_and_new_sections(self):
+        payload = self.builder.build({'data.vSphere_Machine_1.data.disks.0.data.capacity': 60,
+                                      ('data', 'vSphere_Machine_1', 'data', 'disks', 0, 'data', 'label'): 'main',
+                                      ('description',): 'wave 1',
+                                      ('custom', 'owner'): 'ops'})
+
+        self.assertEqual(payload['data']['vSphere_Machine_1']['data']['disks'][0]['data'],
+                         {'capacity': 60, 'label': 'main'})
+        self.assertEqual(payload['description'], 'wave 1')
+        self.assertEqual(payload['custom'], {'owner': 'ops'})
+        self.assertEqual(self.builder.getTemplate(), _template())
+
+    def test_slot_through_a_value_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.builder.build({('data', 'vSphere_Machine_1', 'data', 'cpu', 'count'): 2})
+        with self.assertRaises(ValueError):
+            self.builder.build({('data', 'vSphere_Machine_1', 'data', 'disks', 5, 'data'): {}})
+
+    def test_catalog_item_requests_share_the_cached_skeleton(self):
+        first = self.builder.buildCatalogItemRequest(forWhom='a@corp', params={'provider-VirtualMachine.CPU.Count': 2})
+        second = self.builder.buildCatalogItemRequest(forWhom='b@corp', prepareOnly=True)
+
+        self.assertEqual([entry['key'] for entry in first['requestData']['entries']],
+                         ['provider-blueprintId', 'provider-provisioningGroupId', 'requestedFor',
+                          'provider-VirtualMachine.CPU.Count'])
+        self.assertEqual(first['requestData']['entries'][3]['value'], {'type': 'integer', 'value': 2})
+        self.assertEqual((second['requestedFor'], second['state']), ('b@corp', 'UNSUBMITTED'))
+        self.assertIs(first['organization'], self.builder.getRequestTemplate()['organization'])
+        self.assertEqual(len(self.builder.getRequestTemplate()['requestData']['entries']), 2)
+        self.assertEqual(self.client.templates, 0)
+
+
+class ProvisionCatalogItemTest(unittest.TestCase):
+    def test_payload_is_sent_as_json_with_one_builder_per_item(self):
+        client = ConsumerClient('vra', 'user', 'password', token='token')
+        client.session = _Session()
+
+        for cpu in (1, 2):
+            self.assertEqual(client.provisionCatalogItem(dict(CATALOG_ITEM), forWhom='a@corp', vmCpuCount=cpu),
+                             'request-1')
+
+        bodies = [json.loads(body) for body in client.session.bodies]
+        self.assertEqual([body['requestData']['entries'][-1]['value']['value'] for body in bodies], [1, 2])
+        self.assertIs(client.getRequestBuilder(CATALOG_ITEM), client.getRequestBuilder(dict(CATALOG_ITEM)))
+
+
+if __name__ == '__main__':
+    unittest.main()
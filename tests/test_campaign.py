@@ -0,0 +1,108 @@
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+
+import requests
+
+from vra7_rest_wrapper import campaign
+
+
+class _FakeClient(object):
+    host = 'vra.example.com'
+    tenant = 'vsphere.local'
+    username = 'user'
+    password = 'password'
+    token = 'Bearer test'
+    posts = None
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def requestResource(self, payload):
+        payload = json.loads(payload)
+        key = payload['key']
+        with open(_FakeClient.posts, 'a') as f:
+            f.write(key + '\n')
+        if payload.get('fail') == 'timeout':
+            raise requests.exceptions.ReadTimeout('read timed out after the POST was sent')
+        if payload.get('fail') == 'rejected':
+            # vRA answered 400 without a Location header
+            raise KeyError('location')
+        return 'request-' + key
+
+
+class _Interrupted(Exception):
+    pass
+
+
+@unittest.skipUnless(multiprocessing.get_start_method() == 'fork', 'workers inherit the fake client through fork')
+class CampaignRunnerTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.checkpoint = os.path.join(self.directory, 'checkpoint.jsonl')
+        _FakeClient.posts = os.path.join(self.directory, 'posts.txt')
+        self.original = campaign.ConsumerClient
+        campaign.ConsumerClient = _FakeClient
+
+    def tearDown(self):
+        campaign.ConsumerClient = self.original
+        shutil.rmtree(self.directory)
+
+    def posted(self):
+        with open(_FakeClient.posts) as f:
+            return f.read().split()
+
+    def test_interrupted_run_does_not_submit_twice(self):
+        items = [('item{0}'.format(i), {'key': 'item{0}'.format(i)}) for i in range(30)]
+        progress = []
+
+        def interrupt(done, total):
+            progress.append(done)
+            if done == 3:
+                raise _Interrupted()
+
+        runner = campaign.CampaignRunner(_FakeClient(), checkpoint=self.checkpoint, processes=1, shardSize=30)
+        with self.assertRaises(_Interrupted):
+            runner.run(items, progress=interrupt)
+        self.assertEqual(progress, [1, 2, 3])
+
+        # The shard kept running after the parent gave up, everything it POSTed is recorded
+        recorded = runner.loadCheckpoint()
+        self.assertEqual(sorted(recorded), sorted(self.posted()))
+
+        submitted = runner.run(items)
+        self.assertEqual(len(submitted), 30)
+        self.assertEqual(sorted(self.posted()), sorted(key for key, _ in items))
+
+    def test_unknown_outcomes_are_not_resubmitted(self):
+        items = [('ok', {'key': 'ok'}), ('timeout', {'key': 'timeout', 'fail': 'timeout'}),
+                 ('rejected', {'key': 'rejected', 'fail': 'rejected'})]
+        # A previous run was killed between marking killed and recording its outcome
+        with open(self.checkpoint, 'w') as f:
+            f.write(json.dumps({'key': 'killed', 'state': campaign.SUBMITTING}) + '\n')
+        items.append(('killed', {'key': 'killed'}))
+
+        runner = campaign.CampaignRunner(_FakeClient(), checkpoint=self.checkpoint, processes=1)
+        submitted = runner.run(items)
+        self.assertEqual(submitted, {'ok': 'request-ok'})
+        self.assertEqual(sorted(runner.errors), ['rejected', 'timeout'])
+        self.assertEqual(runner.unconfirmed, {'killed'})
+
+        # The rejected item failed before vRA accepted it and is tried again, the timed out one is not
+        runner.run(items)
+        self.assertEqual(runner.unconfirmed, {'killed', 'timeout'})
+        self.assertEqual(sorted(self.posted()), ['ok', 'rejected', 'rejected', 'timeout'])
+
+        runner.discard('killed')
+        runner.confirm('timeout', 'request-timeout')
+        submitted = runner.run(items)
+        self.assertEqual(submitted['killed'], 'request-killed')
+        self.assertEqual(submitted['timeout'], 'request-timeout')
+        self.assertEqual(runner.unconfirmed, set())
+
+
+if __name__ == '__main__':
+    unittest.main()
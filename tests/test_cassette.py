@@ -0,0 +1,84 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from requests import HTTPError
+
+from vra7_rest_wrapper.cassette import SCRUBBED_TOKEN, RecordingSession, ReplaySession
+
+
+class _Response(object):
+    def __init__(self, document, status_code=200, headers=None):
+        self.status_code = status_code
+        self.content = json.dumps(document).encode('utf-8')
+        self.headers = headers or {'Content-Type': 'application/json'}
+
+
+class _Session(object):
+    def __init__(self):
+        self.gets = 0
+
+    def request(self, method, url, **kwargs):
+        if url.endswith('/identity/api/tokens'):
+            return _Response({'id': 'real-token', 'expires': '2026-01-01T00:00:00.000Z'})
+        if url.endswith('/missing'):
+            return _Response({'errors': [{'code': 10101}]}, status_code=404)
+        self.gets += 1
+        return _Response({'content': [self.gets]}, headers={'Content-Type': 'application/json', 'Authorization': 'x'})
+
+
+class CassetteTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cassette.jsonl.gz')
+        with RecordingSession(_Session(), self.path) as session:
+            session.post('https://vra.example.com/identity/api/tokens',
+                         data=json.dumps({'username': 'user', 'password': 'se"cret', 'tenant': 'vsphere.local'}))
+            session.get('https://vra.example.com/catalog-service/api/consumer/resources', headers={'Authorization': 'x'})
+            session.get('https://vra.example.com/catalog-service/api/consumer/resources')
+            session.get('https://vra.example.com/missing')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_credentials_are_scrubbed(self):
+        with gzip.open(self.path, 'rt') as f:
+            cassette = f.read()
+
+        self.assertNotIn('se\\"cret', cassette)
+        self.assertNotIn('real-token', cassette)
+        self.assertIn(SCRUBBED_TOKEN, cassette)
+        self.assertNotIn('Authorization', cassette)
+
+    def test_responses_replay_in_order_against_any_host(self):
+        session = ReplaySession(self.path, loop=False)
+
+        token = session.post('https://other.example.com/identity/api/tokens', data='{"password":"different"}')
+        pages = [session.get('https://other.example.com/catalog-service/api/consumer/resources').json()
+                 for _ in range(2)]
+
+        self.assertEqual(token.json()['id'], SCRUBBED_TOKEN)
+        self.assertEqual(pages, [{'content': [1]}, {'content': [2]}])
+        self.assertRaises(KeyError, session.get, 'https://other.example.com/catalog-service/api/consumer/resources')
+        self.assertRaises(KeyError, session.get, 'https://other.example.com/unknown')
+        self.assertEqual(session.served, 3)
+
+    def test_replayed_responses_behave_like_requests_responses(self):
+        session = ReplaySession(self.path)
+        ok = session.get('https://vra.example.com/catalog-service/api/consumer/resources')
+        missing = session.get('https://vra.example.com/missing')
+
+        ok.raise_for_status()
+        ok.close()
+        self.assertEqual(ok.headers['content-type'], 'application/json')
+        self.assertFalse(missing.ok)
+        with self.assertRaises(HTTPError) as raised:
+            missing.raise_for_status()
+        self.assertIs(raised.exception.response, missing)
+
+
+if __name__ == '__main__':
+    unittest.main()
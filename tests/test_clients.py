@@ -0,0 +1,106 @@
+import threading
+import time
+import unittest
+
+from vra7_rest_wrapper.catalog import ConsumerClient
+from vra7_rest_wrapper.helpers import TokenExpired
+from vra7_rest_wrapper.reservation import ReservationClient
+
+from .fakes import FakeResponse
+
+THREADS = 16
+
+
+class _Appliance(object):
+    """
+    Hands out numbered tokens, slowly, and rejects every token but the latest with 401.
+    """
+
+    def __init__(self):
+        self.authentications = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    def post(self, url, data=None, headers=None, **kwargs):
+        time.sleep(0.05)
+        with self.lock:
+            self.authentications += 1
+            return FakeResponse({'id': 'token-{0}'.format(self.authentications)})
+
+    def get(self, url, headers=None, **kwargs):
+        with self.lock:
+            if headers.get('Authorization') != 'Bearer token-{0}'.format(self.authentications):
+                self.rejected += 1
+                return FakeResponse({'errors': [{'code': 401}]}, status_code=401)
+        return FakeResponse({'id': url.rsplit('/', 1)[-1], 'name': 'vm'})
+
+    def request(self, method, url, headers=None, **kwargs):
+        return self.get(url, headers=headers)
+
+    def expire(self):
+        with self.lock:
+            self.authentications += 1
+
+
+def _inThreads(func):
+    start = threading.Event()
+    results = []
+    errors = []
+
+    def run():
+        start.wait()
+        try:
+            results.append(func())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    start.set()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+class SharedClientTest(unittest.TestCase):
+    def setUp(self):
+        self.appliance = _Appliance()
+        self.client = ConsumerClient('vra.example.com', 'user', 'password', session=self.appliance)
+
+    def test_concurrent_first_use_authenticates_once(self):
+        self.client.token = ''
+        results, errors = _inThreads(lambda: self.client.token)
+        self.assertEqual(errors, [])
+        self.assertEqual(set(results), {'Bearer token-2'})
+        self.assertEqual(self.appliance.authentications, 2)
+
+    def test_expired_token_is_refreshed_once_and_retried(self):
+        self.appliance.expire()
+        results, errors = _inThreads(lambda: self.client.getResource('42'))
+        self.assertEqual(errors, [])
+        self.assertEqual([resource['id'] for resource in results], ['42'] * THREADS)
+        self.assertEqual(self.appliance.authentications, 3)
+        self.assertEqual(self.appliance.rejected, THREADS)
+
+    def test_every_verb_is_refreshed(self):
+        self.appliance.expire()
+        headers = {'Authorization': self.client.token}
+        self.assertEqual(self.client.session.put('https://vra.example.com/x/1', headers=headers).status_code, 200)
+        self.assertEqual(self.client.session.delete('https://vra.example.com/x/1', headers=headers).status_code, 200)
+        self.assertEqual(self.appliance.authentications, 3)
+
+    def test_client_without_credentials_says_its_token_expired(self):
+        client = ConsumerClient('vra.example.com', None, None, token='Bearer token-1', session=self.appliance)
+        self.appliance.expire()
+        self.assertRaises(TokenExpired, client.getResource, '1')
+        self.assertEqual(self.appliance.authentications, 2)
+
+    def test_clients_sharing_a_session_keep_their_own_tokens(self):
+        other = ReservationClient('vra.example.com', 'other', 'password', session=self.client.session)
+        self.assertIs(other.session.session, self.appliance)
+        self.assertIs(other.session.tokenManager, other.tokenManager)
+
+
+if __name__ == '__main__':
+    unittest.main()
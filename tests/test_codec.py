@@ -0,0 +1,49 @@
+import json
+import unittest
+from unittest import mock
+
+from vra7_rest_wrapper import codec
+
+
+class _Response(object):
+    def __init__(self, document):
+        self.content = json.dumps(document).encode('utf-8')
+
+
+class _StrictOrjson(object):
+    # Like orjson, refuses dict keys that are not strings
+    @staticmethod
+    def dumps(obj):
+        if any(not isinstance(key, str) for key in obj):
+            raise TypeError('Dict key must be str')
+        return json.dumps(obj).encode('utf-8')
+
+
+class CodecTest(unittest.TestCase):
+    def tearDown(self):
+        codec.setCodec()
+
+    def test_fastest_installed_codec_is_the_default(self):
+        codec.setCodec()
+        self.assertEqual(codec.getCodec(), next(name for name in ('orjson', 'ujson', 'json') if name in codec.CODECS))
+
+    def test_every_codec_round_trips_a_response(self):
+        document = {'content': [{'id': 'a', 'name': 'vm-é', 'size': 2.5, 'on': True, 'tags': None}]}
+        for name in codec.CODECS:
+            codec.setCodec(name)
+            self.assertEqual(codec.decodeResponse(_Response(document)), document)
+            self.assertEqual(codec.decode(codec.encode(document)), document)
+
+    def test_unknown_codec_is_refused(self):
+        codec.setCodec('json')
+        self.assertRaises(ValueError, codec.setCodec, 'simdjson')
+        self.assertEqual(codec.getCodec(), 'json')
+
+    def test_orjson_falls_back_to_json_for_non_string_keys(self):
+        with mock.patch.object(codec, 'orjson', _StrictOrjson):
+            self.assertEqual(json.loads(codec._orjsonDumps({'a': 1})), {'a': 1})
+            self.assertEqual(json.loads(codec._orjsonDumps({1: 'a'})), {'1': 'a'})
+
+
+if __name__ == '__main__':
+    unittest.main()
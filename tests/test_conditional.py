@@ -0,0 +1,80 @@
+import json
+import unittest
+
+import requests
+
+from vra7_rest_wrapper.conditional import ConditionalReader
+
+
+class _Response(object):
+    def __init__(self, status_code, document=None, headers=None):
+        self.status_code = status_code
+        self.content = json.dumps(document).encode('utf-8') if document is not None else b''
+        self.text = self.content.decode('utf-8')
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError('{0} Error'.format(self.status_code), response=self)
+
+
+class _Session(object):
+    def __init__(self):
+        self.document = {'id': '1', 'name': 'vm'}
+        self.etag = None
+        self.status_code = 200
+        self.sent = []
+
+    def get(self, url, headers=None, **kwargs):
+        self.sent.append(dict(headers))
+        if self.status_code != 200:
+            return _Response(self.status_code, {'errors': [{'code': self.status_code}]})
+        if self.etag is not None and headers.get('If-None-Match') == self.etag:
+            return _Response(304)
+        return _Response(200, self.document, {'ETag': self.etag} if self.etag else {})
+
+
+class _Client(object):
+    host = 'vra.example.com'
+    token = 'Bearer test'
+
+    def __init__(self, session):
+        self.session = session
+
+
+class ConditionalReaderTest(unittest.TestCase):
+    def setUp(self):
+        self.session = _Session()
+        self.reader = ConditionalReader(_Client(self.session))
+
+    def test_etag_is_sent_and_304_returns_the_cached_copy(self):
+        self.session.etag = '"v1"'
+        document, changed = self.reader.getResource('1')
+        self.assertTrue(changed)
+        self.assertEqual(self.reader.getResource('1'), (document, False))
+        self.assertEqual(self.session.sent[-1]['If-None-Match'], '"v1"')
+
+        self.session.document = {'id': '1', 'name': 'renamed'}
+        self.session.etag = '"v2"'
+        self.assertEqual(self.reader.getResource('1'), ({'id': '1', 'name': 'renamed'}, True))
+
+    def test_unchanged_body_without_etag_is_not_changed(self):
+        self.assertTrue(self.reader.getResource('1')[1])
+        self.assertFalse(self.reader.getResource('1')[1])
+        self.assertNotIn('If-None-Match', self.session.sent[-1])
+
+    def test_error_responses_raise_and_are_not_cached(self):
+        self.reader.getResource('1')
+        for status in (404, 500):
+            self.session.status_code = status
+            self.assertRaises(requests.HTTPError, self.reader.getResource, '1')
+
+        self.session.status_code = 200
+        self.assertEqual(self.reader.getResource('1'), ({'id': '1', 'name': 'vm'}, True))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import threading
+import time
+import unittest
+
+from vra7_rest_wrapper.deadline import Deadline, DeadlineExceeded, current, remaining, timeoutFor
+from vra7_rest_wrapper.transport import DeadlineSession
+
+from .fakes import FakeResponse
+
+
+class _Session(object):
+    def __init__(self):
+        self.sent = []
+
+    def request(self, method, url, **kwargs):
+        self.sent.append((method, kwargs.get('timeout')))
+        return FakeResponse({})
+
+
+class DeadlineTest(unittest.TestCase):
+    def test_inner_deadline_never_outlasts_outer(self):
+        with Deadline(1) as outer:
+            with Deadline(60) as inner:
+                self.assertLessEqual(inner.remaining(), 1)
+                self.assertIs(current(), inner)
+            with Deadline() as inherited:
+                self.assertEqual(inherited.expires, outer.expires)
+            self.assertIs(current(), outer)
+        self.assertIsNone(current())
+        self.assertIsNone(remaining())
+
+    def test_timeouts_are_clipped_to_the_budget(self):
+        self.assertEqual(timeoutFor((10, 120)), (10, 120))
+        with Deadline(2):
+            connect, read = timeoutFor((10, 120))
+            self.assertLessEqual(read, 2)
+            self.assertEqual(timeoutFor(1), (1, 1))
+
+    def test_spent_budget_raises_instead_of_a_zero_timeout(self):
+        with Deadline(0.01):
+            time.sleep(0.02)
+            self.assertRaises(DeadlineExceeded, timeoutFor, (10, 120))
+
+    def test_out_of_order_exit_keeps_the_other_deadline(self):
+        first = Deadline(10)
+        second = Deadline(20)
+        first.__enter__()
+        second.__enter__()
+        first.__exit__(None, None, None)
+        self.assertIs(current(), second)
+        second.__exit__(None, None, None)
+        self.assertIsNone(current())
+
+    def test_bound_functions_run_under_the_deadline(self):
+        seen = []
+        with Deadline(5) as deadline:
+            thread = threading.Thread(target=deadline.bind(lambda: seen.append(current())))
+            thread.start()
+            thread.join()
+        self.assertEqual(seen, [deadline])
+
+    def test_deadline_session_times_every_verb(self):
+        inner = _Session()
+        session = DeadlineSession(inner, timeout=(10, 120))
+        with Deadline(5):
+            for send in (session.get, session.post, session.put, session.delete):
+                send('https://h/x')
+        self.assertEqual([method for method, _ in inner.sent], ['GET', 'POST', 'PUT', 'DELETE'])
+        self.assertTrue(all(timeout[1] <= 5 for _, timeout in inner.sent))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import threading
+import unittest
+
+from vra7_rest_wrapper.deadline import current
+from vra7_rest_wrapper.decommission import DecommissionPipeline
+from vra7_rest_wrapper.transport import DeadlineSession
+
+from .fakes import FakeClient, FakeRequests, FakeResponse
+
+
+class _Session(object):
+    def __init__(self, resources):
+        self.resources = resources
+        self.requests = FakeRequests(0)
+        self.urls = []
+
+    def request(self, method, url, **kwargs):
+        return self.get(url, **kwargs)
+
+    def get(self, url, **kwargs):
+        self.urls.append(url)
+        if '/consumer/requests' in url:
+            return self.requests.get(url)
+        return FakeResponse({'content': self.resources, 'metadata': {'totalPages': 1}})
+
+
+class _Client(FakeClient):
+    def __init__(self, session, state):
+        FakeClient.__init__(self, session)
+        self.state = state
+        self.lock = threading.Lock()
+
+    def getResourceActions(self, id):
+        return {'Destroy': {'id': 'destroy'}}
+
+    def performAction(self, resource, actionID=None):
+        with self.lock:
+            requestId = 'request-' + resource['id']
+            # The request keeps an old lastUpdated, so the delta query never returns it
+            self.session.requests.update(requestId, state=self.state)
+        return requestId
+
+
+def _resources(count):
+    return [{'id': str(i), 'name': 'test-{0}'.format(i)} for i in range(count)]
+
+
+class DecommissionPipelineTest(unittest.TestCase):
+    def test_name_prefix_filters_on_the_server(self):
+        session = _Session(_resources(2))
+        DecommissionPipeline(_Client(session, 'SUCCESSFUL'), namePrefix="test-'a", businessGroup='R&D').discover()
+        self.assertIn("startswith(name,'test-''a')", session.urls[0])
+        self.assertIn("name%20eq%20'R%26D'", session.urls[0])
+
+    def test_requests_missed_by_the_delta_query_are_fetched(self):
+        session = _Session(_resources(3))
+        pipeline = DecommissionPipeline(_Client(session, 'SUCCESSFUL'), namePrefix='test-', interval=0.01,
+                                        fallbackPolls=2)
+
+        summary = pipeline.run()
+        self.assertEqual(sorted(event['requestId'] for event in summary['succeeded']),
+                         ['request-0', 'request-1', 'request-2'])
+
+    def test_stop_reports_pending_requests(self):
+        session = _Session(_resources(3))
+        pipeline = DecommissionPipeline(_Client(session, 'IN_PROGRESS'), namePrefix='test-', interval=0.01)
+        stop = threading.Event()
+
+        submitted = set()
+        stopped = set()
+        for event in pipeline.stream(stop=stop):
+            if event['event'] == 'submitted':
+                submitted.add(event['requestId'])
+                stop.set()
+            elif event['event'] == 'stopped':
+                stopped.add(event['requestId'])
+        self.assertTrue(stopped)
+        self.assertEqual(stopped, submitted)
+
+    def test_progress_callback_runs_outside_the_budget(self):
+        session = _Session(_resources(2))
+        client = _Client(DeadlineSession(session), 'IN_PROGRESS')
+        pipeline = DecommissionPipeline(client, namePrefix='test-', interval=0.05)
+        fetched = []
+
+        def progress(event):
+            self.assertIsNone(current())
+            if event['event'] == 'timedOut':
+                # Calls made after the timeout must not fail with DeadlineExceeded
+                fetched.append(client.getRequest(event['requestId'])['state'])
+
+        summary = pipeline.run(progress=progress, timeout=0.3)
+        self.assertEqual(len(summary['timedOut']), 2)
+        self.assertEqual(fetched, ['IN_PROGRESS', 'IN_PROGRESS'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import threading
+import time
+import unittest
+
+from http.client import HTTPConnection
+
+from vra7_rest_wrapper.events import EventDispatcher, EventReceiver
+
+from .fakes import FakeClient, FakeRequests
+
+
+class _Client(FakeClient):
+    def waitForRequest(self, id, interval=2, timeout=None, states=()):
+        raise AssertionError('attach should replace waitForRequest')
+
+
+class EventDispatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.requests = FakeRequests(1)
+        self.dispatcher = EventDispatcher()
+
+    def later(self, delay, func, *args, **kwargs):
+        timer = threading.Timer(delay, func, args, kwargs)
+        timer.daemon = True
+        timer.start()
+
+    def test_attached_wait_resolves_on_event(self):
+        client = self.dispatcher.attach(_Client(self.requests), interval=60)
+        self.later(0.1, self.requests.update, 'request0000', state='SUCCESSFUL')
+        self.later(0.2, self.dispatcher.dispatch, {'requestId': 'request0000', 'state': 'SUCCESSFUL'})
+
+        started = time.time()
+        self.assertEqual(client.waitForRequest('request0000', timeout=5)['state'], 'SUCCESSFUL')
+        self.assertLess(time.time() - started, 2)
+
+    def test_attached_wait_polls_when_the_event_is_lost(self):
+        client = self.dispatcher.attach(_Client(self.requests), interval=0.05)
+        self.later(0.2, self.requests.update, 'request0000', state='FAILED')
+
+        self.assertEqual(client.waitForRequest('request0000', timeout=5)['state'], 'FAILED')
+        self.assertEqual(self.dispatcher._futures, {})
+
+    def test_dispatch_ignores_documents_that_are_not_events(self):
+        for document in ('x', 1, [1], None):
+            self.assertIsNone(self.dispatcher.dispatch(document))
+        self.assertEqual(self.dispatcher.received, 0)
+
+    def test_failing_listener_does_not_stop_dispatch(self):
+        seen = []
+
+        def fail(requestId, state, event):
+            raise KeyError(requestId)
+
+        self.dispatcher.subscribe(fail)
+        self.dispatcher.subscribe(lambda requestId, state, event: seen.append((requestId, state)))
+        future = self.dispatcher.expect('request0000')
+
+        self.assertEqual(self.dispatcher.dispatch({'requestId': 'request0000', 'state': 'SUCCESSFUL'}), 'request0000')
+        self.assertEqual(seen, [('request0000', 'SUCCESSFUL')])
+        self.assertTrue(future.done())
+
+
+class EventReceiverTest(unittest.TestCase):
+    def post(self, url, body):
+        host, rest = url[len('http://'):].split('/', 1)
+        connection = HTTPConnection(*host.split(':'), timeout=5)
+        try:
+            connection.request('POST', '/' + rest, body=body, headers={'Content-Type': 'application/json'})
+            return connection.getresponse().status
+        finally:
+            connection.close()
+
+    def test_bodies_that_are_not_events_are_rejected(self):
+        with EventReceiver() as receiver:
+            for body in ('"x"', '1', '[1]', 'null', '{"requestId": "r1"'):
+                self.assertEqual(self.post(receiver.url(), body), 400, body)
+            self.assertEqual(self.post(receiver.url(), '[{"requestId": "r1", "state": "SUCCESSFUL"}]'), 202)
+        self.assertEqual(receiver.dispatcher.received, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import threading
+import time
+import unittest
+
+from vra7_rest_wrapper.deadline import Deadline, current
+from vra7_rest_wrapper.graph import RequestGraph
+
+
+class _Client(object):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.payloads = []
+        self.waited = []
+
+    def requestMachine(self, catalogId, payload):
+        with self.lock:
+            self.payloads.append(payload)
+        return 'request-{0}'.format(payload['n'])
+
+    def waitForRequest(self, id, interval=2, timeout=None):
+        with self.lock:
+            self.waited.append(id)
+        return {'id': id, 'state': 'FAILED' if id == 'request-2' else 'SUCCESSFUL'}
+
+
+class RequestGraphTest(unittest.TestCase):
+    def test_dependents_run_after_their_dependencies(self):
+        client = _Client()
+        graph = RequestGraph(maxWorkers=4)
+        for n in (1, 2):
+            graph.addRequestMachine('submit{0}'.format(n), client, 'item', {'n': n})
+            graph.addWaitForRequest('wait{0}'.format(n), client, graph.ref('submit{0}'.format(n)))
+            graph.add('after{0}'.format(n), lambda request: request['id'], (graph.ref('wait{0}'.format(n)),))
+
+        results = graph.run()
+
+        self.assertEqual(sorted(client.waited), ['request-1', 'request-2'])
+        self.assertEqual(results['after1'], 'request-1')
+        self.assertEqual(list(graph.errors), ['wait2'])
+        self.assertEqual(graph.skipped, ['after2'])
+
+    def test_request_ids_are_not_taken_for_node_names(self):
+        client = _Client()
+        graph = RequestGraph()
+        graph.add('request-1', lambda: 'request-9')
+        graph.addWaitForRequest('wait', client, 'request-1')
+
+        graph.run()
+
+        self.assertEqual(client.waited, ['request-1'])
+        self.assertEqual(graph.nodes['wait'].after, set())
+
+    def test_independent_nodes_run_concurrently(self):
+        graph = RequestGraph(maxWorkers=3)
+        for n in range(3):
+            graph.add('sleep{0}'.format(n), time.sleep, (0.2,))
+        graph.add('last', lambda: None, after=['sleep0', 'sleep1', 'sleep2'])
+
+        start = time.time()
+        graph.run()
+
+        self.assertLess(time.time() - start, 0.5)
+        self.assertEqual(graph.criticalPath()[0][-1], 'last')
+
+    def test_nodes_run_under_the_callers_deadline(self):
+        graph = RequestGraph()
+        graph.add('budget', lambda: current().remaining())
+
+        with Deadline(30):
+            results = graph.run()
+
+        self.assertTrue(0 < results['budget'] <= 30)
+
+    def test_cycles_are_refused(self):
+        graph = RequestGraph()
+        graph.add('a', lambda: None, after=['b'])
+        graph.add('b', lambda: None, after=['a'])
+
+        self.assertRaises(ValueError, graph.run)
+
+
+if __name__ == '__main__':
+    unittest.main()
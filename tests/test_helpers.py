@@ -0,0 +1,67 @@
+import json
+import unittest
+
+from vra7_rest_wrapper.helpers import iterPages, iterUpdated
+
+
+class _Response(object):
+    status_code = 200
+
+    def __init__(self, document):
+        self.content = json.dumps(document).encode('utf-8')
+        self.text = self.content.decode('utf-8')
+        self.headers = {}
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class _Session(object):
+    def __init__(self, client, pages):
+        self.client = client
+        self.pages = pages
+        self.tokens = []
+
+    def get(self, url, headers=None, **kwargs):
+        self.tokens.append(headers['Authorization'])
+        # The token is renewed by another thread while the caller pages
+        self.client.tokens += 1
+        page = int(url.rsplit('page=', 1)[1])
+        if 'lastUpdated' in url:
+            entries = [{'id': '{0}-{1}'.format(page, i), 'lastUpdated': '2026-01-01T00:00:00.000Z'} for i in range(2)]
+            return _Response({'content': entries if page <= self.pages else []})
+        return _Response({'content': [page], 'metadata': {'totalPages': self.pages}})
+
+
+class _Client(object):
+    def __init__(self, pages):
+        self.tokens = 0
+        self.session = _Session(self, pages)
+
+    @property
+    def token(self):
+        return 'Bearer {0}'.format(self.tokens)
+
+
+class IterPagesTest(unittest.TestCase):
+    def test_every_page_uses_the_current_token(self):
+        client = _Client(3)
+
+        pages = [page['content'] for page in iterPages(client, 'https://vra/collection')]
+
+        self.assertEqual(pages, [[1], [2], [3]])
+        self.assertEqual(client.session.tokens, ['Bearer 0', 'Bearer 1', 'Bearer 2'])
+
+
+class IterUpdatedTest(unittest.TestCase):
+    def test_every_page_uses_the_current_token(self):
+        client = _Client(2)
+
+        entries = list(iterUpdated(client, 'https://vra/collection', '2026-01-01T00:00:00.000Z', limit=2))
+
+        self.assertEqual(len(entries), 4)
+        self.assertEqual(client.session.tokens, ['Bearer 0', 'Bearer 1', 'Bearer 2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
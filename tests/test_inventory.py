@@ -0,0 +1,57 @@
+import re
+import unittest
+from urllib.parse import unquote
+
+from vra7_rest_wrapper.deadline import Deadline, current
+from vra7_rest_wrapper.inventory import InventoryCrawler
+
+from .fakes import FakeClient, FakeResponse
+
+GROUPS = [{'id': 'bg1', 'name': 'R&D'}, {'id': 'bg2', 'name': "Ops' Lab"}, {'id': 'bg3', 'name': 'Broken'}]
+
+
+class _Session(object):
+    def __init__(self, sizes):
+        self.sizes = sizes
+        self.urls = []
+        self.deadlines = []
+
+    def get(self, url, **kwargs):
+        self.urls.append(url)
+        self.deadlines.append(current())
+        if '/subtenants' in url:
+            return FakeResponse({'content': GROUPS, 'metadata': {'totalPages': 1}})
+        name = unquote(re.search(r"name%20eq%20'(.*?)'&", url).group(1)).replace("''", "'")
+        if name not in self.sizes:
+            return FakeResponse({'errors': [{'message': 'boom'}]}, status_code=500)
+        page = int(re.search(r'page=(\d+)', url).group(1))
+        size = self.sizes[name]
+        content = [{'name': '{0}-{1}'.format(name, i)} for i in range((page - 1) * 2, min(page * 2, size))]
+        return FakeResponse({'content': content, 'metadata': {'totalPages': (size + 1) // 2}})
+
+
+class InventoryCrawlerTest(unittest.TestCase):
+    def test_every_page_of_every_group(self):
+        session = _Session({'R&D': 5, "Ops' Lab": 1})
+        crawler = InventoryCrawler(FakeClient(session), maxWorkers=3, limit=2)
+
+        inventory = crawler.crawlAll()
+
+        self.assertEqual([r['name'] for r in inventory['R&D']], ['R&D-{0}'.format(i) for i in range(5)])
+        self.assertEqual([r['name'] for r in inventory["Ops' Lab"]], ["Ops' Lab-0"])
+        self.assertEqual(list(crawler.errors), ['Broken'])
+        self.assertTrue(any("'Ops''%20Lab'" in url for url in session.urls))
+
+    def test_pages_are_fetched_under_the_callers_deadline(self):
+        session = _Session({'R&D': 3, "Ops' Lab": 1, 'Broken': 1})
+        crawler = InventoryCrawler(FakeClient(session), maxWorkers=3, limit=2)
+
+        with Deadline(30) as deadline:
+            crawler.crawlAll(GROUPS)
+
+        self.assertEqual(len(session.deadlines), 4)
+        self.assertTrue(all(found is deadline for found in session.deadlines))
+
+
+if __name__ == '__main__':
+    unittest.main()
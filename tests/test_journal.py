@@ -0,0 +1,105 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from vra7_rest_wrapper.journal import ProvisioningJournal, UnconfirmedSubmission
+
+
+class _FakeClient(object):
+    def __init__(self, fail=False, rejected=False, latency=0):
+        self.fail = fail
+        self.rejected = rejected
+        self.latency = latency
+        self.posts = []
+
+    def requestResource(self, payload):
+        self.posts.append(payload)
+        time.sleep(self.latency)
+        if self.fail:
+            raise IOError('connection reset after the POST was sent')
+        if self.rejected:
+            # vRA answered 400 without a Location header
+            raise KeyError('location')
+        return 'request-{0}'.format(len(self.posts))
+
+
+class ProvisioningJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.journal = ProvisioningJournal(os.path.join(self.directory, 'journal.db'))
+
+    def tearDown(self):
+        self.journal.close()
+        shutil.rmtree(self.directory)
+
+    def test_submitted_key_is_not_posted_again(self):
+        client = _FakeClient()
+        first = self.journal.submit(client, 'vm1', {'b': 2, 'a': 1})
+        self.assertEqual(self.journal.submit(client, 'vm1', {'a': 1, 'b': 2}), first)
+        self.assertEqual(len(client.posts), 1)
+
+    def test_payload_as_dict_or_json_text_is_the_same_payload(self):
+        client = _FakeClient()
+        first = self.journal.submit(client, 'vm1', {'a': 1, 'b': [1, 2]})
+        self.assertEqual(self.journal.submit(client, 'vm1', json.dumps({'b': [1, 2], 'a': 1}, indent=2)), first)
+        with self.assertRaises(ValueError):
+            self.journal.submit(client, 'vm1', {'a': 2})
+
+    def test_interrupted_submission_is_not_posted_again(self):
+        with self.assertRaises(IOError):
+            self.journal.submit(_FakeClient(fail=True), 'vm1', {'a': 1})
+        self.assertEqual(self.journal.unconfirmed(), ['vm1'])
+
+        client = _FakeClient()
+        with self.assertRaises(UnconfirmedSubmission):
+            self.journal.submit(client, 'vm1', {'a': 1})
+        self.assertEqual(client.posts, [])
+
+        self.journal.confirm('vm1', 'request-found')
+        self.assertEqual(self.journal.submit(client, 'vm1', {'a': 1}), 'request-found')
+        self.assertEqual(client.posts, [])
+        self.assertEqual(self.journal.unconfirmed(), [])
+
+    def test_discarded_submission_is_posted_again(self):
+        with self.assertRaises(IOError):
+            self.journal.submit(_FakeClient(fail=True), 'vm1', {'a': 1})
+        self.journal.discard('vm1')
+
+        client = _FakeClient()
+        self.assertEqual(self.journal.submit(client, 'vm1', {'a': 1}), 'request-1')
+        self.assertEqual(len(client.posts), 1)
+
+    def test_rejected_submission_is_failed_and_posted_again(self):
+        with self.assertRaises(KeyError):
+            self.journal.submit(_FakeClient(rejected=True), 'vm1', {'a': 1})
+        self.assertEqual(self.journal.get('vm1')['state'], 'FAILED')
+        self.assertEqual(self.journal.unconfirmed(), [])
+
+        client = _FakeClient()
+        self.assertEqual(self.journal.submit(client, 'vm1', {'a': 1}), 'request-1')
+
+    def test_concurrent_submissions_of_a_key_post_once(self):
+        client = _FakeClient(latency=0.1)
+        results = []
+
+        def submit():
+            try:
+                results.append(self.journal.submit(client, 'vm1', {'a': 1}))
+            except UnconfirmedSubmission:
+                results.append(None)
+
+        threads = [threading.Thread(target=submit) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(client.posts), 1)
+        self.assertEqual(results.count('request-1'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from vra7_rest_wrapper.helpers import formatTimestamp
+from vra7_rest_wrapper.leases import LeaseReport
+
+from .fakes import FakeClient, FakeCollection
+
+NOW = datetime(2026, 1, 1)
+
+
+def _reported(report, now):
+    return sorted(row['id'] for rows in report.report(now).values() for row in rows)
+
+
+class LeaseReportTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.resources = FakeCollection(start=NOW)
+        for i in range(30):
+            self.leaseEnds('vm{0:02d}'.format(i), days=i * 2)
+        self.client = FakeClient(self.resources)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def leaseEnds(self, id, days):
+        self.resources.update(id, name=id, lease={'end': formatTimestamp(NOW + timedelta(days=days))})
+
+    def report(self):
+        return LeaseReport(self.client, snapshot=os.path.join(self.directory, 'leases.json'), horizon=14, limit=7)
+
+    def assertMatchesFullRefresh(self, incremental, now):
+        full = LeaseReport(self.client, horizon=14, limit=7, serverFilter=False)
+        full.refresh(full=True)
+        self.assertEqual(sorted(incremental.rows), sorted(full.rows))
+        self.assertEqual(_reported(incremental, now), _reported(full, now))
+
+    def test_incremental_refresh_matches_full_refresh(self):
+        self.report().refresh()
+
+        self.leaseEnds('vm03', days=60)
+        self.resources.delete('vm05')
+        self.resources.update('vm30', name='vm30', lease={'end': formatTimestamp(NOW + timedelta(days=1))})
+
+        report = self.report()
+        report.refresh()
+        self.assertNotIn('vm03', _reported(report, NOW))
+        self.assertNotIn('vm05', report.rows)
+        self.assertIn('vm30', _reported(report, NOW))
+        self.assertMatchesFullRefresh(report, NOW)
+
+    def test_leases_move_into_the_horizon_without_updates(self):
+        report = self.report()
+        report.refresh()
+        later = NOW + timedelta(days=20)
+
+        self.assertNotIn('vm16', _reported(report, NOW))
+        report.refresh()
+        self.assertIn('vm16', _reported(report, later))
+        self.assertMatchesFullRefresh(report, later)
+
+
+if __name__ == '__main__':
+    unittest.main()
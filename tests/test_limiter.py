@@ -0,0 +1,55 @@
+import threading
+import unittest
+
+from vra7_rest_wrapper.helpers import mapConcurrently
+from vra7_rest_wrapper.limiter import AdaptiveLimiter
+from vra7_rest_wrapper.transport import LimitingSession
+
+from .fakes import FakeResponse
+
+
+class _Session(object):
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+
+    def get(self, url, **kwargs):
+        return FakeResponse({'url': url}, status_code=self.status_code)
+
+
+class AdaptiveLimiterTest(unittest.TestCase):
+    def test_shared_limiter_does_not_deadlock(self):
+        # mapConcurrently holds a slot per item and the session takes one per GET
+        limiter = AdaptiveLimiter(initial=2, minLimit=2, maxLimit=2)
+        session = LimitingSession(_Session(), limiter)
+        # Both outer slots are taken before either thread sends
+        barrier = threading.Barrier(2, timeout=2)
+        results = []
+
+        def get(item):
+            barrier.wait()
+            return session.get('https://h/{0}'.format(item)).status_code
+
+        def run():
+            results.extend(mapConcurrently(get, range(8), limiter=limiter))
+
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+        thread.join(5)
+        self.assertFalse(thread.is_alive(), 'nested slots of one limiter deadlocked')
+        self.assertEqual(results, [200] * 8)
+        self.assertEqual(limiter.metrics()['inFlight'], 0)
+        self.assertEqual(limiter.metrics()['calls'], 8)
+
+    def test_nested_errors_count_for_the_outer_slot(self):
+        limiter = AdaptiveLimiter(initial=2)
+        session = LimitingSession(_Session(status_code=503), limiter)
+
+        with limiter.slot():
+            session.get('https://h/x')
+        self.assertEqual(limiter.metrics()['errors'], 1)
+        self.assertEqual(limiter.metrics()['inFlight'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from vra7_rest_wrapper.metacache import MetadataCache
+
+
+class _Client(object):
+    def __init__(self, host, tenant, username):
+        self.host = host
+        self.tenant = tenant
+        self.username = username
+
+
+class MetadataCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = MetadataCache(os.path.join(self.directory, 'metadata.db'))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_clients_without_tenant_or_username(self):
+        anonymous = _Client('vra.example.com', None, None)
+        user = _Client('vra.example.com', 'vsphere.local', 'user')
+        anonymousKey = MetadataCache.key(anonymous, 'getEntitledCatalogItems')
+        userKey = MetadataCache.key(user, 'getEntitledCatalogItems')
+        self.assertNotEqual(anonymousKey, userKey)
+
+        self.cache.get(anonymousKey, lambda: ['anonymous'])
+        self.cache.get(userKey, lambda: ['user'])
+        self.cache.invalidate(anonymous)
+        self.assertEqual(self.cache.get(anonymousKey, lambda: ['refetched']), ['refetched'])
+        self.assertEqual(self.cache.get(userKey, lambda: ['refetched']), ['user'])
+
+    def test_catalog_items_are_keyed_by_id(self):
+        client = _Client('vra.example.com', 'vsphere.local', 'user')
+        item = {'id': 'item-1', 'name': 'CentOS', 'organization': {'tenantRef': 'vsphere.local', 'subtenantRef': None}}
+        refreshed = {'organization': {'subtenantRef': None, 'tenantRef': 'vsphere.local'}, 'name': 'CentOS 7', 'id': 'item-1'}
+
+        self.assertEqual(MetadataCache.key(client, 'getCatalogItemForm', (item,)),
+                         MetadataCache.key(client, 'getCatalogItemForm', (refreshed,)))
+        self.assertNotEqual(MetadataCache.key(client, 'getCatalogItemForm', (item,)),
+                            MetadataCache.key(client, 'getCatalogItemForm', (dict(item, id='item-2'),)))
+        self.assertEqual(MetadataCache.key(client, 'getEntitledCatalogItems', kwargs={'show': 'json', 'limit': 100}),
+                         MetadataCache.key(client, 'getEntitledCatalogItems', kwargs={'limit': 100, 'show': 'json'}))
+
+
+if __name__ == '__main__':
+    unittest.main()
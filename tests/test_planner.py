@@ -0,0 +1,73 @@
+import threading
+import unittest
+
+from vra7_rest_wrapper.planner import ReservationPlanner
+
+SCHEMA = [{'id': 'computeResource'},
+          {'id': 'resourcePool', 'state': {'dependencies': ['computeResource']}},
+          {'id': 'reservationNetworks', 'isMultiValued': True, 'state': {'dependencies': ['computeResource']}},
+          {'id': 'reservationMemory'}]
+
+
+class _Client(object):
+    tenant = 'vsphere.local'
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = []
+
+    def _call(self, *call):
+        with self.lock:
+            self.calls.append(call)
+
+    def getReservationSchema(self, schemaclassid):
+        self._call('schema')
+        return SCHEMA
+
+    def getComputeResourceForReservation(self, schemaclassid):
+        self._call('computeResources')
+        return {'values': [{'underlyingValue': {'id': id, 'label': id.upper()}} for id in ('cr1', 'cr2')]}
+
+    def getResourceSchemaForReservation(self, schemaclassid, fieldid, computeresourceid):
+        self._call(fieldid, computeresourceid)
+        return {'values': [{'underlyingValue': {'id': '{0}-{1}'.format(computeresourceid, fieldid)}}]}
+
+
+class ReservationPlannerTest(unittest.TestCase):
+    def test_metadata_is_fetched_once_for_many_reservations(self):
+        client = _Client()
+        planner = ReservationPlanner(client, 'Infrastructure.Reservation.Virtual.vSphere', maxWorkers=4)
+
+        payloads = planner.buildReservations([(cr, bg) for cr in ('cr1', 'cr2') for bg in ('bg1', 'bg2', 'bg3')])
+        payloads += planner.buildReservations([('cr1', 'bg4')])
+
+        self.assertEqual(len(payloads), 7)
+        self.assertEqual(sorted(client.calls), sorted([
+            ('schema',), ('computeResources',),
+            ('resourcePool', 'cr1'), ('resourcePool', 'cr2'),
+            ('reservationNetworks', 'cr1'), ('reservationNetworks', 'cr2')]))
+
+        entries = {entry['key']: entry['value'] for entry in payloads[0]['extensionData']['entries']}
+        self.assertEqual(payloads[0]['name'], 'CR1-bg1')
+        self.assertEqual(entries['computeResource'], {'id': 'cr1', 'label': 'CR1', 'type': 'entityRef'})
+        self.assertEqual(entries['resourcePool'], {'id': 'cr1-resourcePool'})
+        # Multi valued fields are left to the caller
+        self.assertNotIn('reservationNetworks', entries)
+
+    def test_extension_values_and_invalidate(self):
+        client = _Client()
+        planner = ReservationPlanner(client, 'Infrastructure.Reservation.Virtual.vSphere', fieldids=['resourcePool'])
+
+        payload = planner.buildReservation('cr2', 'bg1', 'r1', extension={
+            'resourcePool': lambda values: values[-1]['underlyingValue'], 'reservationMemory': {'type': 'complex'}})
+        entries = {entry['key']: entry['value'] for entry in payload['extensionData']['entries']}
+        self.assertEqual(entries['resourcePool'], {'id': 'cr2-resourcePool'})
+        self.assertEqual(entries['reservationMemory'], {'type': 'complex'})
+
+        planner.invalidate()
+        planner.prefetch(['cr2'])
+        self.assertEqual(client.calls.count(('resourcePool', 'cr2')), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import threading
+import unittest
+
+from vra7_rest_wrapper.pool import ClientPool
+
+
+class ClientPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.pool = ClientPool(maxWorkers=4)
+        self.keys = [self.pool.add('vra{0}.example.com'.format(n), 'user', 'password', token='Bearer {0}'.format(n))
+                     for n in range(3)]
+        self.keys.append(self.pool.add('vra0.example.com', 'user', 'password', tenant='other', token='Bearer other'))
+
+    def test_clients_share_sessions_per_host_and_tokens_per_tenant(self):
+        consumer = self.pool.getConsumerClient(self.keys[0])
+        reservation = self.pool.getReservationClient(self.keys[0])
+        otherTenant = self.pool.getConsumerClient(self.keys[3])
+
+        self.assertIs(self.pool.getConsumerClient(self.keys[0]), consumer)
+        self.assertIs(consumer.tokenManager, reservation.tokenManager)
+        self.assertIsNot(consumer.tokenManager, otherTenant.tokenManager)
+        self.assertIs(self.pool.getSession('vra0.example.com'), self.pool.getSession(otherTenant.host))
+        self.assertEqual((consumer.token, otherTenant.token), ('Bearer 0', 'Bearer other'))
+
+    def test_fan_out_queries_every_key_at_the_same_time(self):
+        barrier = threading.Barrier(len(self.keys), timeout=5)
+
+        def query(client):
+            barrier.wait()
+            return [{'name': 'vm', 'token': client.token}]
+
+        merged = self.pool.merge(self.pool.fanOut(query))
+
+        self.assertEqual(sorted((item['_host'], item['_tenant'], item['token']) for item in merged), [
+            ('vra0.example.com', 'other', 'Bearer other'), ('vra0.example.com', 'vsphere.local', 'Bearer 0'),
+            ('vra1.example.com', 'vsphere.local', 'Bearer 1'), ('vra2.example.com', 'vsphere.local', 'Bearer 2')])
+
+    def test_errors_are_collected_per_key(self):
+        def query(client):
+            if client.host == 'vra1.example.com':
+                raise IOError('unreachable')
+            return [{'name': 'vm'}]
+
+        errors = {}
+        results = self.pool.fanOut(query, client='reservation', errors=errors)
+
+        self.assertEqual(list(errors), [('vra1.example.com', 'vsphere.local')])
+        self.assertEqual(len(results), 3)
+        self.assertNotIn(('vra1.example.com', 'vsphere.local'), results)
+        self.assertRaises(IOError, self.pool.fanOut, query)
+
+
+if __name__ == '__main__':
+    unittest.main()
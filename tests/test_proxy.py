@@ -0,0 +1,106 @@
+import json
+import unittest
+from http.client import HTTPConnection
+
+from vra7_rest_wrapper.catalog import ConsumerClient
+from vra7_rest_wrapper.proxy import CachingProxy
+from vra7_rest_wrapper.transport import PROXY_HOST_HEADER
+
+from .fakes import FakeResponse
+
+
+class _Appliance(object):
+    """
+    Behind the proxy: hands out numbered tokens and rejects every token but the latest.
+    """
+
+    def __init__(self):
+        self.authentications = 0
+
+    def request(self, method, url, headers=None, data=None, **kwargs):
+        self.authentications += 1
+        return FakeResponse({'id': 'token-{0}'.format(self.authentications)}, headers={'Content-Type': 'application/json'})
+
+    def get(self, url, headers=None, **kwargs):
+        if headers.get('Authorization') != 'Bearer token-{0}'.format(self.authentications):
+            return FakeResponse({'errors': [{'code': 401}]}, status_code=401)
+        return FakeResponse({'id': url.rsplit('/', 1)[-1], 'name': 'vm'})
+
+
+class _ThroughProxy(object):
+    # Client side session that hands every request to the proxy
+    def __init__(self, proxy):
+        self.proxy = proxy
+
+    def request(self, method, url, headers=None, data=None, **kwargs):
+        host, path = url[len('https://'):].split('/', 1)
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        entry = self.proxy.handle(method, host, '/' + path, dict(headers or {}), data)
+        r = FakeResponse(None, status_code=entry.status, headers=entry.headers)
+        r.content = entry.body
+        r.text = entry.body.decode('utf-8')
+        return r
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+
+class CachingProxyTest(unittest.TestCase):
+    def setUp(self):
+        # Nothing listens on port 1, so forwarded requests fail fast
+        self.proxy = CachingProxy('127.0.0.1:0', hosts=['127.0.0.1:1'], timeout=(1, 1))
+        host, port = self.proxy.start().rsplit(':', 1)
+        self.connection = HTTPConnection(host, int(port), timeout=10)
+
+    def tearDown(self):
+        self.connection.close()
+        self.proxy.stop()
+
+    def get(self, headers):
+        self.connection.request('GET', '/catalog-service/api/consumer/resources', headers=headers)
+        r = self.connection.getresponse()
+        return r.status, json.loads(r.read().decode('utf-8'))
+
+    def test_requires_hosts(self):
+        self.assertRaises(ValueError, CachingProxy, '127.0.0.1:0')
+
+    def test_refuses_hosts_not_allowed(self):
+        status, document = self.get({PROXY_HOST_HEADER: 'example.com'})
+        self.assertEqual(status, 403)
+        self.assertIn('example.com', document['errors'][0]['message'])
+        self.assertEqual(self.proxy.misses, 0)
+
+    def test_errors_are_json(self):
+        status, document = self.get({})
+        self.assertEqual(status, 400)
+        self.assertIn(PROXY_HOST_HEADER, document['errors'][0]['message'])
+
+        status, document = self.get({PROXY_HOST_HEADER: '127.0.0.1:1'})
+        self.assertEqual(status, 502)
+        self.assertTrue(document['errors'][0]['message'])
+
+
+class ProxyTokenTest(unittest.TestCase):
+    def test_expired_token_is_not_served_from_the_token_cache(self):
+        proxy = CachingProxy('127.0.0.1:0', hosts=['vra.example.com'])
+        appliance = proxy.session = _Appliance()
+        client = ConsumerClient('vra.example.com', 'user', 'password', session=_ThroughProxy(proxy))
+        self.assertEqual(client.getResource('1')['id'], '1')
+
+        # The appliance expires the token while the proxy still has it cached
+        appliance.authentications += 1
+        self.assertEqual(client.getResource('2')['id'], '2')
+        self.assertEqual(client.token, 'Bearer token-3')
+
+        # Another script with the same credentials gets the new token from the cache
+        other = ConsumerClient('vra.example.com', 'user', 'password', session=_ThroughProxy(proxy))
+        self.assertEqual(other.token, 'Bearer token-3')
+        self.assertEqual(proxy.tokenHits, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+import json
+import threading
+import time
+import unittest
+
+from vra7_rest_wrapper.deadline import Deadline, DeadlineExceeded
+from vra7_rest_wrapper.transport import CoalescingSession, HedgingSession
+
+from .fakes import FakeResponse
+
+
+class _SlowSession(object):
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def get(self, url, headers=None, **kwargs):
+        with self.lock:
+            self.calls.append(dict(headers or {}))
+        self.release.wait(5)
+        if 'If-None-Match' in (headers or {}):
+            return FakeResponse({}, status_code=304)
+        return FakeResponse({'accept': (headers or {}).get('Accept')})
+
+
+def _inThreads(calls):
+    results = [None] * len(calls)
+
+    def run(i, call):
+        try:
+            results[i] = call()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=run, args=(i, call)) for i, call in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+class CoalescingSessionTest(unittest.TestCase):
+    def setUp(self):
+        self.inner = _SlowSession()
+        self.session = CoalescingSession(self.inner)
+
+    def waitForCalls(self, count):
+        while len(self.inner.calls) < count:
+            threading.Event().wait(0.01)
+
+    def test_identical_gets_share_one_call(self):
+        headers = {'Accept': 'application/json', 'Authorization': 'Bearer a'}
+        threads, results = _inThreads([lambda: self.session.get('https://h/x', headers=dict(headers))] * 4)
+        self.waitForCalls(1)
+        threading.Event().wait(0.1)
+        self.inner.release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.inner.calls), 1)
+        self.assertTrue(all(result.status_code == 200 for result in results))
+
+    def test_conditional_and_different_headers_are_not_shared(self):
+        threads, results = _inThreads([
+            lambda: self.session.get('https://h/x', headers={'Authorization': 'Bearer a', 'If-None-Match': '"1"'}),
+            lambda: self.session.get('https://h/x', headers={'Authorization': 'Bearer a', 'Accept': 'application/json'}),
+            lambda: self.session.get('https://h/x', headers={'Authorization': 'Bearer a', 'Accept': 'text/plain'}),
+        ])
+        self.waitForCalls(3)
+        self.inner.release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([result.status_code for result in results], [304, 200, 200])
+        self.assertEqual(results[2].json(), {'accept': 'text/plain'})
+
+    def test_waiting_for_a_shared_call_honours_the_deadline(self):
+        leader, _ = _inThreads([lambda: self.session.get('https://h/x', headers={})])
+        self.waitForCalls(1)
+        try:
+            with Deadline(0.1):
+                with self.assertRaises(DeadlineExceeded):
+                    self.session.get('https://h/x', headers={})
+        finally:
+            self.inner.release.set()
+            leader[0].join()
+
+
+class _TimedSession(object):
+    def __init__(self, latencies):
+        self.latencies = list(latencies)
+        self.responses = []
+        self.lock = threading.Lock()
+
+    def get(self, url, **kwargs):
+        with self.lock:
+            latency = self.latencies.pop(0) if self.latencies else 0.01
+        threading.Event().wait(latency)
+        response = FakeResponse({'latency': latency})
+        response.closed = False
+
+        def close():
+            response.closed = True
+        response.close = close
+        with self.lock:
+            self.responses.append(response)
+        return response
+
+
+class HedgingSessionTest(unittest.TestCase):
+    def hedging(self, inner, **kwargs):
+        session = HedgingSession(inner, minDelay=0.05, budget=1, minSamples=1, **kwargs)
+        session._observe(0.01)
+        session._tokens = 5
+        return session
+
+    def test_slow_get_is_hedged_and_the_loser_closed(self):
+        inner = _TimedSession([0.5, 0.01])
+        session = self.hedging(inner)
+
+        r = session.get('https://h/x')
+        self.assertEqual(json.loads(r.text), {'latency': 0.01})
+        self.assertEqual((session.hedged, session.hedgeWins), (1, 1))
+        threading.Event().wait(0.6)
+        self.assertEqual([response.closed for response in inner.responses], [False, True])
+
+    def test_busy_hedging_threads_do_not_queue_gets(self):
+        inner = _TimedSession([0.3] * 8)
+        session = self.hedging(inner, maxWorkers=2)
+
+        started = time.time()
+        threads, results = _inThreads([lambda: session.get('https://h/x')] * 8)
+        for thread in threads:
+            thread.join()
+        self.assertLess(time.time() - started, 0.55)
+        self.assertTrue(all(result.status_code == 200 for result in results))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+
+from vra7_rest_wrapper.utilisation import ReservationUtilisation
+
+from .fakes import FakeClient, FakeResponse
+
+
+def _memory(reserved, allocated):
+    values = {'entries': [{'key': 'memoryReservedSizeMb', 'value': {'type': 'integer', 'value': reserved}},
+                          {'key': 'memoryAllocatedSizeMb', 'value': {'type': 'integer', 'value': allocated}}]}
+    return {'key': 'reservationMemory', 'value': {'type': 'complex', 'values': values}}
+
+
+class _Session(object):
+    def __init__(self):
+        self.reservations = {}
+        self.groupListings = 0
+
+    def get(self, url, **kwargs):
+        if '/subtenants' in url:
+            self.groupListings += 1
+            return FakeResponse({'content': [{'id': 'bg1', 'name': 'Development'}], 'metadata': {'totalPages': 1}})
+        listed = [{'id': id, 'version': reservation['version']} for id, reservation in sorted(self.reservations.items())]
+        return FakeResponse({'content': listed, 'metadata': {'totalPages': 1}})
+
+
+class _Client(FakeClient):
+    def getReservation(self, id, show='json'):
+        return self.session.reservations[id]
+
+
+class ReservationUtilisationTest(unittest.TestCase):
+    def test_allocation_changes_without_a_version_change(self):
+        session = _Session()
+        session.reservations['r1'] = {'id': 'r1', 'name': 'r1', 'subTenantId': 'bg1', 'version': 3,
+                                      'extensionData': {'entries': [_memory(8192, 1024)]}}
+        utilisation = ReservationUtilisation(_Client(session), maxWorkers=1)
+        self.assertEqual(utilisation.refresh(), 1)
+        self.assertEqual(utilisation.totals()['Development']['memoryUsed'], 1024)
+
+        # A machine was provisioned on the reservation, its version stays the same
+        session.reservations['r1']['extensionData'] = {'entries': [_memory(8192, 5120)]}
+        self.assertEqual(utilisation.refresh(), 1)
+        self.assertEqual(utilisation.totals()['Development']['memoryUsed'], 5120)
+        self.assertEqual(session.groupListings, 1)
+
+    def test_unknown_business_group_is_listed(self):
+        session = _Session()
+        session.reservations['r1'] = {'id': 'r1', 'name': 'r1', 'subTenantId': 'bg1', 'version': 1,
+                                      'extensionData': {'entries': [_memory(4096, 0)]}}
+        utilisation = ReservationUtilisation(_Client(session), maxWorkers=1)
+        utilisation.refresh()
+        session.reservations['r2'] = {'id': 'r2', 'name': 'r2', 'subTenantId': 'bg2', 'version': 1,
+                                      'extensionData': {'entries': [_memory(2048, 512)]}}
+        self.assertEqual(utilisation.refresh(), 2)
+        self.assertEqual(session.groupListings, 2)
+        del session.reservations['r2']
+        self.assertEqual(utilisation.refresh(), 1)
+        self.assertEqual(sorted(utilisation.rows), ['r1'])
+        self.assertEqual(session.groupListings, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+
+from vra7_rest_wrapper.validator import PayloadValidator, findFields
+
+
+def _field(id, typeId='INTEGER', mandatory=False):
+    facets = [{'type': 'mandatory', 'value': {'type': 'constantClause', 'value': {'type': 'boolean', 'value': True}}}]
+    return {'id': id, 'label': id, 'dataType': {'type': 'primitive', 'typeId': typeId},
+            'state': {'facets': facets if mandatory else []}}
+
+
+class PayloadValidatorTest(unittest.TestCase):
+    def setUp(self):
+        form = {'layout': {'pages': [{'sections': [{'fields': [
+            _field('VirtualMachine.CPU.Count', mandatory=True), _field('VirtualMachine.Memory.Size')]}]}]}}
+        self.validator = PayloadValidator(findFields(form))
+
+    def test_provider_prefixed_keys_match_form_fields(self):
+        payload = {'requestData': {'entries': [
+            {'key': 'provider-VirtualMachine.CPU.Count', 'value': {'type': 'integer', 'value': 2}},
+            {'key': 'provider-VirtualMachine.Memory.Size', 'value': {'type': 'string', 'value': '4096'}}]}}
+
+        errors = self.validator.validate(payload)
+        self.assertEqual(len(errors), 1)
+        self.assertIn('VirtualMachine.Memory.Size', errors[0])
+
+    def test_missing_mandatory_field(self):
+        errors = self.validator.validateMany([{'requestData': {'entries': []}}])
+        self.assertEqual(len(errors[0]), 1)
+        self.assertIn('is required', errors[0][0])
+
+    def test_batched_checks_match_single_payloads(self):
+        constant = lambda type, value: {'type': 'constantClause', 'value': {'type': type, 'value': value}}
+        size = _field('Custom.Size', mandatory=True)
+        size['state']['facets'] += [{'type': 'minValue', 'value': constant('integer', 1)},
+                                    {'type': 'maxValue', 'value': constant('integer', 8)}]
+        tier = _field('Custom.Tier', typeId='STRING')
+        tier['permissibleValues'] = {'type': 'static', 'values': [
+            {'underlyingValue': {'type': 'string', 'value': value}} for value in ('bronze', 'gold')]}
+        owner = _field('Custom.Owner', typeId='STRING', mandatory=True)
+        owner['state']['facets'].append({'type': 'maxLength', 'value': constant('integer', 5)})
+        validator = PayloadValidator([size, tier, owner])
+
+        rows = [(4, 'gold', 'bob'), (0, 'gold', 'bob'), (9, 'silver', ''), (True, None, 'robert'),
+                ('4', 'bronze', None), ([1, 2], 'gold', 'al'), (None, ['gold'], 'al'), (8, 'bronze', 'alice')]
+        payloads = [{'requestData': {'entries': [
+            {'key': key, 'value': {'type': 'string', 'value': value}}
+            for key, value in zip(('Custom.Size', 'Custom.Tier', 'Custom.Owner'), row) if value is not None]}}
+            for row in rows]
+
+        errors = validator.validateMany(payloads)
+        self.assertEqual(errors, [validator.validate(payload) for payload in payloads])
+        self.assertEqual([len(messages) for messages in errors], [0, 1, 3, 2, 2, 1, 2, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+from datetime import datetime
+
+from vra7_rest_wrapper.watcher import RequestWatcher
+
+from .fakes import FakeClient, FakeRequests
+
+
+class RequestWatcherTest(unittest.TestCase):
+    def test_updates_while_paging_do_not_skip_requests(self):
+        appliance = FakeRequests(25, start=datetime(2026, 1, 1))
+        watcher = RequestWatcher(FakeClient(appliance), watermark='2025-12-31T00:00:00Z', overlap=0, limit=10)
+
+        def finishEarlyRequests(appliance):
+            # Requests already read move to the end of the order while the poll is paging
+            if appliance.gets == 2:
+                for i in range(5):
+                    appliance.update('request{0:04d}'.format(i), state='SUCCESSFUL')
+
+        appliance.onGet = finishEarlyRequests
+        events = watcher.poll()
+
+        self.assertEqual(set(event['id'] for event in events if event['state'] == 'IN_PROGRESS'),
+                         set('request{0:04d}'.format(i) for i in range(25)))
+        self.assertEqual(len([event for event in events if event['state'] == 'SUCCESSFUL']), 5)
+
+    def test_more_updates_than_a_page_with_one_timestamp(self):
+        appliance = FakeRequests(0)
+        for i in range(25):
+            appliance.requests['request{0:04d}'.format(i)] = {'id': 'request{0:04d}'.format(i), 'state': 'PENDING_PRE_APPROVAL',
+                                                             'lastUpdated': '2026-01-01T00:00:00.000Z'}
+        watcher = RequestWatcher(FakeClient(appliance), watermark='2025-12-31T00:00:00Z', overlap=0, limit=10)
+
+        self.assertEqual(len(watcher.poll()), 25)
+        self.assertEqual(watcher.poll(), [])
+
+    def test_watermark_is_normalized(self):
+        self.assertEqual(RequestWatcher(FakeClient(None), watermark='2026-01-01T10:00:00Z').watermark,
+                         '2026-01-01T10:00:00.000Z')
+        self.assertEqual(RequestWatcher(FakeClient(None), watermark=datetime(2026, 1, 1, 10)).watermark,
+                         '2026-01-01T10:00:00.000Z')
+
+
+if __name__ == '__main__':
+    unittest.main()
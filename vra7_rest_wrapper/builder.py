@@ -0,0 +1,199 @@
+#!/usr/bin/python
+from __future__ import print_function
+from __future__ import absolute_import
+
+
+def _child(node, name, key):
+    # A copy of the container at node[name], a new dict where the template has nothing
+    try:
+        child = node.get(name) if isinstance(node, dict) else node[name]
+    except (IndexError, TypeError):
+        raise ValueError('{0!r} does not match the request template'.format(key))
+    if isinstance(child, dict):
+        return dict(child)
+    if isinstance(child, list):
+        return list(child)
+    if child is None:
+        return {}
+    raise ValueError('{0!r} does not match the request template'.format(key))
+
+
+class CatalogRequestBuilder(object):
+    def __init__(self, client, catalogItem, template=None, entryTypes=None):
+        """
+        Builds provisioning payloads for a catalog item from cached templates: the
+        request template of getCatalogItemTemplate for build, and a CatalogItemRequest
+        skeleton with the fixed provider entries for buildCatalogItemRequest.
+        Parameters:
+            client = ConsumerClient used to fetch the template
+            catalogItem = catalog item as returned by getEntitledCatalogItemsAsDict
+            template = request template if already acquired via getCatalogItemTemplate
+            entryTypes = optional {key: type} map used for requestData entries
+        """
+
+        self.client = client
+        self.catalogItem = catalogItem
+        self.entryTypes = dict(entryTypes or {})
+        self._template = template
+        self._slots = {}
+        self._requestTemplate = None
+
+    def getTemplate(self):
+        """
+        Function that returns the request template, fetching it on first use only.
+        """
+
+        if self._template is None:
+            self._template = self.client.getCatalogItemTemplate(self.catalogItem)
+
+        return self._template
+
+    def compile(self, keys):
+        """
+        Resolve a set of parameter keys against the template ahead of time.
+        Parameters:
+            keys = iterable of parameter keys (see build)
+        """
+
+        for key in keys:
+            self._slot(key)
+
+    def _slot(self, key):
+        path = self._slots.get(key)
+        if path is not None:
+            return path
+
+        if isinstance(key, tuple):
+            path = key
+        else:
+            # Keys are dotted paths, but vRA property names contain dots too
+            # (e.g. VirtualMachine.Disk0.Size), so match the longest existing
+            # key at each level of the template. Lists are indexed by number.
+            parts = key.split('.')
+            node = self.getTemplate()
+            path = []
+            i = 0
+            while i < len(parts):
+                if isinstance(node, list):
+                    if not parts[i].isdigit() or int(parts[i]) >= len(node):
+                        raise ValueError('{0!r} does not match the request template'.format(key))
+                    path.append(int(parts[i]))
+                    node = node[int(parts[i])]
+                    i += 1
+                    continue
+                for j in range(len(parts), i, -1):
+                    name = '.'.join(parts[i:j])
+                    if isinstance(node, dict) and name in node:
+                        break
+                else:
+                    path.append('.'.join(parts[i:]))
+                    break
+                path.append(name)
+                node = node[name]
+                i = j
+            path = tuple(path)
+
+        self._slots[key] = path
+        return path
+
+    def build(self, params):
+        """
+        Function that returns a new request payload with params filled in.
+        Only the dicts and lists on the path to a filled slot are copied, everything
+        else is shared with the cached template so treat the result as read-only.
+        Parameters:
+            params = {key: value}. key is either a tuple path or a dotted path into
+                     the template e.g. data.vSphere_Machine_1.data.cpu
+        """
+
+        payload = dict(self.getTemplate())
+        copied = {(): payload}
+
+        for key, value in params.items():
+            path = self._slot(key)
+            node = payload
+            for i in range(len(path) - 1):
+                prefix = path[:i + 1]
+                child = copied.get(prefix)
+                if child is None:
+                    child = _child(node, path[i], key)
+                    node[path[i]] = child
+                    copied[prefix] = child
+                node = child
+            if isinstance(node, list) and not (isinstance(path[-1], int) and path[-1] < len(node)):
+                raise ValueError('{0!r} does not match the request template'.format(key))
+            node[path[-1]] = value
+
+        return payload
+
+    def buildMany(self, paramSets):
+        """
+        Generator that yields one request payload per parameter set.
+        Parameters:
+            paramSets = iterable of params dicts (see build)
+        """
+
+        for params in paramSets:
+            yield self.build(params)
+
+    def _entry(self, key, value):
+        type = self.entryTypes.get(key)
+        if type is None:
+            type = "integer" if isinstance(value, int) else "string"
+        return {"key": key, "value": {"type": type, "value": value}}
+
+    def getRequestTemplate(self):
+        """
+        Function that returns the CatalogItemRequest skeleton of the catalog item, built on
+        first use only. It holds the fixed provider entries every request starts with.
+        """
+
+        if self._requestTemplate is None:
+            catalogItem = self.catalogItem
+            self._requestTemplate = {
+                "@type": "CatalogItemRequest",
+                "catalogItemRef": {
+                    "id": catalogItem["id"]
+                },
+                "organization": catalogItem["organization"],
+                "requestedFor": "",
+                "businessGroupId": None,
+                "state": "SUBMITTED",
+                "requestNumber": 0,
+                "requestData": {
+                    "entries": [
+                        self._entry("provider-blueprintId", catalogItem["providerBinding"]["bindingId"]),
+                        self._entry("provider-provisioningGroupId", catalogItem["organization"]["subtenantRef"])
+                    ]
+                }
+            }
+
+        return self._requestTemplate
+
+    def buildCatalogItemRequest(self, forWhom="", businessGroupId=None, params=None, prepareOnly=False):
+        """
+        Function that returns a CatalogItemRequest (requestData.entries form) payload filled
+        in from the cached skeleton of getRequestTemplate. Only the top level and the entries
+        list are new, so treat the result as read-only.
+        Parameters:
+            forWhom = user the request is made on behalf of
+            businessGroupId = id of the business group to provision into
+            params = {key: value} added as requestData entries
+            prepareOnly = create the request as UNSUBMITTED
+        """
+
+        template = self.getRequestTemplate()
+
+        entries = list(template["requestData"]["entries"])
+        entries.append({"key": "requestedFor", "value": {"type": "string", "value": forWhom}})
+        if params:
+            for key, value in params.items():
+                entries.append(self._entry(key, value))
+
+        payload = dict(template)
+        payload["requestedFor"] = forWhom
+        payload["businessGroupId"] = businessGroupId
+        payload["state"] = "UNSUBMITTED" if prepareOnly else "SUBMITTED"
+        payload["requestData"] = {"entries": entries}
+
+        return payload
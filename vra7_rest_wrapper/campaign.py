@@ -0,0 +1,193 @@
+#!/usr/bin/python
+from __future__ import print_function
+from __future__ import absolute_import
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Manager
+from queue import Empty
+
+from .catalog import ConsumerClient
+from .codec import encode
+from .helpers import newSession, outcomeUnknown
+
+# The client, checkpoint and result queue owned by a worker process, set up once by _initWorker
+_workerClient = None
+_workerCheckpoint = None
+_workerResults = None
+
+# Checkpoint state of an item whose POST was sent but whose outcome is not recorded
+SUBMITTING = 'SUBMITTING'
+
+
+def _initWorker(host, tenant, username, password, token, poolSize, checkpoint, results):
+    global _workerClient, _workerCheckpoint, _workerResults
+    # With the credentials a worker can authenticate again when the shared token expires
+    _workerClient = ConsumerClient(host, username, password, token=token, tenant=tenant,
+                                   session=newSession(poolSize))
+    _workerCheckpoint = open(checkpoint, 'a') if checkpoint is not None else None
+    _workerResults = results
+
+
+def _record(checkpoint, record):
+    # One write per line on a file opened for appending, so lines of several workers do not mix
+    checkpoint.write(json.dumps(record) + '\n')
+    checkpoint.flush()
+    os.fsync(checkpoint.fileno())
+
+
+def _runShard(shard):
+    for key, catalogId, payload in shard:
+        # Recorded before the POST, so a run killed before the outcome is recorded leaves a trace
+        if _workerCheckpoint is not None:
+            _record(_workerCheckpoint, {'key': key, 'state': SUBMITTING})
+        unknown = False
+        try:
+            if not isinstance(payload, (str, bytes)):
+                payload = encode(payload)
+            if catalogId is None:
+                requestId = _workerClient.requestResource(payload)
+            else:
+                requestId = _workerClient.requestMachine(catalogId, payload)
+            error = None
+        except Exception as e:
+            requestId, error = None, repr(e)
+            unknown = outcomeUnknown(e)
+
+        # A timed out POST may have been accepted, it stays SUBMITTING
+        if _workerCheckpoint is not None and not unknown:
+            _record(_workerCheckpoint, {'key': key, 'requestId': requestId, 'error': error})
+        _workerResults.put((key, requestId, error))
+
+    return len(shard)
+
+
+class CampaignRunner(object):
+    def __init__(self, client, checkpoint=None, processes=None, shardSize=50, poolSize=4):
+        """
+        Submits a large number of provisioning requests from a pool of worker processes.
+        Every worker owns its own pooled session and reuses the token of the given client,
+        and authenticates again with the client's credentials when the token expires.
+        Parameters:
+            client = authenticated ConsumerClient. a client created from a token alone has no
+                     credentials, its workers fail every item once the token expires
+            checkpoint = path of a checkpoint file. workers mark every key here before its
+                         POST and record the outcome as soon as the POST returns. submitted
+                         keys are skipped when the campaign is run again, and so are keys
+                         whose outcome is unknown, see unconfirmed
+            processes = number of worker processes. defaults to the number of cpus
+            shardSize = number of requests handed to a worker at a time
+            poolSize = number of pooled connections per worker
+        """
+
+        self.client = client
+        self.checkpoint = checkpoint
+        self.processes = processes
+        self.shardSize = shardSize
+        self.poolSize = poolSize
+        self.errors = {}
+        self.unconfirmed = set()
+
+    def loadCheckpoint(self):
+        """
+        Function that returns {key: requestId} for requests already submitted. Keys that
+        were marked before their POST without a recorded outcome, because the run was
+        killed or the POST timed out, are put in self.unconfirmed: they may or may not
+        have been submitted. Check them in vRA, then call confirm or discard.
+        """
+
+        submitted = {}
+        self.unconfirmed = set()
+        if self.checkpoint is None or not os.path.exists(self.checkpoint):
+            return submitted
+
+        with open(self.checkpoint) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A partly written last line from an interrupted run
+                    continue
+                if record.get('state') == SUBMITTING:
+                    self.unconfirmed.add(record['key'])
+                    continue
+                self.unconfirmed.discard(record['key'])
+                if record.get('requestId'):
+                    submitted[record['key']] = record['requestId']
+
+        return submitted
+
+    def _append(self, record):
+        with open(self.checkpoint, 'a') as f:
+            _record(f, record)
+
+    def confirm(self, key, requestId):
+        """
+        Record that an unconfirmed item was submitted, as request requestId.
+        """
+
+        self._append({'key': key, 'requestId': requestId, 'error': None})
+
+    def discard(self, key):
+        """
+        Record that an unconfirmed item was not submitted, so the next run submits it.
+        """
+
+        self._append({'key': key, 'requestId': None, 'error': 'discarded'})
+
+    def run(self, items, progress=None):
+        """
+        Function that submits every item and returns {key: requestId}, including
+        requests submitted by previous runs. Failed items are listed in self.errors.
+        Parameters:
+            items = iterable of (key, payload) or (key, catalogId, payload). key must be
+                    a unique string. items with a catalogId are submitted
+                    with requestMachine, others with requestResource. unconfirmed items
+                    are not submitted
+            progress = callable(done, total) called as every item completes
+        """
+
+        submitted = self.loadCheckpoint()
+        self.errors = {}
+
+        pending = []
+        for item in items:
+            if len(item) == 2:
+                item = (item[0], None, item[1])
+            if item[0] not in submitted and item[0] not in self.unconfirmed:
+                pending.append(item)
+
+        total = len(pending)
+        if not total:
+            return submitted
+
+        shards = [pending[i:i + self.shardSize] for i in range(0, total, self.shardSize)]
+        done = 0
+
+        with Manager() as manager:
+            results = manager.Queue()
+            initargs = (self.client.host, self.client.tenant, self.client.username, self.client.password,
+                        self.client.token, self.poolSize, self.checkpoint, results)
+            with ProcessPoolExecutor(max_workers=self.processes, initializer=_initWorker,
+                                     initargs=initargs) as executor:
+                futures = [executor.submit(_runShard, shard) for shard in shards]
+                while done < total:
+                    try:
+                        key, requestId, error = results.get(timeout=0.5)
+                    except Empty:
+                        if all(future.done() for future in futures):
+                            # Raises if a worker died, what it submitted is in the checkpoint
+                            for future in futures:
+                                future.result()
+                            break
+                        continue
+
+                    if requestId is not None:
+                        submitted[key] = requestId
+                    else:
+                        self.errors[key] = error
+                    done += 1
+                    if progress is not None:
+                        progress(done, total)
+
+        return submitted
@@ -0,0 +1,229 @@
+#!/usr/bin/python
+from __future__ import print_function
+from __future__ import absolute_import
+import datetime
+import gzip
+import json
+import re
+import threading
+import time
+
+from requests import HTTPError
+from requests.structures import CaseInsensitiveDict
+
+from .codec import decode
+
+SCRUBBED_TOKEN = 'scrubbed-token'
+RECORDED_HEADERS = ('Content-Type', 'Location', 'ETag', 'Last-Modified')
+
+
+def _path(url):
+    # Cassettes are keyed without scheme and host so they replay against any appliance
+    return re.sub(r'^[a-z]+://[^/]+', '', url)
+
+
+def _text(data):
+    # Bodies are kept in a canonical form so recordings match whichever codec encoded them
+    if data is None:
+        return None
+    if isinstance(data, bytes):
+        data = data.decode('utf-8', 'replace')
+    if not isinstance(data, dict):
+        try:
+            data = json.loads(data)
+        except ValueError:
+            return data
+    return json.dumps(data, sort_keys=True, separators=(',', ':'))
+
+
+class RecordingSession(object):
+    def __init__(self, session, path):
+        """
+        Session wrapper that records every request and response to a cassette file.
+        Authorization headers are not recorded and passwords and tokens are scrubbed.
+        The cassette is written by close().
+        Parameters:
+            session = session to send requests with
+            path = path of the cassette file (gzipped json lines)
+        """
+
+        self.session = session
+        self.path = path
+        self.records = []
+        self._lock = threading.Lock()
+
+    def _record(self, method, url, kwargs, r):
+        body = _text(kwargs.get('data'))
+        responseBody = r.content.decode('utf-8', 'replace')
+
+        if _path(url).startswith('/identity/api/tokens'):
+            if body:
+                body = re.sub(r'"password":"(?:[^"\\]|\\.)*"', '"password":"***"', body)
+            if method == 'POST':
+                responseBody = re.sub(r'"id"\s*:\s*"(?:[^"\\]|\\.)*"', '"id": "{0}"'.format(SCRUBBED_TOKEN), responseBody)
+
+        record = {
+            'method': method,
+            'path': _path(url),
+            'body': body,
+            'status': r.status_code,
+            'headers': {key: r.headers[key] for key in RECORDED_HEADERS if key in r.headers},
+            'response': responseBody,
+            'elapsed': r.elapsed.total_seconds() if getattr(r, 'elapsed', None) is not None else 0.0
+        }
+        with self._lock:
+            self.records.append(record)
+
+    def request(self, method, url, **kwargs):
+        r = self.session.request(method, url, **kwargs)
+        self._record(method, url, kwargs, r)
+        return r
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+    def close(self):
+        """
+        Write the cassette.
+        """
+
+        with self._lock:
+            records = list(self.records)
+        with gzip.open(self.path, 'wt') as f:
+            f.write(json.dumps({'version': 1, 'records': len(records)}) + '\n')
+            for record in records:
+                f.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+
+class ReplayResponse(object):
+    def __init__(self, record, url):
+        """
+        Response served from a cassette, with the attributes of a requests response
+        that the clients use.
+        """
+
+        self.url = url
+        self.status_code = record['status']
+        self.headers = CaseInsensitiveDict(record['headers'])
+        self.text = record['response']
+        self.content = self.text.encode('utf-8')
+        self.elapsed = datetime.timedelta(seconds=record['elapsed'])
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def json(self, **kwargs):
+        return decode(self.content)
+
+    def raise_for_status(self):
+        if 400 <= self.status_code < 500:
+            raise HTTPError('{0} Client Error for url: {1}'.format(self.status_code, self.url), response=self)
+        if 500 <= self.status_code < 600:
+            raise HTTPError('{0} Server Error for url: {1}'.format(self.status_code, self.url), response=self)
+
+    def close(self):
+        pass
+
+
+class ReplaySession(object):
+    def __init__(self, path, latency=0.0, concurrency=None, loop=True):
+        """
+        Session that serves requests from a cassette written by RecordingSession, so
+        client code can be profiled and load tested without an appliance.
+        Recorded responses for the same request are served in order.
+        Parameters:
+            path = path of the cassette file
+            latency = seconds added to every response, 'recorded' to use the recorded
+                      response times, or a callable(record) returning seconds
+            concurrency = maximum number of responses served at the same time, to model
+                          the capacity of an appliance. if this is None there is no limit
+            loop = start again from the first response once the recorded ones run out
+        """
+
+        self.path = path
+        self.latency = latency
+        self.loop = loop
+        self.served = 0
+        self._records = {}
+        self._positions = {}
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(concurrency) if concurrency else None
+
+        with gzip.open(path, 'rt') as f:
+            f.readline()
+            for line in f:
+                record = json.loads(line)
+                self._records.setdefault(self._key(record['method'], record['path'], record['body']), []).append(record)
+
+    def _key(self, method, path, body):
+        # Token requests carry credentials, which were scrubbed, so match them on the path only
+        if path.startswith('/identity/api/tokens'):
+            body = None
+        return method, path, body
+
+    def _next(self, method, url, data):
+        key = self._key(method, _path(url), _text(data))
+        with self._lock:
+            records = self._records.get(key)
+            if not records:
+                raise KeyError('No recorded response for {method} {path}'.format(method=method, path=key[1]))
+            position = self._positions.get(key, 0)
+            if position >= len(records):
+                if not self.loop:
+                    raise KeyError('Recorded responses for {method} {path} ran out'.format(method=method, path=key[1]))
+                position = 0
+            self._positions[key] = position + 1
+            self.served += 1
+            return records[position]
+
+    def request(self, method, url, data=None, **kwargs):
+        record = self._next(method, url, data)
+
+        if callable(self.latency):
+            delay = self.latency(record)
+        elif self.latency == 'recorded':
+            delay = record['elapsed']
+        else:
+            delay = self.latency
+
+        if self._slots is not None:
+            with self._slots:
+                time.sleep(delay)
+        elif delay:
+            time.sleep(delay)
+
+        return ReplayResponse(record, url)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+    def close(self):
+        pass
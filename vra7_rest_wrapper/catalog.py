@@ -2,16 +2,23 @@
 from __future__ import print_function
 from __future__ import absolute_import
 __author__ = 'https://github.com/chelnak'
-import json
-
-import requests
-
-from .helpers import authenticate, checkResponse
+import time
+
+from .builder import CatalogRequestBuilder
+from .codec import decodeResponse, encode
+from .deadline import DEFAULT_TIMEOUT, Deadline, DeadlineExceeded
+from .helpers import TokenManager, checkResponse, entriesAsDict, newSession, printTable
+from .profiling import phase
+from .transport import RefreshingSession
 from prettytable import PrettyTable
 
+# Request states after which a request no longer changes
+REQUEST_FINAL_STATES = ('SUCCESSFUL', 'PARTIALLY_SUCCESSFUL', 'FAILED', 'REJECTED')
+
 
 class ConsumerClient(object):
-    def __init__(self, host, username, password, token='', tenant=None):
+    def __init__(self, host, username, password, token='', tenant=None, session=None, tokenManager=None,
+                 http2=False, compression=True, timeout=DEFAULT_TIMEOUT, proxy=None):
         """
 		Creates a connection to the vRA REST API using the provided
 		username and password.
@@ -21,6 +28,12 @@ class ConsumerClient(object):
                 	passowrd = valid password for above user
 			token = auth token if already acquired via previous client
 	                tenant = tenant for user. if this is NONE it will default to "vsphere.local"
+			session = requests session to share a connection pool with other clients
+			tokenManager = TokenManager to share a token with other clients
+			http2 = send requests over HTTP/2 with httpx. ignored if a session is given
+			compression = ask for compressed responses. ignored if a session is given
+			timeout = (connect, read) request timeout in seconds. ignored if a session is given
+			proxy = host:port of a local proxy.CachingProxy to send requests through. ignored if a session is given
 		"""
 
         if tenant is None:
@@ -30,10 +43,26 @@ class ConsumerClient(object):
         self.username = username
         self.password = password
         self.tenant = tenant
-        if(token==''):
-                self.token = authenticate(host, username, password, tenant)
-        else:
-                self.token = token
+        if session is None:
+            session = newSession(http2=http2, compression=compression, timeout=timeout, proxy=proxy)
+        elif isinstance(session, RefreshingSession):
+            # The session of another client, which refreshes that client's token
+            session = session.session
+        if tokenManager is None:
+            tokenManager = TokenManager(host, username, password, tenant, token=token, session=session)
+            tokenManager.getToken()
+        self.tokenManager = tokenManager
+        # A request whose token expired is sent once more with a new token
+        self.session = RefreshingSession(session, tokenManager)
+        self._builders = {}
+
+    @property
+    def token(self):
+        return self.tokenManager.getToken()
+
+    @token.setter
+    def token(self, token):
+        self.tokenManager.token = token
 
     def getToken(self):
         """
@@ -60,9 +89,9 @@ class ConsumerClient(object):
             'Accept': 'application/json',
             'Authorization': token
         }
-        r = requests.get(url=url, headers=headers, verify=False)
+        r = self.session.get(url=url, headers=headers, verify=False)
         checkResponse(r)
-        resource = r.json()
+        resource = decodeResponse(r)
 
         if show == 'table':
             table = PrettyTable(['Id', 'Name', 'Status', 'Catalog Item'])
@@ -71,7 +100,7 @@ class ConsumerClient(object):
                 resource['catalogItem']['label']
             ])
 
-            print(table)
+            printTable(table)
 
         elif show == 'json':
             return resource
@@ -93,9 +122,9 @@ class ConsumerClient(object):
             'Accept': 'application/json',
             'Authorization': token
         }
-        r = requests.get(url=url, headers=headers, verify=False)
+        r = self.session.get(url=url, headers=headers, verify=False)
         checkResponse(r)
-        resource = r.json()
+        resource = decodeResponse(r)
 
         if show == 'table':
 
@@ -105,7 +134,7 @@ class ConsumerClient(object):
                         resource['content'][0]['catalogItem']['label']
                     ])
 
-            print(table)
+            printTable(table)
 
         elif show == 'json':
             return resource['content'][0]
@@ -128,9 +157,9 @@ class ConsumerClient(object):
             'Accept': 'application/json',
             'Authorization': token
         }
-        r = requests.get(url=url, headers=headers, verify=False)
+        r = self.session.get(url=url, headers=headers, verify=False)
         checkResponse(r)
-        resource = r.json()
+        resource = decodeResponse(r)
 
         if show == 'table':
 
@@ -141,7 +170,7 @@ class ConsumerClient(object):
                     item['resourceTypeRef']['label'], item['status'],
                     ])
 
-            print(table)
+            printTable(table)
 
         elif show == 'json':
             return resource
@@ -155,8 +184,8 @@ class ConsumerClient(object):
         if resource is None:
             resource = self.getResource(id)
         resourceDataEntries = resource["resourceData"]["entries"]
-        keys = set(entry["key"] for entry in resourceDataEntries)
-        return {key: [entry.get("value") for entry in resourceDataEntries if entry["key"] == key] for key in keys}
+        with phase('transform'):
+            return entriesAsDict(resourceDataEntries)
 
     def getMachineStatus(self, id=None, resource=None):
         resourceDataDict = self.getResourceDataEntriesAsDict(id=id, resource=resource)
@@ -180,9 +209,9 @@ class ConsumerClient(object):
             'Accept': 'application/json',
             'Authorization': token
         }
-        r = requests.get(url=url, headers=headers, verify=False)
+        r = self.session.get(url=url, headers=headers, verify=False)
         checkResponse(r)
-        actions = r.json()
+        actions = decodeResponse(r)
         if raw:
             return actions
         actionsContent = actions["content"]
@@ -206,9 +235,9 @@ class ConsumerClient(object):
             'Accept': 'application/json',
             'Authorization': token
         }
-        r = requests.get(url=url, headers=headers, verify=False)
+        r = self.session.get(url=url, headers=headers, verify=False)
         checkResponse(r)
-        resource = r.json()
+        resource = decodeResponse(r)
         resourceId = resource['content'][0]['id']
 
         return resourceId
@@ -231,9 +260,9 @@ class ConsumerClient(object):
             'Accept': 'application/json',
             'Authorization': token
         }
-        r = requests.get(url=url, headers=headers, verify=False)
+        r = self.session.get(url=url, headers=headers, verify=False)
         checkResponse(r)
-        resources = r.json()
+        resources = decodeResponse(r)
 
         if show == 'table':
             table = PrettyTable(['Id', 'Name'])
@@ -241,7 +270,7 @@ class ConsumerClient(object):
             for i in resources['content']:
                 table.add_row([i['id'], i['name']])
 
-            print(table)
+            printTable(table)
 
         elif show == 'json':
             return resources['content']
@@ -273,7 +302,7 @@ class ConsumerClient(object):
             for i in entries:
                 table.add_row([i['key'], i['value']['value']])
 
-            print(table)
+            printTable(table)
 
         elif show == 'json':
             return entries
@@ -300,9 +329,9 @@ class ConsumerClient(object):
             'Accept': 'application/json',
             'Authorization': token
         }
-        r = requests.get(url=url, headers=headers, verify=False)
+        r = self.session.get(url=url, headers=headers, verify=False)
         checkResponse(r)
-        items = r.json()
+        items = decodeResponse(r)
 
         if show == 'table':
             table = PrettyTable(['Id', 'Name'])
@@ -311,7 +340,7 @@ class ConsumerClient(object):
                 table.add_row([i['catalogItem']['id'],
                                i['catalogItem']['name']])
 
-            print(table)
+            printTable(table)
 
         elif show == 'json':
             return items['content']
@@ -330,9 +359,9 @@ class ConsumerClient(object):
             'Accept': 'application/json',
             'Authorization': token
         }
-        r = requests.get(url=url, headers=headers, verify=False)
+        r = self.session.get(url=url, headers=headers, verify=False)
         checkResponse(r)
-        form = r.json()
+        form = decodeResponse(r)
         return form
 
     def getCatalogItemTemplate(self, catalogItem):
@@ -344,9 +373,9 @@ class ConsumerClient(object):
             'Accept': 'application/json',
             'Authorization': token
         }
-        r = requests.get(url=url, headers=headers, verify=False)
+        r = self.session.get(url=url, headers=headers, verify=False)
         checkResponse(r)
-        form = r.json()
+        form = decodeResponse(r)
         return form
 
     def getCatalogItemFormDetails(self, catalogItem):
@@ -358,15 +387,15 @@ class ConsumerClient(object):
             'Accept': 'application/json',
             'Authorization': token
         }
-        r = requests.get(url=url, headers=headers, verify=False)
+        r = self.session.get(url=url, headers=headers, verify=False)
         checkResponse(r)
-        form = r.json()
+        form = decodeResponse(r)
         return form
 
     def getCatalogItemFormDetailsEntries(self, catalogItem):
         entries = self.getCatalogItemFormDetails(catalogItem)["values"]["entries"]
-        keys = set(entry["key"] for entry in entries)
-        return {key: [entry.get("value") for entry in entries if entry["key"] == key] for key in keys}
+        with phase('transform'):
+            return entriesAsDict(entries)
 
     def getRequest(self, id, show='table'):
         """
@@ -385,16 +414,16 @@ class ConsumerClient(object):
             'Accept': 'application/json',
             'Authorization': token
         }
-        r = requests.get(url=url, headers=headers, verify=False)
+        r = self.session.get(url=url, headers=headers, verify=False)
         checkResponse(r)
 
-        request = r.json()
+        request = decodeResponse(r)
 
         if show == 'table':
             table = PrettyTable(['Id', 'Request Number', 'Item', 'State'])
             table.add_row([request['id'], request['requestNumber'], request['requestedItemName'], request['state']])
 
-            print(table)
+            printTable(table)
 
         elif show == 'json':
             return request
@@ -417,10 +446,10 @@ class ConsumerClient(object):
             'Accept': 'application/json',
             'Authorization': token
         }
-        r = requests.get(url=url, headers=headers, verify=False)
+        r = self.session.get(url=url, headers=headers, verify=False)
         checkResponse(r)
 
-        items = r.json()
+        items = decodeResponse(r)
 
         if show == 'table':
             table = PrettyTable(['Id', 'Request Number', 'Item', 'State'])
@@ -428,11 +457,34 @@ class ConsumerClient(object):
             for i in items['content']:
                 table.add_row([i['id'], i['requestNumber'], i['requestedItemName'], i['state']])
 
-            print(table)
+            printTable(table)
 
         elif show == 'json':
             return items['content']
 
+    def waitForRequest(self, id, interval=2, timeout=None, states=REQUEST_FINAL_STATES):
+        """
+		Function that polls a request until it reaches one of the given states
+		and returns the request.
+		Parameters:
+			id = the id of the vRA request.
+			interval = seconds to wait between polls.
+			timeout = seconds to wait before giving up. if this is None it waits forever,
+			          or until the budget of an enclosing deadline.Deadline is spent.
+			states = request states that end the wait.
+		"""
+
+        with Deadline(timeout) as deadline:
+            while True:
+                request = self.getRequest(id, show='json')
+                if request['state'] in states:
+                    return request
+                left = deadline.remaining()
+                if left is not None and left < interval:
+                    raise DeadlineExceeded('Request {id} is still {state} after {elapsed:.0f} seconds'.format(
+                        id=id, state=request['state'], elapsed=deadline.elapsed()))
+                time.sleep(interval)
+
     def getRequestResource(self, id):
         """
 		Function that will return the resource that were provisioned as a result of a given request.
@@ -449,10 +501,10 @@ class ConsumerClient(object):
             'Accept': 'application/json',
             'Authorization': token
         }
-        r = requests.get(url=url, headers=headers, verify=False)
+        r = self.session.get(url=url, headers=headers, verify=False)
         checkResponse(r)
 
-        resource = r.json()
+        resource = decodeResponse(r)
 
         return resource['content']
 
@@ -461,7 +513,7 @@ class ConsumerClient(object):
 		Function that will submit a request based on payload.
 		payload = json body (example in request.json)
 		Parameters:
-			payload = JSON request body.
+			payload = JSON request body, or a dict such as a CatalogRequestBuilder payload
 		"""
 
         host = self.host
@@ -473,10 +525,10 @@ class ConsumerClient(object):
             'Accept': 'application/json',
             'Authorization': token
         }
-        r = requests.post(url=url,
-                          data=payload,
-                          headers=headers,
-                          verify=False)
+        r = self.session.post(url=url,
+                              data=encode(payload) if isinstance(payload, dict) else payload,
+                              headers=headers,
+                              verify=False)
         checkResponse(r)
 
         id = r.headers['location'].split('/')[7]
@@ -488,7 +540,7 @@ class ConsumerClient(object):
 		Function that will submit a request based on payload.
 		payload = json body (example in request.json)
 		Parameters:
-			payload = JSON request body.
+			payload = JSON request body, or a dict such as a CatalogRequestBuilder payload
 		"""
 
         host = self.host
@@ -500,97 +552,66 @@ class ConsumerClient(object):
             'Accept': 'application/json',
             'Authorization': token
         }
-        r = requests.post(url=url,
-                          data=payload,
-                          headers=headers,
-                          verify=False)
+        r = self.session.post(url=url,
+                              data=encode(payload) if isinstance(payload, dict) else payload,
+                              headers=headers,
+                              verify=False)
         checkResponse(r)
 
         id = r.headers['location'].split('/')[7]
 
         return id
 
-    def performAction(self, resource, actionID=None, requestDataEntries=None):
+    def performAction(self, resource, actionID=None, requestDataEntries=None, timeout=None):
+        """
+		Function that performs a day-2 action on a resource and returns the request id.
+		Parameters:
+			resource = resource dict.
+			actionID = id of the resource action.
+			timeout = seconds for fetching the action template and submitting the request
+			          together. the template is not submitted once this is spent.
+		"""
 
         host = self.host
         token = self.token
 
-        url = 'https://{host}/catalog-service/api/consumer/resources/{id}/actions/{actionID}/requests/template'.format(host=host, id=resource['id'], actionID=actionID)
-        headers = {
-            'Content-Type': 'application/json',
-            'Accept': 'application/json',
-            'Authorization': token
-        }
-        r = requests.get(url=url, headers=headers, verify=False)
-        checkResponse(r)
-        template = r.json()
-
-        url = 'https://{host}/catalog-service/api/consumer/resources/{id}/actions/{actionID}/requests'.format(host=host, id=resource['id'], actionID=actionID)
-        r = requests.post(url=url, data=json.dumps(template), headers=headers, verify=False)
-        checkResponse(r)
-        requestid = r.headers['location'].split('/')[7]
+        with Deadline(timeout) as deadline:
+            url = 'https://{host}/catalog-service/api/consumer/resources/{id}/actions/{actionID}/requests/template'.format(host=host, id=resource['id'], actionID=actionID)
+            headers = {
+                'Content-Type': 'application/json',
+                'Accept': 'application/json',
+                'Authorization': token
+            }
+            r = self.session.get(url=url, headers=headers, verify=False)
+            checkResponse(r)
+            template = decodeResponse(r)
+
+            deadline.check('performAction')
+            url = 'https://{host}/catalog-service/api/consumer/resources/{id}/actions/{actionID}/requests'.format(host=host, id=resource['id'], actionID=actionID)
+            r = self.session.post(url=url, data=encode(template), headers=headers, verify=False)
+            checkResponse(r)
+            requestid = r.headers['location'].split('/')[7]
         return requestid
 
+    def getRequestBuilder(self, catalogItem):
+        """
+		Function that returns the CatalogRequestBuilder of a catalog item, created once
+		per client so its templates are reused across requests.
+		Parameters:
+			catalogItem = catalog item as returned by getEntitledCatalogItemsAsDict
+		"""
+
+        builder = self._builders.get(catalogItem['id'])
+        if builder is None or builder.catalogItem != catalogItem:
+            builder = CatalogRequestBuilder(self, catalogItem)
+            self._builders[catalogItem['id']] = builder
+
+        return builder
+
     #this is broken for our version of vRA and I haven't succesfully fixed yet. Leave alone for now.
     def provisionCatalogItem(self, catalogItem, forWhom="", requestDescription=None, reason=None,
                              vmDescription=None, vmLeaseDays=None, vmMemorySize=None,
                              vmCpuCount=None, businessGroupId=None, params={}, prepareOnly=False):
-        requestData = {
-            "@type": "CatalogItemRequest",
-            "catalogItemRef": {
-                "id": catalogItem["id"]
-            },
-            "organization": catalogItem["organization"],
-            "requestedFor": forWhom,
-            "businessGroupId": businessGroupId,
-            "state": "UNSUBMITTED" if prepareOnly else "SUBMITTED",
-            "requestNumber": 0,
-            "requestData": {
-                "entries": [{
-                    "key": "provider-blueprintId",
-                    "value": {
-                        "type": "string",
-                        "value": catalogItem["providerBinding"]["bindingId"]
-                    }
-                },
-                {
-                    "key": "provider-provisioningGroupId",
-                    "value": {
-                        "type": "string",
-                        "value": catalogItem["organization"]["subtenantRef"]
-                    }
-                },
-                {
-                    "key": "requestedFor",
-                    "value": {
-                        "type": "string",
-                        "value": forWhom
-                    }
-                },
-                # {
-                    # "key": "provider-VirtualMachine.Disk0.Size",
-                    # "value": {
-                        # "type": "string",
-                        # "value": "1"
-                    # }
-                # },
-                # {
-                    # "key": "provider-VirtualMachine.Disk0.Letter",
-                    # "value": {
-                        # "type": "string",
-                        # "value": "C"
-                    # }
-                # },
-                # {
-                    # "key": "provider-VirtualMachine.Disk0.Label",
-                    # "value": {
-                        # "type": "string",
-                        # "value": "main"
-                    # }
-                # }
-                ]
-            }
-        }
         params = params.copy()
         if requestDescription is not None:
             params["description"] = requestDescription
@@ -604,11 +625,7 @@ class ConsumerClient(object):
             params["provider-VirtualMachine.Memory.Size"] = vmMemorySize
         if vmCpuCount is not None:
             params["provider-VirtualMachine.CPU.Count"] = vmCpuCount
-        for key, value in params.items():
-            if isinstance(value, int):
-                type = "integer"
-            else:
-                type = "string"
-            struct = {"key": key, "value": {"type": type, "value": value}}
-            requestData["requestData"]["entries"].append(struct)
+        builder = self.getRequestBuilder(catalogItem)
+        requestData = builder.buildCatalogItemRequest(forWhom=forWhom, businessGroupId=businessGroupId,
+                                                      params=params, prepareOnly=prepareOnly)
         return self.requestResource(requestData)
@@ -0,0 +1,100 @@
+#!/usr/bin/python
+from __future__ import print_function
+from __future__ import absolute_import
+import json
+
+from .profiling import phase
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+def _orjsonDumps(obj):
+    try:
+        return orjson.dumps(obj)
+    except TypeError:
+        # e.g. non string dict keys, which the json module accepts
+        return json.dumps(obj)
+
+
+CODECS = {'json': (json.dumps, json.loads)}
+if ujson is not None:
+    CODECS['ujson'] = (ujson.dumps, ujson.loads)
+if orjson is not None:
+    CODECS['orjson'] = (_orjsonDumps, orjson.loads)
+
+_codec = None
+_dumps = None
+_loads = None
+
+
+def setCodec(name=None):
+    """
+    Select the JSON codec used for request and response bodies.
+
+    Parameters:
+        name = 'orjson', 'ujson' or 'json'. if this is None the fastest installed codec is used.
+    """
+
+    global _codec, _dumps, _loads
+
+    if name is None:
+        name = next(codec for codec in ('orjson', 'ujson', 'json') if codec in CODECS)
+    if name not in CODECS:
+        raise ValueError('JSON codec {name} is not installed'.format(name=name))
+
+    _codec = name
+    _dumps, _loads = CODECS[name]
+
+
+def getCodec():
+    """
+    Function that returns the name of the JSON codec in use.
+    """
+
+    return _codec
+
+
+def encode(obj):
+    """
+    Function that encodes a request body. Returns str or bytes depending on the codec,
+    requests accepts both.
+    """
+
+    return _dumps(obj)
+
+
+def decode(data):
+    """
+    Function that decodes a JSON document from bytes or str.
+    """
+
+    return _loads(data)
+
+
+def decodeResponse(r):
+    """
+    Function that decodes the JSON body of a response straight from its bytes,
+    without building an intermediate str like r.json() does.
+
+    Parameters:
+        r = http response object.
+    """
+
+    # Responses shared between callers (transport.SharedResponse) decode only once
+    sharedJson = getattr(r, 'sharedJson', None)
+    with phase('decode'):
+        if sharedJson is not None:
+            return sharedJson()
+
+        return _loads(r.content)
+
+
+setCodec()
@@ -0,0 +1,120 @@
+#!/usr/bin/python
+from __future__ import print_function
+from __future__ import absolute_import
+import hashlib
+import threading
+from collections import OrderedDict
+
+from .codec import decodeResponse
+from .helpers import checkResponse
+
+
+class ConditionalReader(object):
+    def __init__(self, client, maxEntries=1000):
+        """
+        Reads single objects with conditional requests and keeps the last copy of each.
+        ETag and Last-Modified are used when vRA sends them, otherwise a hash of the
+        response body tells whether the object changed so unchanged bodies are not parsed.
+        Parameters:
+            client = ConsumerClient or ReservationClient
+            maxEntries = number of objects kept, least recently read objects are dropped first
+        """
+
+        self.client = client
+        self.maxEntries = maxEntries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        """
+        Function that returns (document, changed) for a url. changed is False when the
+        document is the same as the one returned by the previous call for the url.
+        Error responses raise requests.HTTPError and drop the cached copy.
+        Parameters:
+            url = url of a single vRA object
+        """
+
+        with self._lock:
+            entry = self._cache.get(url)
+            if entry is not None:
+                self._cache.move_to_end(url)
+
+        headers = {
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+            'Authorization': self.client.token
+        }
+        if entry is not None:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['lastModified']:
+                headers['If-Modified-Since'] = entry['lastModified']
+
+        r = self.client.session.get(url=url, headers=headers, verify=False)
+        if r.status_code == 304 and entry is not None:
+            return entry['document'], False
+
+        checkResponse(r)
+        if not 200 <= r.status_code < 300:
+            # Error bodies are never cached or returned as the document
+            self.invalidate(url)
+            r.raise_for_status()
+            raise RuntimeError('Unexpected {status} response for {url}'.format(status=r.status_code, url=url))
+        digest = hashlib.sha1(r.content).hexdigest()
+        if entry is not None and entry['hash'] == digest:
+            return entry['document'], False
+
+        document = decodeResponse(r)
+        with self._lock:
+            self._cache[url] = {
+                'etag': r.headers.get('ETag'),
+                'lastModified': r.headers.get('Last-Modified'),
+                'hash': digest,
+                'document': document
+            }
+            self._cache.move_to_end(url)
+            while len(self._cache) > self.maxEntries:
+                self._cache.popitem(last=False)
+
+        return document, True
+
+    def getResource(self, id):
+        """
+        Function that returns (resource, changed) for a vRA resource.
+        Parameters:
+            id = id of the vRA resource.
+        """
+
+        return self.get('https://{host}/catalog-service/api/consumer/resources/{id}'.format(
+            host=self.client.host, id=id))
+
+    def getRequest(self, id):
+        """
+        Function that returns (request, changed) for a vRA request.
+        Parameters:
+            id = the id of the vRA request.
+        """
+
+        return self.get('https://{host}/catalog-service/api/consumer/requests/{id}'.format(
+            host=self.client.host, id=id))
+
+    def getReservation(self, reservationid):
+        """
+        Function that returns (reservation, changed) for a reservation.
+        Parameters:
+            reservationid = Id of an existing reservation
+        """
+
+        return self.get('https://{host}/reservation-service/api/reservations/{reservationid}'.format(
+            host=self.client.host, reservationid=reservationid))
+
+    def invalidate(self, url=None):
+        """
+        Drop the cached copy of a url, or of every url if url is None.
+        """
+
+        with self._lock:
+            if url is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(url, None)
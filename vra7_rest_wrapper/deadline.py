@@ -0,0 +1,150 @@
+#!/usr/bin/python
+from __future__ import print_function
+from __future__ import absolute_import
+import functools
+import threading
+import time
+
+# (connect, read) seconds used by sessions from helpers.newSession
+DEFAULT_TIMEOUT = (10, 120)
+# Shortest timeout a request is sent with, urllib3 rejects a timeout of 0
+MIN_TIMEOUT = 0.001
+
+_local = threading.local()
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class Deadline(object):
+    def __init__(self, seconds=None):
+        """
+        Overall time budget for an operation that makes several requests. While a Deadline
+        is entered every request sent through a DeadlineSession on the thread has its
+        timeouts cut to the remaining budget and fails with DeadlineExceeded once it is spent.
+        A Deadline created inside another one never outlasts it.
+        Parameters:
+            seconds = budget in seconds. if this is None the budget of the enclosing
+                      Deadline is used, or there is no budget at all
+        """
+
+        outer = current()
+        self.seconds = seconds
+        self.started = time.time()
+        self.expires = None if seconds is None else self.started + seconds
+        if outer is not None and outer.expires is not None:
+            self.expires = outer.expires if self.expires is None else min(self.expires, outer.expires)
+
+    def remaining(self):
+        """
+        Function that returns the seconds left, or None if there is no budget.
+        """
+
+        if self.expires is None:
+            return None
+        return max(0.0, self.expires - time.time())
+
+    def elapsed(self):
+        """
+        Function that returns the seconds since the Deadline was created.
+        """
+
+        return time.time() - self.started
+
+    def expired(self):
+        return self.expires is not None and time.time() >= self.expires
+
+    def check(self, what='Operation'):
+        """
+        Raise DeadlineExceeded if the budget is spent.
+        Parameters:
+            what = description of the operation for the error message
+        """
+
+        if self.expired():
+            raise DeadlineExceeded('{what} ran out of its {seconds} second budget'.format(
+                what=what, seconds=self.seconds if self.seconds is not None else 'inherited'))
+
+    def clip(self, seconds):
+        """
+        Function that returns seconds cut to the remaining budget.
+        """
+
+        left = self.remaining()
+        if left is None:
+            return seconds
+        if seconds is None:
+            return left
+        return min(seconds, left)
+
+    def bind(self, func):
+        """
+        Function that returns func wrapped to run under this Deadline, so the budget
+        also applies on worker threads.
+        """
+
+        @functools.wraps(func)
+        def bound(*args, **kwargs):
+            with self:
+                return func(*args, **kwargs)
+
+        return bound
+
+    def __enter__(self):
+        if not hasattr(_local, 'stack'):
+            _local.stack = []
+        _local.stack.append(self)
+        return self
+
+    def __exit__(self, *args):
+        # Generators can exit out of order, so only this Deadline's own entry is removed
+        stack = _local.stack
+        if stack and stack[-1] is self:
+            stack.pop()
+        else:
+            for i in range(len(stack) - 1, -1, -1):
+                if stack[i] is self:
+                    del stack[i]
+                    break
+        return False
+
+
+def current():
+    """
+    Function that returns the innermost Deadline entered on this thread, or None.
+    """
+
+    stack = getattr(_local, 'stack', None)
+    return stack[-1] if stack else None
+
+
+def remaining():
+    """
+    Function that returns the seconds left of the current Deadline, or None if
+    there is no budget.
+    """
+
+    deadline = current()
+    return deadline.remaining() if deadline is not None else None
+
+
+def timeoutFor(timeout):
+    """
+    Function that returns the (connect, read) timeout for the next request, cut to the
+    remaining budget of the current Deadline.
+    Parameters:
+        timeout = (connect, read) tuple, a number used for both, or None
+    """
+
+    deadline = current()
+    if deadline is None or deadline.expires is None:
+        return timeout
+
+    if not isinstance(timeout, tuple):
+        timeout = (timeout, timeout)
+
+    timeout = tuple(deadline.clip(value) for value in timeout)
+    # The budget can run out between clipping and sending
+    deadline.check('Request')
+    return tuple(max(MIN_TIMEOUT, value) for value in timeout)
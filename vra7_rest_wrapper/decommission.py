@@ -0,0 +1,267 @@
+#!/usr/bin/python
+from __future__ import print_function
+from __future__ import absolute_import
+import threading
+import time
+from datetime import datetime, timedelta
+from queue import Empty, Queue
+
+from .catalog import REQUEST_FINAL_STATES
+from .deadline import Deadline, DeadlineExceeded
+from .helpers import formatTimestamp, iterPages, mapConcurrently, odataString
+from .watcher import RequestWatcher
+
+
+class DecommissionPipeline(object):
+    def __init__(self, client, businessGroup=None, namePrefix=None, requestId=None, actionName='Destroy',
+                 maxWorkers=16, batchSize=50, limiter=None, interval=10, limit=100, fallbackPolls=6):
+        """
+        Destroys every resource matching a filter: discovers them with paged queries,
+        submits the destroy actions in bounded parallel batches and tracks all of the
+        resulting requests with one delta query per interval, streaming progress. A request
+        that has not shown up in the delta query for fallbackPolls polls is fetched on its
+        own, so a missed update cannot keep the pipeline waiting.
+        Child resources whose parent is also selected are left to the parent's destroy.
+        Parameters:
+            client = ConsumerClient
+            businessGroup = only resources of this business group (name)
+            namePrefix = only resources whose name starts with this
+            requestId = only resources provisioned by this request
+            actionName = name of the resource action to perform
+            maxWorkers = maximum number of actions submitted at the same time
+            batchSize = number of resources submitted per batch
+            limiter = limiter.AdaptiveLimiter that sets the number of concurrent submissions
+                      instead of maxWorkers
+            interval = seconds between request status polls
+            limit = The number of entries per page.
+            fallbackPolls = polls after which a request without updates is fetched on its own
+        """
+
+        if businessGroup is None and namePrefix is None and requestId is None:
+            raise ValueError('Give at least one of businessGroup, namePrefix or requestId')
+
+        self.client = client
+        self.businessGroup = businessGroup
+        self.namePrefix = namePrefix
+        self.requestId = requestId
+        self.actionName = actionName
+        self.maxWorkers = maxWorkers
+        self.batchSize = batchSize
+        self.limiter = limiter
+        self.interval = interval
+        self.limit = limit
+        self.fallbackPolls = fallbackPolls
+        self._actions = {}
+        self._lock = threading.Lock()
+
+    def _url(self):
+        if self.requestId is not None:
+            return 'https://{host}/catalog-service/api/consumer/requests/{id}/resources'.format(
+                host=self.client.host, id=self.requestId)
+
+        url = 'https://{host}/catalog-service/api/consumer/resources?$orderby=name%20asc'.format(host=self.client.host)
+        filters = []
+        if self.businessGroup is not None:
+            filters.append("organization/subTenant/name%20eq%20{name}".format(name=odataString(self.businessGroup)))
+        if self.namePrefix is not None:
+            filters.append("startswith(name,{prefix})".format(prefix=odataString(self.namePrefix)))
+        if filters:
+            url += '&$filter=' + '%20and%20'.join(filters)
+        return url
+
+    def discover(self):
+        """
+        Function that returns the resources to destroy.
+        """
+
+        resources = [resource for page in iterPages(self.client, self._url(), limit=self.limit)
+                     for resource in page.get('content', [])]
+        if self.namePrefix is not None:
+            resources = [resource for resource in resources if (resource.get('name') or '').startswith(self.namePrefix)]
+        if self.businessGroup is not None and self.requestId is not None:
+            resources = [resource for resource in resources
+                         if (resource.get('organization') or {}).get('subtenantLabel') in (None, self.businessGroup)]
+
+        selected = set(resource['id'] for resource in resources)
+        return [resource for resource in resources
+                if (resource.get('parentResourceRef') or {}).get('id') not in selected]
+
+    def _actionId(self, resource):
+        # Resources of one type share their action ids, so actions are looked up once per type
+        resourceType = (resource.get('resourceTypeRef') or {}).get('id')
+        with self._lock:
+            actionId = self._actions.get(resourceType)
+        if actionId is None:
+            action = self.client.getResourceActions(resource['id']).get(self.actionName)
+            if action is None:
+                raise ValueError('{name} has no {action} action'.format(name=resource.get('name'), action=self.actionName))
+            actionId = action['id']
+            if resourceType is not None:
+                with self._lock:
+                    self._actions[resourceType] = actionId
+
+        return actionId
+
+    def _submit(self, resource, events):
+        try:
+            requestId = self.client.performAction(resource, actionID=self._actionId(resource))
+        except Exception as e:
+            events.put({'event': 'submitFailed', 'resourceId': resource['id'], 'resource': resource.get('name'),
+                        'error': e})
+            return None
+
+        events.put({'event': 'submitted', 'resourceId': resource['id'], 'resource': resource.get('name'),
+                    'requestId': requestId})
+        return requestId
+
+    def _submitAll(self, resources, events, stop):
+        try:
+            for start in range(0, len(resources), self.batchSize):
+                if stop.is_set():
+                    break
+                mapConcurrently(lambda resource: self._submit(resource, events), resources[start:start + self.batchSize],
+                                maxWorkers=self.maxWorkers, limiter=self.limiter)
+        finally:
+            events.put({'event': 'submittedAll'})
+
+    def stream(self, dryRun=False, timeout=None, stop=None):
+        """
+        Generator that runs the pipeline and yields progress events. Every event is a dict
+        with 'event' set to discovered, submitted, submitFailed, state, completed, timedOut
+        or stopped, and 'done' and 'total' counting resources that have finished. Requests
+        still pending when the timeout passes or stop is set get a timedOut or stopped event.
+        Parameters:
+            dryRun = only discover, yielding a discovered event per resource
+            timeout = seconds to wait for the requests. if this is None it waits forever
+            stop = threading.Event that ends the pipeline early when set
+        """
+
+        resources = self.discover()
+        total = len(resources)
+        if dryRun:
+            for resource in resources:
+                yield {'event': 'discovered', 'resourceId': resource['id'], 'resource': resource.get('name'),
+                       'done': 0, 'total': total}
+            return
+
+        # Polling starts from before the first submission so no transition is missed
+        watcher = RequestWatcher(self.client, interval=self.interval, overlap=60, limit=self.limit,
+                                 watermark=formatTimestamp(datetime.utcnow() - timedelta(seconds=5)))
+        events = Queue()
+        stopSubmitting = threading.Event()
+        submitter = threading.Thread(target=self._submitAll, args=(resources, events, stopSubmitting))
+        submitter.daemon = True
+        submitter.start()
+
+        try:
+            for event in self._track(watcher, events, total, timeout, stop):
+                yield event
+        finally:
+            stopSubmitting.set()
+
+    def _track(self, watcher, events, total, timeout, stop):
+        pending = {}
+        # Final states of requests that finished before their submission was reported
+        finished = {}
+        # Polls since each pending request last showed up in the delta query
+        polls = {}
+        done = 0
+        submitting = True
+        nextPoll = time.time() + self.interval
+
+        # Only entered around the polls, so the budget never applies to the caller between events
+        deadline = Deadline(timeout)
+        while submitting or pending:
+            stopped = stop is not None and stop.is_set()
+            if stopped or deadline.expired():
+                for requestId, resource in pending.items():
+                    yield dict(resource, event='stopped' if stopped else 'timedOut', requestId=requestId,
+                               done=done, total=total)
+                return
+
+            try:
+                event = events.get(timeout=max(0.0, min(nextPoll - time.time(), deadline.clip(self.interval))))
+            except Empty:
+                event = None
+
+            if event is not None:
+                if event['event'] == 'submittedAll':
+                    submitting = False
+                    continue
+                if event['event'] == 'submitted':
+                    pending[event['requestId']] = {'resourceId': event['resourceId'], 'resource': event['resource']}
+                else:
+                    done += 1
+                event.update(done=done, total=total)
+                yield event
+                if event.get('requestId') in finished:
+                    del pending[event['requestId']]
+                    done += 1
+                    yield dict(event, event='completed', state=finished.pop(event['requestId']), done=done)
+                continue
+
+            if time.time() >= nextPoll:
+                nextPoll = time.time() + self.interval
+                try:
+                    with deadline:
+                        changes = list(watcher.poll())
+                        changes.extend(self._fallback(pending, polls, set(change['id'] for change in changes)))
+                except DeadlineExceeded:
+                    # The next round reports the pending requests as timed out
+                    continue
+                for change in changes:
+                    resource = pending.get(change['id'])
+                    if resource is None:
+                        if change['state'] in REQUEST_FINAL_STATES and submitting:
+                            finished[change['id']] = change['state']
+                        continue
+                    if change['state'] in REQUEST_FINAL_STATES:
+                        del pending[change['id']]
+                        polls.pop(change['id'], None)
+                        done += 1
+                        yield dict(resource, event='completed', requestId=change['id'], state=change['state'],
+                                   done=done, total=total)
+                    else:
+                        yield dict(resource, event='state', requestId=change['id'], state=change['state'],
+                                   done=done, total=total)
+
+    def _fallback(self, pending, polls, seen):
+        # Fetches the pending requests that have not shown up in the delta query for a while
+        fetch = []
+        for requestId in pending:
+            polls[requestId] = 0 if requestId in seen else polls.get(requestId, 0) + 1
+            if polls[requestId] >= self.fallbackPolls:
+                polls[requestId] = 0
+                fetch.append(requestId)
+
+        changes = []
+        for requestId in fetch:
+            try:
+                request = self.client.getRequest(requestId, show='json')
+            except Exception:
+                # The next delta query or fallback tries again
+                continue
+            changes.append({'id': requestId, 'state': request['state']})
+        return changes
+
+    def run(self, progress=None, timeout=None):
+        """
+        Function that runs the pipeline and returns {'succeeded': [...], 'failed': [...],
+        'timedOut': [...]} with the events of every resource.
+        Parameters:
+            progress = callable(event) called for every progress event
+            timeout = seconds to wait for the requests. if this is None it waits forever
+        """
+
+        summary = {'succeeded': [], 'failed': [], 'timedOut': []}
+        for event in self.stream(timeout=timeout):
+            if progress is not None:
+                progress(event)
+            if event['event'] == 'completed' and event['state'] == 'SUCCESSFUL':
+                summary['succeeded'].append(event)
+            elif event['event'] in ('completed', 'submitFailed'):
+                summary['failed'].append(event)
+            elif event['event'] == 'timedOut':
+                summary['timedOut'].append(event)
+
+        return summary
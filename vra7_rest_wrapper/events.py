@@ -0,0 +1,333 @@
+#!/usr/bin/python
+from __future__ import print_function
+from __future__ import absolute_import
+import collections
+import functools
+import hmac
+import logging
+import threading
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+import requests
+
+from .catalog import REQUEST_FINAL_STATES
+from .codec import decode, encode
+from .deadline import Deadline, DeadlineExceeded
+
+TOKEN_HEADER = 'X-Vra-Event-Token'
+
+logger = logging.getLogger(__name__)
+
+
+def parseEvent(document):
+    """
+    Function that returns (requestId, state) of an event broker callback. Request events
+    carry the request state, machine lifecycle events carry the lifecycle state, e.g.
+    VMPSMasterWorkflow32.MachineProvisioned.POST. Payloads forwarded by vRO may be
+    nested under payload or data.
+    Parameters:
+        document = decoded callback body
+    """
+
+    if not isinstance(document, dict):
+        return None, None
+    for nested in ('payload', 'data'):
+        if isinstance(document.get(nested), dict) and 'requestId' not in document:
+            document = document[nested]
+
+    requestId = document.get('requestId') or (document.get('request') or {}).get('id')
+    state = document.get('state') or document.get('requestStatus')
+    lifecycle = document.get('lifecycleState')
+    if state is None and isinstance(lifecycle, dict) and lifecycle.get('state'):
+        state = lifecycle['state'] if not lifecycle.get('phase') else '{0}.{1}'.format(lifecycle['state'], lifecycle['phase'])
+
+    return requestId, state
+
+
+class EventDispatcher(object):
+    def __init__(self, history=10000):
+        """
+        Resolves futures for submitted requests from event broker callbacks, so waiting
+        for a request needs no polling. Events that arrive before anyone waits for the
+        request are kept, callbacks can beat the response of the submitting POST.
+        Parameters:
+            history = number of requests whose latest event is kept
+        """
+
+        self.history = history
+        self.received = 0
+        self._futures = {}
+        self._latest = collections.OrderedDict()
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback):
+        """
+        Call callback(requestId, state, event) for every event received. Exceptions of
+        callbacks are logged, they never reach the sender of the event.
+        """
+
+        with self._lock:
+            self._listeners.append(callback)
+
+    def expect(self, requestId, states=REQUEST_FINAL_STATES):
+        """
+        Function that returns a Future resolved with the first event of the request that
+        has one of the given states.
+        Parameters:
+            requestId = the id of the vRA request
+            states = request or lifecycle states that resolve the future
+        """
+
+        future = Future()
+        with self._lock:
+            latest = self._latest.get(requestId)
+            if latest is not None and latest[0] in states:
+                future.set_result(latest[1])
+            else:
+                self._futures.setdefault(requestId, []).append((tuple(states), future))
+
+        return future
+
+    def dispatch(self, event):
+        """
+        Handle one decoded callback. Returns the request id it was for, or None.
+        """
+
+        requestId, state = parseEvent(event)
+        if requestId is None:
+            return None
+
+        with self._lock:
+            self.received += 1
+            self._latest.pop(requestId, None)
+            self._latest[requestId] = (state, event)
+            while len(self._latest) > self.history:
+                self._latest.popitem(last=False)
+
+            resolved = []
+            waiting = []
+            for states, future in self._futures.pop(requestId, []):
+                if state in states:
+                    resolved.append(future)
+                else:
+                    waiting.append((states, future))
+            if waiting:
+                self._futures[requestId] = waiting
+            listeners = list(self._listeners)
+
+        for future in resolved:
+            if not future.done():
+                future.set_result(event)
+        for callback in listeners:
+            try:
+                callback(requestId, state, event)
+            except Exception:
+                logger.exception('Event listener %r failed for request %s', callback, requestId)
+
+        return requestId
+
+    def _forget(self, requestId, future):
+        with self._lock:
+            waiting = [item for item in self._futures.get(requestId, []) if item[1] is not future]
+            if waiting:
+                self._futures[requestId] = waiting
+            else:
+                self._futures.pop(requestId, None)
+
+    def waitFor(self, requestId, timeout=None, states=REQUEST_FINAL_STATES):
+        """
+        Function that waits for an event of the request with one of the given states and
+        returns the event. Raises deadline.DeadlineExceeded after timeout seconds, or when
+        an enclosing deadline.Deadline is spent.
+        """
+
+        future = self.expect(requestId, states)
+        with Deadline(timeout) as deadline:
+            try:
+                return future.result(deadline.remaining())
+            except FutureTimeoutError:
+                self._forget(requestId, future)
+                raise DeadlineExceeded('No {states} event for request {id} after {elapsed:.0f} seconds'.format(
+                    states='/'.join(states), id=requestId, elapsed=deadline.elapsed()))
+
+    def attach(self, client, interval=60):
+        """
+        Replace waitForRequest of a ConsumerClient with one that waits for the event of the
+        request instead of polling every few seconds. The request is fetched once when the
+        event arrives, and every interval seconds in case an event is lost or the event
+        broker is down. Returns the client.
+        Parameters:
+            client = ConsumerClient
+            interval = seconds between reconciliation polls, unless waitForRequest is given one
+        """
+
+        getRequest = client.getRequest
+        reconcile = interval
+
+        @functools.wraps(client.waitForRequest)
+        def waitForRequest(id, interval=None, timeout=None, states=REQUEST_FINAL_STATES):
+            interval = reconcile if interval is None else interval
+            future = self.expect(id, states)
+            with Deadline(timeout) as deadline:
+                try:
+                    while True:
+                        try:
+                            future.result(deadline.clip(interval))
+                            return getRequest(id, show='json')
+                        except FutureTimeoutError:
+                            pass
+                        request = getRequest(id, show='json')
+                        if request['state'] in states:
+                            return request
+                        if deadline.expired():
+                            raise DeadlineExceeded('Request {id} is still {state} after {elapsed:.0f} seconds'.format(
+                                id=id, state=request['state'], elapsed=deadline.elapsed()))
+                finally:
+                    self._forget(id, future)
+
+        client.waitForRequest = waitForRequest
+        return client
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status):
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_POST(self):
+        receiver = self.server.receiver
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+
+        if self.path.split('?')[0] != receiver.path:
+            return self._send(404)
+        if receiver.token is not None and not hmac.compare_digest(self.headers.get(TOKEN_HEADER) or '', receiver.token):
+            return self._send(403)
+        try:
+            event = decode(body)
+        except ValueError:
+            return self._send(400)
+
+        events = event if isinstance(event, list) else [event]
+        if not all(isinstance(event, dict) for event in events):
+            return self._send(400)
+        for event in events:
+            receiver.dispatcher.dispatch(event)
+        self._send(202)
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class EventReceiver(object):
+    def __init__(self, dispatcher=None, address='127.0.0.1:0', path='/vra/events', token=None):
+        """
+        Embedded HTTP endpoint for event broker callbacks, e.g. from a vRO workflow
+        subscribed to request completion and machine lifecycle topics that POSTs the
+        event payload as JSON. Callbacks are handed to an EventDispatcher.
+        Parameters:
+            dispatcher = EventDispatcher. if this is None a new one is created
+            address = host:port to listen on. port 0 picks a free port
+            path = path callbacks are POSTed to
+            token = shared secret expected in the X-Vra-Event-Token header. if this is None
+                    any caller is accepted
+        """
+
+        host, port = address.rsplit(':', 1)
+        self.dispatcher = dispatcher if dispatcher is not None else EventDispatcher()
+        self.address = (host, int(port))
+        self.path = path
+        self.token = token
+        self._server = None
+
+    def start(self):
+        """
+        Start receiving on a background thread. Returns the callback url.
+        """
+
+        self._server = _Server(self.address, _Handler)
+        self._server.receiver = self
+        thread = threading.Thread(target=self._server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        return self.url()
+
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return 'http://{host}:{port}{path}'.format(host=host, port=port, path=self.path)
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+class EventSender(object):
+    def __init__(self, url, token=None):
+        """
+        Local stand-in for the event broker that POSTs callbacks to an EventReceiver,
+        for tests and dry runs without an appliance.
+        Parameters:
+            url = callback url of the receiver
+            token = shared secret of the receiver
+        """
+
+        self.url = url
+        self.token = token
+        self.session = requests.Session()
+
+    def send(self, event):
+        headers = {'Content-Type': 'application/json'}
+        if self.token is not None:
+            headers[TOKEN_HEADER] = self.token
+        r = self.session.post(self.url, data=encode(event), headers=headers, timeout=10)
+        r.raise_for_status()
+        return r
+
+    def requestState(self, requestId, state='SUCCESSFUL'):
+        """
+        Send a request state change event.
+        """
+
+        return self.send({'requestId': requestId, 'state': state})
+
+    def machineLifecycle(self, requestId, machineName, state='VMPSMasterWorkflow32.MachineProvisioned',
+                         phase='POST'):
+        """
+        Send a machine lifecycle event.
+        """
+
+        return self.send({'requestId': requestId, 'machine': {'name': machineName},
+                          'lifecycleState': {'state': state, 'phase': phase}})
+
+    def later(self, delay, method, *args, **kwargs):
+        """
+        Call one of the send methods after delay seconds on a background thread.
+        """
+
+        timer = threading.Timer(delay, method, args, kwargs)
+        timer.daemon = True
+        timer.start()
+        return timer
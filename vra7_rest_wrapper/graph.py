@@ -0,0 +1,247 @@
+#!/usr/bin/python
+from __future__ import print_function
+from __future__ import absolute_import
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .deadline import current
+
+
+class Ref(object):
+    def __init__(self, name, transform=None):
+        """
+        Placeholder for the result of another node, resolved when the node that
+        uses it starts. Create it with RequestGraph.ref.
+        Parameters:
+            name = name of the node whose result is used
+            transform = optional callable applied to the result
+        """
+
+        self.name = name
+        self.transform = transform
+
+    def resolve(self, results):
+        result = results[self.name]
+        if self.transform is not None:
+            result = self.transform(result)
+        return result
+
+
+class _Node(object):
+    def __init__(self, name, func, args, kwargs, after):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.after = set(after)
+        for value in list(args) + list(kwargs.values()):
+            if isinstance(value, Ref):
+                self.after.add(value.name)
+        self.started = None
+        self.finished = None
+
+
+class RequestGraph(object):
+    def __init__(self, maxWorkers=8):
+        """
+        Runs dependent vRA operations (reservations, requests, waits, day-2 actions)
+        as a graph. Independent nodes run at the same time and a node starts as soon
+        as all of the nodes it depends on have finished. Nodes run under the
+        deadline.Deadline of the thread that calls run.
+        Parameters:
+            maxWorkers = maximum number of nodes running at the same time
+        """
+
+        self.maxWorkers = maxWorkers
+        self.nodes = {}
+        self.results = {}
+        self.errors = {}
+        self.skipped = []
+        self._started = None
+
+    def ref(self, name, transform=None):
+        """
+        Function that returns a placeholder for the result of node name. Using it as an
+        argument of another node makes that node depend on name.
+        """
+
+        return Ref(name, transform)
+
+    def add(self, name, func, args=(), kwargs=None, after=()):
+        """
+        Add a node that calls func(*args, **kwargs). Ref arguments are replaced with results.
+        Parameters:
+            name = unique name of the node
+            func = callable to run
+            args = positional arguments
+            kwargs = keyword arguments
+            after = names of nodes that must finish first, in addition to referenced nodes
+        """
+
+        if name in self.nodes:
+            raise ValueError('Node {name} already exists'.format(name=name))
+        self.nodes[name] = _Node(name, func, tuple(args), dict(kwargs or {}), after)
+
+        return name
+
+    def addReservation(self, name, client, payload, after=()):
+        """
+        Add a node that creates a reservation and returns its id.
+        Parameters:
+            client = ReservationClient
+            payload = reservation payload, may be a Ref
+        """
+
+        return self.add(name, client.createReservation, (payload,), after=after)
+
+    def addRequestMachine(self, name, client, catalogId, payload, after=()):
+        """
+        Add a node that requests a catalog item and returns the request id.
+        Parameters:
+            client = ConsumerClient
+            catalogId = id of the entitled catalog item
+            payload = JSON request body or dict (e.g. from CatalogRequestBuilder), may be a Ref
+        """
+
+        return self.add(name, client.requestMachine, (catalogId, payload), after=after)
+
+    def addWaitForRequest(self, name, client, request, interval=2, timeout=None, after=()):
+        """
+        Add a node that waits for a request and returns it. The node fails unless the
+        request is SUCCESSFUL, so its dependents do not run.
+        Parameters:
+            client = ConsumerClient
+            request = request id, or a Ref to the node that submitted it e.g. graph.ref('submit')
+        """
+
+        def waitForSuccess(id):
+            result = client.waitForRequest(id, interval=interval, timeout=timeout)
+            if result['state'] != 'SUCCESSFUL':
+                raise RuntimeError('Request {id} finished {state}'.format(id=id, state=result['state']))
+            return result
+
+        return self.add(name, waitForSuccess, (request,), after=after)
+
+    def addAction(self, name, client, resource, actionID, after=()):
+        """
+        Add a node that performs a day-2 action on a resource and returns the request id.
+        Parameters:
+            client = ConsumerClient
+            resource = resource dict, may be a Ref
+            actionID = id of the resource action
+        """
+
+        return self.add(name, client.performAction, (resource,), {'actionID': actionID}, after=after)
+
+    def _order(self):
+        # Kahn's algorithm, also catches unknown names and cycles before anything runs
+        remaining = {}
+        for node in self.nodes.values():
+            for dependency in node.after:
+                if dependency not in self.nodes:
+                    raise ValueError('Node {name} depends on unknown node {dependency}'.format(
+                        name=node.name, dependency=dependency))
+            remaining[node.name] = len(node.after)
+
+        ready = [name for name, count in remaining.items() if count == 0]
+        seen = 0
+        while ready:
+            name = ready.pop()
+            seen += 1
+            for other in self.nodes.values():
+                if name in other.after:
+                    remaining[other.name] -= 1
+                    if remaining[other.name] == 0:
+                        ready.append(other.name)
+        if seen != len(self.nodes):
+            raise ValueError('The graph has a cycle')
+
+    def _run(self, node):
+        node.started = time.time()
+        try:
+            args = [arg.resolve(self.results) if isinstance(arg, Ref) else arg for arg in node.args]
+            kwargs = {key: value.resolve(self.results) if isinstance(value, Ref) else value
+                      for key, value in node.kwargs.items()}
+            return node.func(*args, **kwargs)
+        finally:
+            node.finished = time.time()
+
+    def run(self):
+        """
+        Function that runs the graph and returns {name: result}. Failed nodes are listed in
+        self.errors and nodes that depend on them are skipped and listed in self.skipped.
+        """
+
+        self._order()
+        self.results = {}
+        self.errors = {}
+        self.skipped = []
+        self._started = time.time()
+
+        waiting = {name: set(node.after) for name, node in self.nodes.items()}
+        running = {}
+        runNode = self._run
+        deadline = current()
+        if deadline is not None:
+            runNode = deadline.bind(runNode)
+
+        with ThreadPoolExecutor(max_workers=self.maxWorkers) as executor:
+            while waiting or running:
+                for name in [name for name, after in waiting.items() if not after]:
+                    del waiting[name]
+                    running[executor.submit(runNode, self.nodes[name])] = name
+
+                if not running:
+                    break
+
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        self.results[name] = future.result()
+                    except Exception as e:
+                        self.errors[name] = e
+                        self._skip(name, waiting)
+                        continue
+                    for after in waiting.values():
+                        after.discard(name)
+
+        return self.results
+
+    def _skip(self, failed, waiting):
+        for name in [name for name, after in waiting.items() if failed in after]:
+            if name in waiting:
+                del waiting[name]
+                self.skipped.append(name)
+                self._skip(name, waiting)
+
+    def timings(self):
+        """
+        Function that returns {name: (start, duration)} in seconds relative to the start of the run.
+        """
+
+        return {name: (node.started - self._started, node.finished - node.started)
+                for name, node in self.nodes.items() if node.finished is not None}
+
+    def criticalPath(self):
+        """
+        Function that returns (path, seconds): the chain of nodes that determined how long
+        the run took, following for every node the dependency that finished last.
+        """
+
+        finished = [node for node in self.nodes.values() if node.finished is not None]
+        if not finished:
+            return [], 0.0
+
+        node = max(finished, key=lambda node: node.finished)
+        end = node.finished
+        path = [node.name]
+        while True:
+            dependencies = [self.nodes[name] for name in node.after if self.nodes[name].finished is not None]
+            if not dependencies:
+                break
+            node = max(dependencies, key=lambda node: node.finished)
+            path.append(node.name)
+        path.reverse()
+
+        return path, end - self._started
@@ -1,11 +1,21 @@
 #!/usr/bin/python
 from __future__ import print_function
 __author__ = 'https://github.com/chelnak'
-import json
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import quote
 
 import requests
 
+from .codec import decodeResponse, encode
+from .deadline import DEFAULT_TIMEOUT, current
+from .profiling import phase
+from .transport import DeadlineSession, HttpxSession, LimitingSession, ProxySession, ThreadLocalSession, acceptEncoding
+
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
+
 
 def checkResponse(r):
     """
@@ -22,7 +32,34 @@ def checkResponse(r):
         #sys.exit(r.status_code)
 
 
-def authenticate(host, user, password, tenant):
+def outcomeUnknown(error):
+    """
+	Function that returns whether a request that raised error may still have been
+	accepted by the appliance, e.g. after a read timeout or a connection reset. Errors
+	raised before the request was sent or after a response arrived return False.
+
+	Parameters:
+		error = the exception raised while sending the request.
+	"""
+
+    if isinstance(error, (requests.exceptions.ConnectTimeout, requests.exceptions.HTTPError)):
+        return False
+    return isinstance(error, (IOError, TimeoutError))
+
+
+def printTable(table):
+    """
+	Prints a PrettyTable, timed as the render phase when profiling.
+
+	Parameters:
+		table = PrettyTable to print.
+	"""
+
+    with phase('render'):
+        print(table)
+
+
+def authenticate(host, user, password, tenant, session=None):
     """
 	Function that will authenticate a user and build.
 
@@ -31,6 +68,8 @@ def authenticate(host, user, password, tenant):
 		user = user account with access to the vRA portal.
 		passowrd = valid password for above user.
 		tenant = tenant for the user.
+		session = session to send the request with. if this is None a one-off connection
+		          with the default timeouts is used.
 	"""
 
     headers = {
@@ -39,13 +78,297 @@ def authenticate(host, user, password, tenant):
     }
     payload = {"username": user, "password": password, "tenant": tenant}
     url = 'https://' + host + '/identity/api/tokens'
-    r = requests.post(url=url,
-                      data=json.dumps(payload),
-                      headers=headers,
-                      verify=False)
+    if session is None:
+        session = DeadlineSession(requests)
+    r = session.post(url=url,
+                     data=encode(payload),
+                     headers=headers,
+                     verify=False)
     checkResponse(r)
-    response = r.json()
+    response = decodeResponse(r)
 
     usr_token = 'Bearer ' + response['id']
 
     return usr_token
+
+
+def iterPages(client, url, limit=100):
+    """
+	Generator that yields every page of a paged vRA collection.
+
+	Parameters:
+		client = ConsumerClient or ReservationClient to send the requests with.
+		url = url of the collection without limit or page parameters.
+		limit = The number of entries per page.
+	"""
+
+    separator = '&' if '?' in url else '?'
+    page = 1
+    while True:
+        pageUrl = '{url}{separator}limit={limit}&page={page}'.format(
+            url=url, separator=separator, limit=limit, page=page)
+        # The token is read for every page, it may be refreshed while the caller is paging
+        headers = {
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+            'Authorization': client.token
+        }
+        r = client.session.get(url=pageUrl, headers=headers, verify=False)
+        checkResponse(r)
+        data = decodeResponse(r)
+
+        yield data
+
+        metadata = data.get('metadata') or {}
+        if page >= metadata.get('totalPages', 1) or not data.get('content'):
+            break
+        page += 1
+
+
+def iterUpdated(client, url, since, limit=100):
+    """
+	Generator that yields the entries of a vRA collection updated at or after since, in
+	lastUpdated order. Pages are fetched by lastUpdated rather than by page number, so
+	entries updated while paging do not shift others past the pages already read.
+
+	Parameters:
+		client = ConsumerClient or ReservationClient to send the requests with.
+		url = url of the collection without $filter, $orderby, limit or page parameters.
+		since = lastUpdated timestamp to start from, as formatted by formatTimestamp.
+		limit = The number of entries per page.
+	"""
+
+    separator = '&' if '?' in url else '?'
+    page = 1
+    # Entries already yielded with the lastUpdated the current page starts from
+    boundary = set()
+    while True:
+        pageUrl = "{url}{separator}$filter=lastUpdated%20ge%20'{since}'&$orderby=lastUpdated%20asc&limit={limit}&page={page}".format(
+            url=url, separator=separator, since=since, limit=limit, page=page)
+        headers = {
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+            'Authorization': client.token
+        }
+        r = client.session.get(url=pageUrl, headers=headers, verify=False)
+        checkResponse(r)
+        content = decodeResponse(r).get('content', [])
+
+        last = since
+        seen = []
+        for entry in content:
+            lastUpdated = formatTimestamp(parseTimestamp(entry['lastUpdated'])) if entry.get('lastUpdated') else since
+            if lastUpdated == since and entry.get('id') in boundary:
+                continue
+            last = max(last, lastUpdated)
+            seen.append((lastUpdated, entry.get('id')))
+            yield entry
+
+        if len(content) < limit:
+            break
+        if last == since:
+            # A whole page shares one timestamp, only then page by number
+            boundary.update(id for lastUpdated, id in seen)
+            page += 1
+        else:
+            boundary = set(id for lastUpdated, id in seen if lastUpdated == last)
+            since, page = last, 1
+
+
+def entriesAsDict(entries, keys=None):
+    """
+	Function that groups vRA key/value entries (e.g. resourceData entries) into
+	{key: [value, ...]} in a single pass.
+
+	Parameters:
+		entries = list of {"key": ..., "value": ...} entries.
+		keys = only collect these keys. if this is None all keys are collected.
+	"""
+
+    grouped = {}
+    for entry in entries:
+        key = entry["key"]
+        if keys is None or key in keys:
+            grouped.setdefault(key, []).append(entry.get("value"))
+
+    return grouped
+
+
+def odataString(value):
+    """
+	Function that returns value as a quoted string literal for a $filter query, with its
+	quotes doubled and characters such as & and # percent-encoded so names like R&D stay
+	inside the filter.
+
+	Parameters:
+		value = string e.g. a business group name.
+	"""
+
+    return "'{0}'".format(quote(value.replace("'", "''"), safe="'"))
+
+
+def parseTimestamp(value):
+    """
+	Function that parses a vRA timestamp e.g. 2017-06-13T09:40:45.231Z into a naive UTC datetime.
+
+	Parameters:
+		value = timestamp string.
+	"""
+
+    for format in (TIMESTAMP_FORMAT, '%Y-%m-%dT%H:%M:%SZ', '%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S'):
+        try:
+            return datetime.strptime(value, format)
+        except ValueError:
+            pass
+    raise ValueError('Unknown timestamp format: {value}'.format(value=value))
+
+
+def formatTimestamp(value):
+    """
+	Function that formats a naive UTC datetime as a vRA timestamp with millisecond precision.
+
+	Parameters:
+		value = datetime.
+	"""
+
+    return value.strftime(TIMESTAMP_FORMAT)[:-4] + 'Z'
+
+
+def _limited(func, limiter):
+    def limited(item):
+        with limiter.slot():
+            return func(item)
+
+    return limited
+
+
+def newSession(poolSize=10, http2=False, compression=True, timeout=DEFAULT_TIMEOUT, limiter=None, proxy=None):
+    """
+	Function that returns a requests session with a connection pool
+	that keeps up to poolSize connections per host alive. Every thread gets
+	its own requests session on the shared pool, see transport.ThreadLocalSession,
+	so the session can be used from many threads at once. Requests time out
+	after timeout and honour the budget of a deadline.Deadline.
+
+	Parameters:
+		poolSize = number of pooled connections per host.
+		http2 = return a transport.HttpxSession that multiplexes requests over HTTP/2 instead.
+		compression = ask for gzip/deflate (and brotli if installed) compressed responses.
+		timeout = (connect, read) timeout in seconds. if this is None requests never time out.
+		limiter = limiter.AdaptiveLimiter that limits the requests in flight. the connection
+		          pool grows to limiter.maxLimit.
+		proxy = host:port of a local proxy.CachingProxy to send requests through, e.g.
+		        transport.PROXY_ADDRESS. http2 and compression are left to the proxy.
+	"""
+
+    if limiter is not None:
+        poolSize = max(poolSize, limiter.maxLimit)
+
+    if proxy is not None:
+        session = ProxySession(proxy, poolSize=poolSize)
+    elif http2:
+        session = HttpxSession(http2=True, poolSize=poolSize, compression=compression)
+    else:
+        adapter = requests.adapters.HTTPAdapter(pool_connections=poolSize, pool_maxsize=poolSize)
+        session = ThreadLocalSession(adapter, headers={'Accept-Encoding': acceptEncoding(compression)})
+
+    if timeout is not None:
+        session = DeadlineSession(session, timeout)
+    if limiter is not None:
+        session = LimitingSession(session, limiter)
+
+    return session
+
+
+class TokenExpired(RuntimeError):
+    pass
+
+
+class TokenManager(object):
+    def __init__(self, host, user, password, tenant, token='', session=None):
+        """
+		Holds the bearer token for a user so that it can be shared between clients
+		and threads. The token is acquired on first use; concurrent callers wait for
+		a single authentication instead of each authenticating.
+
+		Parameters:
+			host = vRA Appliance fqdn.
+			user = user account with access to the vRA portal.
+			passowrd = valid password for above user.
+			tenant = tenant for the user.
+			token = auth token if already acquired.
+			session = session used to authenticate.
+		"""
+
+        self.host = host
+        self.user = user
+        self.password = password
+        self.tenant = tenant
+        self.token = token
+        self.session = session
+        self._lock = threading.Lock()
+
+    def getToken(self):
+        """
+		Function that returns the bearer token, authenticating if there is none yet.
+		"""
+
+        token = self.token
+        if not token:
+            with self._lock:
+                token = self.token
+                if not token:
+                    token = self.token = self._authenticate()
+
+        return token
+
+    def refresh(self, stale=None):
+        """
+		Function that authenticates again and replaces the bearer token.
+
+		Parameters:
+			stale = the token that was rejected. if another thread replaced it in
+			        the meantime that token is returned without authenticating again.
+		Raises TokenExpired when the manager has no credentials.
+		"""
+
+        with self._lock:
+            if stale is not None and self.token and self.token != stale:
+                return self.token
+            token = self.token = self._authenticate()
+
+        return token
+
+    def _authenticate(self):
+        if self.user is None or self.password is None:
+            raise TokenExpired('The token for {host} expired and there are no credentials to authenticate '
+                               'again, create the client with a username and password'.format(host=self.host))
+        return authenticate(self.host, self.user, self.password, self.tenant, session=self.session)
+
+
+def mapConcurrently(func, items, maxWorkers=8, limiter=None):
+    """
+	Calls func for every item on a thread pool and returns the results in order.
+	The calls run under the deadline.Deadline of the calling thread.
+
+	Parameters:
+		func = callable taking a single item.
+		items = iterable of items.
+		maxWorkers = maximum number of concurrent calls.
+		limiter = limiter.AdaptiveLimiter that decides how many calls run at the same time,
+		          up to limiter.maxLimit. maxWorkers is ignored when this is given.
+	"""
+
+    items = list(items)
+    if limiter is not None:
+        maxWorkers = limiter.maxLimit
+        func = _limited(func, limiter)
+    if maxWorkers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+
+    deadline = current()
+    if deadline is not None:
+        func = deadline.bind(func)
+
+    with ThreadPoolExecutor(max_workers=min(maxWorkers, len(items))) as executor:
+        return list(executor.map(func, items))
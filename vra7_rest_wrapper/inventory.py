@@ -0,0 +1,160 @@
+#!/usr/bin/python
+from __future__ import print_function
+from __future__ import absolute_import
+import heapq
+import itertools
+import threading
+from queue import Queue
+
+from .codec import decodeResponse
+from .deadline import current
+from .helpers import checkResponse, iterPages, odataString
+
+
+class InventoryCrawler(object):
+    def __init__(self, client, maxWorkers=8, limit=100, tenant=None, limiter=None):
+        """
+        Crawls the resources of every business group with page level concurrency.
+        Pages of the largest groups are fetched first so one big group does not
+        finish long after all the small ones. Pages are fetched under the
+        deadline.Deadline of the thread that starts the crawl.
+        Parameters:
+            client = ConsumerClient
+            maxWorkers = maximum number of pages fetched at the same time
+            limit = The number of entries per page.
+            tenant = tenant whose business groups are crawled. defaults to the client tenant
+            limiter = limiter.AdaptiveLimiter that sets the number of pages fetched at the
+                      same time instead of maxWorkers
+        """
+
+        self.client = client
+        self.maxWorkers = maxWorkers if limiter is None else limiter.maxLimit
+        self.limiter = limiter
+        self.limit = limit
+        self.tenant = tenant if tenant is not None else client.tenant
+        self.errors = {}
+
+    def getBusinessGroups(self):
+        """
+        Function that returns every business group of the tenant, from all pages.
+        """
+
+        url = 'https://{host}/identity/api/tenants/{tenant}/subtenants?$orderby=name'.format(
+            host=self.client.host, tenant=self.tenant)
+
+        return [group for page in iterPages(self.client, url, limit=self.limit) for group in page.get('content', [])]
+
+    def _pageUrl(self, group, page):
+        return ("https://{host}/catalog-service/api/consumer/resources"
+                "?$filter=organization/subTenant/name%20eq%20{name}&$orderby=name%20asc"
+                "&limit={limit}&page={page}").format(host=self.client.host, name=odataString(group['name']),
+                                                     limit=self.limit, page=page)
+
+    def _fetch(self, group, page):
+        headers = {
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+            'Authorization': self.client.token
+        }
+        if self.limiter is None:
+            r = self.client.session.get(url=self._pageUrl(group, page), headers=headers, verify=False)
+        else:
+            with self.limiter.slot() as slot:
+                r = self.client.session.get(url=self._pageUrl(group, page), headers=headers, verify=False)
+                slot.error = r.status_code == 429 or r.status_code >= 500
+        checkResponse(r)
+
+        return decodeResponse(r)
+
+    def crawl(self, businessGroups=None):
+        """
+        Generator that yields (businessGroup, resources) for each business group as soon as
+        all of its pages are in. Groups that fail are listed in self.errors by name.
+        Parameters:
+            businessGroups = business groups to crawl. if this is None all groups are crawled
+        """
+
+        if businessGroups is None:
+            businessGroups = self.getBusinessGroups()
+        self.errors = {}
+        if not businessGroups:
+            return
+
+        tasks = []
+        counter = itertools.count()
+        condition = threading.Condition()
+        results = Queue()
+        state = {'stop': False}
+
+        def push(priority, index, page):
+            with condition:
+                heapq.heappush(tasks, (priority, next(counter), index, page))
+                condition.notify()
+
+        def work():
+            while True:
+                with condition:
+                    while not tasks and not state['stop']:
+                        condition.wait()
+                    if state['stop']:
+                        return
+                    _, _, index, page = heapq.heappop(tasks)
+                try:
+                    results.put((index, page, self._fetch(businessGroups[index], page), None))
+                except Exception as e:
+                    results.put((index, page, None, e))
+
+        for index in range(len(businessGroups)):
+            push(0, index, 1)
+
+        deadline = current()
+        if deadline is not None:
+            work = deadline.bind(work)
+
+        workers = [threading.Thread(target=work) for _ in range(min(self.maxWorkers, len(businessGroups)))]
+        for worker in workers:
+            worker.daemon = True
+            worker.start()
+
+        pages = {}
+        content = {index: {} for index in range(len(businessGroups))}
+        remaining = len(businessGroups)
+
+        try:
+            while remaining:
+                index, page, data, error = results.get()
+                group = businessGroups[index]
+                if index not in content:
+                    continue
+                if error is not None or 'content' not in data:
+                    self.errors[group['name']] = error if error is not None else data
+                    del content[index]
+                    remaining -= 1
+                    continue
+
+                if page == 1:
+                    totalPages = (data.get('metadata') or {}).get('totalPages') or 1
+                    pages[index] = totalPages
+                    # Groups with more pages go first, spreading their pages over the workers
+                    for nextPage in range(2, totalPages + 1):
+                        push(-totalPages, index, nextPage)
+                content[index][page] = data['content']
+
+                if len(content[index]) == pages.get(index):
+                    resources = [resource for number in sorted(content[index]) for resource in content[index][number]]
+                    del content[index]
+                    remaining -= 1
+                    yield group, resources
+        finally:
+            with condition:
+                state['stop'] = True
+                condition.notify_all()
+
+    def crawlAll(self, businessGroups=None):
+        """
+        Function that returns {business group name: resources} for every business group.
+        Parameters:
+            businessGroups = business groups to crawl. if this is None all groups are crawled
+        """
+
+        return {group['name']: resources for group, resources in self.crawl(businessGroups)}
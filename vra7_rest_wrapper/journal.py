@@ -0,0 +1,244 @@
+#!/usr/bin/python
+from __future__ import print_function
+from __future__ import absolute_import
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from .catalog import REQUEST_FINAL_STATES
+from .codec import decode, encode
+from .helpers import outcomeUnknown
+
+
+class UnconfirmedSubmission(RuntimeError):
+    """
+    Raised when a key is submitted again while its previous POST was interrupted
+    before a request id came back, or is still being submitted by another thread.
+    Resolve an interrupted submission with confirm() or discard().
+    """
+
+
+class ProvisioningJournal(object):
+    def __init__(self, path):
+        """
+        Append-only local journal of submitted provisioning requests, stored in SQLite.
+        Every submission is recorded against a client generated key so a restarted
+        run can skip what was already submitted and carry on waiting for it.
+        Parameters:
+            path = path of the journal database file
+        """
+
+        self.path = path
+        self._lock = threading.Lock()
+        # Held from looking up a key until its SUBMITTING entry is written
+        self._submitLock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS journal ('
+                         'seq INTEGER PRIMARY KEY AUTOINCREMENT, '
+                         'key TEXT NOT NULL, '
+                         'payloadHash TEXT, '
+                         'requestId TEXT, '
+                         'state TEXT NOT NULL, '
+                         'recorded REAL NOT NULL)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS journal_key ON journal (key, seq)')
+
+    def close(self):
+        self._db.close()
+
+    @staticmethod
+    def hashPayload(payload):
+        """
+        Function that returns a stable hash of a payload (dict or json string). A json
+        string hashes the same as the dict it encodes.
+        """
+
+        if isinstance(payload, (str, bytes)):
+            try:
+                payload = decode(payload)
+            except ValueError:
+                pass
+        if not isinstance(payload, (str, bytes)):
+            payload = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+        if not isinstance(payload, bytes):
+            payload = payload.encode('utf-8')
+
+        return hashlib.sha256(payload).hexdigest()
+
+    def _append(self, key, payloadHash, requestId, state):
+        with self._lock:
+            self._db.execute('INSERT INTO journal (key, payloadHash, requestId, state, recorded) '
+                             'VALUES (?, ?, ?, ?, ?)', (key, payloadHash, requestId, state, time.time()))
+
+    def get(self, key):
+        """
+        Function that returns the latest journal entry for a key as a dict, or None.
+        The request id and payload hash are carried over from earlier entries.
+        Parameters:
+            key = client generated key of the submission
+        """
+
+        with self._lock:
+            rows = self._db.execute('SELECT payloadHash, requestId, state, recorded FROM journal '
+                                    'WHERE key = ? ORDER BY seq', (key,)).fetchall()
+        if not rows:
+            return None
+
+        entry = {'key': key, 'payloadHash': None, 'requestId': None}
+        for payloadHash, requestId, state, recorded in rows:
+            entry['payloadHash'] = payloadHash or entry['payloadHash']
+            entry['requestId'] = requestId or entry['requestId']
+            entry['state'] = state
+            entry['recorded'] = recorded
+
+        return entry
+
+    def entries(self):
+        """
+        Function that returns the latest entry of every key as {key: entry}.
+        """
+
+        with self._lock:
+            rows = self._db.execute('SELECT key, payloadHash, requestId, state, recorded FROM journal '
+                                    'ORDER BY seq').fetchall()
+
+        latest = {}
+        for key, payloadHash, requestId, state, recorded in rows:
+            entry = latest.setdefault(key, {'key': key, 'payloadHash': None, 'requestId': None})
+            entry['payloadHash'] = payloadHash or entry['payloadHash']
+            entry['requestId'] = requestId or entry['requestId']
+            entry['state'] = state
+            entry['recorded'] = recorded
+
+        return latest
+
+    def submit(self, client, key, payload, catalogId=None):
+        """
+        Function that submits a request unless the key was submitted before and returns
+        the request id. Raises ValueError if the key was submitted with a different payload,
+        and UnconfirmedSubmission if an earlier submission of the key was interrupted.
+        A POST that fails before vRA accepted it is recorded as FAILED and can be submitted
+        again; one that times out or loses its connection stays SUBMITTING, its outcome is
+        unknown.
+        Parameters:
+            client = ConsumerClient
+            key = client generated key identifying the submission
+            payload = JSON request body (dict or json string)
+            catalogId = submit with requestMachine for this catalog item instead of requestResource
+        """
+
+        payloadHash = self.hashPayload(payload)
+        with self._submitLock:
+            entry = self.get(key)
+            if entry is not None and entry['requestId']:
+                if entry['payloadHash'] != payloadHash:
+                    raise ValueError('Key {key} was already submitted with a different payload'.format(key=key))
+                return entry['requestId']
+            if entry is not None and entry['state'] == 'SUBMITTING':
+                raise UnconfirmedSubmission('Submission of key {key} was interrupted or is in progress and may '
+                                            'have reached vRA, confirm() or discard() it first'.format(key=key))
+
+            # Recorded before the POST so that an interrupted submission is visible as
+            # SUBMITTING without a request id, see unconfirmed()
+            self._append(key, payloadHash, None, 'SUBMITTING')
+
+        if not isinstance(payload, (str, bytes)):
+            payload = encode(payload)
+        try:
+            if catalogId is None:
+                requestId = client.requestResource(payload)
+            else:
+                requestId = client.requestMachine(catalogId, payload)
+        except Exception as e:
+            if not outcomeUnknown(e):
+                self._append(key, None, None, 'FAILED')
+            raise
+
+        self._append(key, payloadHash, requestId, 'SUBMITTED')
+
+        return requestId
+
+    def record(self, key, state):
+        """
+        Append a new state for a submitted key.
+        Parameters:
+            key = client generated key of the submission
+            state = request state e.g. SUCCESSFUL
+        """
+
+        self._append(key, None, None, state)
+
+    def confirm(self, key, requestId):
+        """
+        Record the request id of an interrupted submission that did reach vRA.
+        Parameters:
+            key = client generated key of the submission
+            requestId = the id of the vRA request found for it
+        """
+
+        self._append(key, None, requestId, 'SUBMITTED')
+
+    def discard(self, key):
+        """
+        Record that an interrupted submission did not reach vRA, so it is submitted again.
+        Parameters:
+            key = client generated key of the submission
+        """
+
+        self._append(key, None, None, 'NOT_SUBMITTED')
+
+    def unconfirmed(self):
+        """
+        Function that returns the keys whose submission was interrupted before a request
+        id was returned. These may or may not have reached vRA; submit() refuses them
+        until they are resolved with confirm() or discard().
+        """
+
+        return [key for key, entry in self.entries().items()
+                if entry['state'] == 'SUBMITTING' and not entry['requestId']]
+
+    def pending(self):
+        """
+        Function that returns {key: requestId} for submitted requests that have not
+        reached a final state.
+        """
+
+        return {key: entry['requestId'] for key, entry in self.entries().items()
+                if entry['requestId'] and entry['state'] not in REQUEST_FINAL_STATES}
+
+    def resume(self, client, interval=2, timeout=None, callback=None):
+        """
+        Wait for every pending request, recording final states as they are reached.
+        Only the pending requests are polled, all requests are not listed again.
+        Returns {key: state}.
+        Parameters:
+            client = ConsumerClient
+            interval = seconds to wait between polling rounds
+            timeout = seconds to wait before giving up. if this is None it waits forever
+            callback = callable(key, request) called when a request reaches a final state
+        """
+
+        pending = self.pending()
+        finished = {}
+        started = time.time()
+
+        while pending:
+            for key, requestId in list(pending.items()):
+                request = client.getRequest(requestId, show='json')
+                if request['state'] in REQUEST_FINAL_STATES:
+                    self.record(key, request['state'])
+                    finished[key] = request['state']
+                    del pending[key]
+                    if callback is not None:
+                        callback(key, request)
+            if not pending:
+                break
+            if timeout is not None and time.time() - started + interval > timeout:
+                raise TimeoutError('{count} requests are still pending after {timeout} seconds'.format(
+                    count=len(pending), timeout=timeout))
+            time.sleep(interval)
+
+        return finished
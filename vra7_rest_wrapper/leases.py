@@ -0,0 +1,238 @@
+#!/usr/bin/python
+from __future__ import print_function
+from __future__ import absolute_import
+import bisect
+import json
+import os
+from datetime import datetime, timedelta
+
+from prettytable import PrettyTable
+
+from .codec import decodeResponse
+from .helpers import checkResponse, entriesAsDict, formatTimestamp, iterPages, iterUpdated, parseTimestamp
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# resourceData keys that carry lease information on vSphere machines
+LEASE_KEYS = ('MachineExpirationDate', 'MachineDestructionDate', 'MachineStatus', 'Expire')
+
+
+class LeaseReport(object):
+    def __init__(self, client, snapshot=None, buckets=(0, 7, 14, 30), horizon=None, limit=100,
+                 serverFilter=True, overlap=2):
+        """
+        Report on machines nearing lease expiry, built from paged resource listings.
+        Rows are kept for every resource and the horizon is applied when reporting, so a
+        lease that moves into the horizon as time passes is reported without an update.
+        With a snapshot file later runs only fetch the resources updated since the last run,
+        and fall back to a full refresh when resources were destroyed.
+        Parameters:
+            client = ConsumerClient
+            snapshot = path of a json snapshot file used for incremental refreshes
+            buckets = bucket edges in days left, e.g. (0, 7, 14, 30) gives expired, 0-7, 7-14,
+                      14-30 and 30+ buckets
+            horizon = only report leases ending within this many days. if this is None all
+                      leases are reported
+            limit = The number of entries per page.
+            serverFilter = ask vRA to filter on the lease end date for one-off reports. a
+                           filtered refresh does not keep the rows incremental refreshes
+                           need, so it is only used without a snapshot and the next refresh
+                           is full again. falls back to filtering locally if the appliance
+                           rejects the filter
+            overlap = seconds incremental refreshes reach back behind the watermark so that
+                      updates committed out of order are not missed
+        """
+
+        self.client = client
+        self.snapshot = snapshot
+        self.buckets = tuple(sorted(buckets))
+        self.horizon = horizon
+        self.limit = limit
+        self.serverFilter = serverFilter
+        self.overlap = timedelta(seconds=overlap)
+        self.rows = {}
+        self.watermark = None
+
+        if snapshot is not None and os.path.exists(snapshot):
+            with open(snapshot) as f:
+                data = json.load(f)
+            self.rows = data.get('rows', {})
+            self.watermark = data.get('watermark')
+
+    @staticmethod
+    def extract(resource):
+        """
+        Function that returns the lease row of a resource, reading its resourceData
+        entries in a single pass.
+        Parameters:
+            resource = catalog resource
+        """
+
+        data = entriesAsDict((resource.get('resourceData') or {}).get('entries', []), keys=LEASE_KEYS)
+        lease = resource.get('lease') or {}
+        organization = resource.get('organization') or {}
+        owners = resource.get('owners') or [{}]
+
+        row = {
+            'id': resource['id'],
+            'name': resource.get('name'),
+            'status': resource.get('status'),
+            'owner': owners[0].get('ref'),
+            'businessGroup': organization.get('subtenantLabel'),
+            'leaseStart': lease.get('start'),
+            'leaseEnd': lease.get('end'),
+            'lastUpdated': resource.get('lastUpdated')
+        }
+        for key, values in data.items():
+            value = values[0]
+            row[key] = value.get('value') if isinstance(value, dict) else value
+
+        return row
+
+    def _collection(self):
+        return 'https://{host}/catalog-service/api/consumer/resources'.format(host=self.client.host)
+
+    def _filtered(self):
+        return self.serverFilter and self.horizon is not None and self.snapshot is None
+
+    def _url(self):
+        url = self._collection() + '?$orderby=lastUpdated%20asc'
+        if self._filtered():
+            end = formatTimestamp(datetime.utcnow() + timedelta(days=self.horizon))
+            url += "&$filter=lease/end%20le%20'{end}'".format(end=end)
+        return url
+
+    def _fetch(self):
+        pages = list(iterPages(self.client, self._url(), limit=self.limit))
+        if self._filtered() and 'content' not in pages[0]:
+            # Appliances that do not support filtering on the lease are filtered locally
+            self.serverFilter = False
+            pages = list(iterPages(self.client, self._url(), limit=self.limit))
+
+        return [resource for page in pages for resource in page.get('content', [])]
+
+    def _count(self):
+        headers = {
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+            'Authorization': self.client.token
+        }
+        r = self.client.session.get(url=self._collection() + '?limit=1&page=1', headers=headers, verify=False)
+        checkResponse(r)
+
+        return (decodeResponse(r).get('metadata') or {}).get('totalElements')
+
+    def refresh(self, full=False):
+        """
+        Fetch resources and update the rows. Returns the number of resources fetched.
+        Parameters:
+            full = fetch every resource instead of only those updated since the last run.
+                   a full refresh also drops rows of resources that no longer exist
+        """
+
+        full = full or not self.watermark
+        if full:
+            resources = self._fetch()
+            filtered = self._filtered()
+            self.rows = {}
+            self.watermark = None
+        else:
+            since = formatTimestamp(parseTimestamp(self.watermark) - self.overlap)
+            resources = list(iterUpdated(self.client, self._collection(), since, limit=self.limit))
+
+        for resource in resources:
+            row = self.extract(resource)
+            self.rows[row['id']] = row
+            if row['lastUpdated']:
+                lastUpdated = formatTimestamp(parseTimestamp(row['lastUpdated']))
+                if self.watermark is None or lastUpdated > self.watermark:
+                    self.watermark = lastUpdated
+
+        if full and filtered:
+            # Only resources inside today's horizon were listed, the next refresh lists all
+            self.watermark = None
+        elif not full and self._count() != len(self.rows):
+            # The delta holds every new and updated resource, so more rows than resources
+            # means some were destroyed; only a full listing tells which
+            return len(resources) + self.refresh(full=True)
+
+        if self.snapshot is not None:
+            with open(self.snapshot, 'w') as f:
+                json.dump({'watermark': self.watermark, 'rows': self.rows}, f)
+
+        return len(resources)
+
+    def daysLeft(self, now=None):
+        """
+        Function that returns (ids, days) with the days left on the lease of every row
+        that has a lease end date, computed for the whole fleet at once.
+        Parameters:
+            now = datetime to count from. defaults to the current UTC time
+        """
+
+        if now is None:
+            now = datetime.utcnow()
+
+        ids = []
+        ends = []
+        for id, row in self.rows.items():
+            if row.get('leaseEnd'):
+                ids.append(id)
+                ends.append((parseTimestamp(row['leaseEnd']) - now).total_seconds())
+
+        if numpy is not None:
+            return ids, numpy.asarray(ends, dtype=float) / 86400.0
+        return ids, [end / 86400.0 for end in ends]
+
+    def bucketLabels(self):
+        """
+        Function that returns the bucket labels in order.
+        """
+
+        edges = self.buckets
+        labels = ['expired' if edges[0] == 0 else '< {0}'.format(edges[0])]
+        labels.extend('{0}-{1}'.format(low, high) for low, high in zip(edges, edges[1:]))
+        labels.append('{0}+'.format(edges[-1]))
+
+        return labels
+
+    def report(self, now=None):
+        """
+        Function that returns {bucket label: [row, ...]} with rows sorted by days left.
+        Rows outside the horizon and rows without a lease are left out.
+        Parameters:
+            now = datetime to count from. defaults to the current UTC time
+        """
+
+        ids, days = self.daysLeft(now)
+        labels = self.bucketLabels()
+
+        if numpy is not None:
+            indexes = numpy.searchsorted(numpy.asarray(self.buckets, dtype=float), days, side='right')
+            keep = days <= self.horizon if self.horizon is not None else numpy.ones(len(ids), dtype=bool)
+            order = numpy.argsort(days)
+            selected = [(ids[i], float(days[i]), int(indexes[i])) for i in order if keep[i]]
+        else:
+            selected = sorted(((id, day, bisect.bisect_right(self.buckets, day)) for id, day in zip(ids, days)
+                               if self.horizon is None or day <= self.horizon), key=lambda item: item[1])
+
+        report = {label: [] for label in labels}
+        for id, day, index in selected:
+            report[labels[index]].append(dict(self.rows[id], daysLeft=round(day, 1)))
+
+        return report
+
+    def table(self, now=None):
+        """
+        Function that returns the report as a PrettyTable.
+        """
+
+        table = PrettyTable(['Bucket', 'Days Left', 'Name', 'Owner', 'Business Group', 'Lease End'])
+        for label, rows in self.report(now).items():
+            for row in rows:
+                table.add_row([label, row['daysLeft'], row['name'], row['owner'], row['businessGroup'], row['leaseEnd']])
+
+        return table
@@ -0,0 +1,155 @@
+#!/usr/bin/python
+from __future__ import print_function
+from __future__ import absolute_import
+import threading
+import time
+
+
+class _Slot(object):
+    def __init__(self, limiter):
+        self.limiter = limiter
+        self.error = False
+        self.outer = None
+
+    def __enter__(self):
+        # A thread that already holds a slot of this limiter takes nested slots for free,
+        # so e.g. mapConcurrently(limiter=...) around a LimitingSession cannot deadlock
+        self.outer = getattr(self.limiter._local, 'slot', None)
+        if self.outer is None:
+            self.limiter.acquire()
+            self.limiter._local.slot = self
+        self.started = time.time()
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        if self.outer is not None:
+            self.outer.error = self.outer.error or self.error
+            return False
+        self.limiter._local.slot = None
+        self.limiter.release(time.time() - self.started, error=self.error or kind is not None)
+        return False
+
+
+class AdaptiveLimiter(object):
+    def __init__(self, initial=4, minLimit=1, maxLimit=32, tolerance=1.5, backoff=0.7, smoothing=0.2):
+        """
+        Concurrency limit that adapts to the appliance. The limit grows by about one for
+        every limit calls that complete while latency stays near the lowest latency seen,
+        and is cut back when latency grows past tolerance times that or calls fail.
+        Share one limiter between everything that talks to the same appliance. Slots are
+        re-entrant per thread: a thread that holds a slot, e.g. inside
+        mapConcurrently(limiter=...), sends through a LimitingSession on the same limiter
+        within that slot, so nested use counts once and cannot deadlock.
+        Parameters:
+            initial = starting limit
+            minLimit = the limit never drops below this
+            maxLimit = the limit never grows above this
+            tolerance = latency growth, relative to the lowest latency, that is still flat
+            backoff = factor the limit is multiplied by on errors
+            smoothing = weight of the latest call in the smoothed latency
+        """
+
+        self.minLimit = minLimit
+        self.maxLimit = maxLimit
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.smoothing = smoothing
+        self.inFlight = 0
+        self.calls = 0
+        self.errors = 0
+        self.minLatency = None
+        self.latency = None
+        self._limit = float(max(minLimit, min(maxLimit, initial)))
+        self._lastDecrease = 0.0
+        self._condition = threading.Condition()
+        self._local = threading.local()
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    def acquire(self):
+        """
+        Wait until a call may start.
+        """
+
+        with self._condition:
+            while self.inFlight >= int(self._limit):
+                self._condition.wait()
+            self.inFlight += 1
+
+    def release(self, latency, error=False):
+        """
+        Record a finished call and adjust the limit.
+        Parameters:
+            latency = seconds the call took
+            error = the call failed or the appliance reported it is overloaded
+        """
+
+        with self._condition:
+            self.inFlight -= 1
+            self.calls += 1
+            now = time.time()
+
+            if error:
+                self.errors += 1
+                # One cut per round trip, a burst of failures is one signal
+                if now - self._lastDecrease > (self.latency or 0.0):
+                    self._decrease(self.backoff, now)
+            else:
+                if self.minLatency is None or latency < self.minLatency:
+                    self.minLatency = latency
+                else:
+                    # Drift up slowly so a lasting change of the baseline is picked up
+                    self.minLatency += 0.01 * self.smoothing * (latency - self.minLatency)
+                if self.latency is None:
+                    self.latency = latency
+                else:
+                    self.latency += self.smoothing * (latency - self.latency)
+
+                gradient = self.minLatency * self.tolerance / self.latency if self.latency > 0 else 1.0
+                if gradient >= 1.0:
+                    if self.inFlight + 1 >= int(self._limit):
+                        # Only grow while the limit is actually in use
+                        self._limit = min(self.maxLimit, self._limit + 1.0 / self._limit)
+                elif now - self._lastDecrease > self.latency:
+                    self._decrease(max(self.backoff, gradient), now)
+
+            self._condition.notify_all()
+
+    def _decrease(self, factor, now):
+        self._limit = max(self.minLimit, self._limit * factor)
+        self._lastDecrease = now
+
+    def slot(self):
+        """
+        Context manager that holds one call slot. Exceptions count as errors, set
+        slot.error = True to count a call that did not raise as an error. A slot taken
+        by a thread that already holds one is free and its errors count for the outer one.
+        """
+
+        return _Slot(self)
+
+    def reset(self):
+        """
+        Forget the observed latencies, e.g. after the appliance was scaled.
+        """
+
+        with self._condition:
+            self.minLatency = None
+            self.latency = None
+
+    def metrics(self):
+        """
+        Function that returns the current limit and the observations it is based on.
+        """
+
+        with self._condition:
+            return {
+                'limit': int(self._limit),
+                'inFlight': self.inFlight,
+                'calls': self.calls,
+                'errors': self.errors,
+                'minLatency': self.minLatency,
+                'latency': self.latency
+            }
@@ -0,0 +1,196 @@
+#!/usr/bin/python
+from __future__ import print_function
+from __future__ import absolute_import
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .codec import decode, encode
+
+# Client methods whose results change rarely, with the arguments that make them return data
+CACHED_METHODS = {
+    'getEntitledCatalogItems': {'show': 'json'},
+    'getAllBusinessGroups': {'show': 'json'},
+    'getCatalogItemForm': {},
+    'getCatalogItemFormDetails': {},
+    'getReservationTypes': {},
+    'getReservationSchema': {}
+}
+
+
+def defaultPath():
+    """
+    Function that returns the default cache file, ~/.vra7_rest_wrapper/metadata.db
+    """
+
+    return os.path.join(os.path.expanduser('~'), '.vra7_rest_wrapper', 'metadata.db')
+
+
+def _scope(client):
+    # tenant and username may be None, e.g. for clients created from a token
+    return '|'.join('' if part is None else str(part) for part in (client.host, client.tenant, client.username))
+
+
+def _argument(value):
+    # Catalog items and other vRA entities are keyed by their id, not by their whole document
+    if isinstance(value, dict) and 'id' in value:
+        return value['id']
+    return value
+
+
+class MetadataCache(object):
+    def __init__(self, path=None, ttl=3600, maxStale=7 * 86400):
+        """
+        Persistent SQLite cache of slow-changing metadata (entitled catalog items,
+        business groups, reservation types and schemas) keyed by host, tenant and user,
+        so short-lived scripts start with warm metadata. Entries older than ttl are
+        still served and refreshed on a background thread; entries older than maxStale
+        are fetched before they are returned.
+        Parameters:
+            path = path of the cache database file. defaults to defaultPath()
+            ttl = seconds an entry is fresh
+            maxStale = seconds a stale entry may still be served while it is refreshed
+        """
+
+        if path is None:
+            path = defaultPath()
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        self.path = path
+        self.ttl = ttl
+        self.maxStale = maxStale
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self._refreshing = {}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS metadata ('
+                         'key TEXT PRIMARY KEY, '
+                         'fetched REAL NOT NULL, '
+                         'value BLOB NOT NULL)')
+
+    def close(self):
+        self.wait()
+        self._db.close()
+
+    @staticmethod
+    def key(client, name, args=(), kwargs=None):
+        """
+        Function that returns the cache key of a client call. Arguments that are vRA
+        entities, dicts with an id, are keyed by their id.
+        """
+
+        call = json.dumps([[_argument(arg) for arg in args],
+                           {key: _argument(value) for key, value in (kwargs or {}).items()}],
+                          separators=(',', ':'), sort_keys=True, default=str)
+        return '|'.join((_scope(client), name, call))
+
+    def _read(self, key):
+        with self._lock:
+            row = self._db.execute('SELECT fetched, value FROM metadata WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None, None
+        return row[0], decode(bytes(row[1]))
+
+    def _write(self, key, value):
+        data = encode(value)
+        if not isinstance(data, bytes):
+            data = data.encode('utf-8')
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO metadata (key, fetched, value) VALUES (?, ?, ?)',
+                             (key, time.time(), sqlite3.Binary(data)))
+
+    def _refresh(self, key, fetch):
+        try:
+            self._write(key, fetch())
+        except Exception:
+            # The stale entry stays, the next call tries again
+            pass
+        finally:
+            with self._lock:
+                del self._refreshing[key]
+
+    def get(self, key, fetch):
+        """
+        Function that returns the cached value of key, calling fetch() when there is none,
+        or it is too old. Stale values are returned while fetch() runs in the background.
+        Parameters:
+            key = cache key, see MetadataCache.key
+            fetch = callable that returns the current value
+        """
+
+        fetched, value = self._read(key)
+        age = time.time() - fetched if fetched is not None else None
+
+        if age is None or age > self.maxStale:
+            with self._lock:
+                self.misses += 1
+            value = fetch()
+            self._write(key, value)
+            return value
+
+        with self._lock:
+            self.hits += 1
+            if age > self.ttl and key not in self._refreshing:
+                self.revalidations += 1
+                # Not a daemon thread, so a short script still writes the refreshed value before it exits
+                thread = self._refreshing[key] = threading.Thread(target=self._refresh, args=(key, fetch))
+                thread.start()
+
+        return value
+
+    def wait(self):
+        """
+        Wait for background refreshes to finish.
+        """
+
+        with self._lock:
+            threads = list(self._refreshing.values())
+        for thread in threads:
+            thread.join()
+
+    def invalidate(self, client=None):
+        """
+        Drop the cached entries of a client, or all entries.
+        Parameters:
+            client = ConsumerClient or ReservationClient. if this is None everything is dropped
+        """
+
+        with self._lock:
+            if client is None:
+                self._db.execute('DELETE FROM metadata')
+            else:
+                prefix = _scope(client) + '|'
+                self._db.execute('DELETE FROM metadata WHERE substr(key, 1, ?) = ?', (len(prefix), prefix))
+
+    def attach(self, client):
+        """
+        Serve the metadata methods of a client (CACHED_METHODS) from the cache. Calls that
+        print a table instead of returning data are not cached. Returns the client.
+        Parameters:
+            client = ConsumerClient or ReservationClient
+        """
+
+        for name, required in CACHED_METHODS.items():
+            method = getattr(client, name, None)
+            if method is not None:
+                setattr(client, name, self._wrap(client, name, method, required))
+
+        return client
+
+    def _wrap(self, client, name, method, required):
+        @functools.wraps(method)
+        def cached(*args, **kwargs):
+            if any(kwargs.get(key) != value for key, value in required.items()):
+                return method(*args, **kwargs)
+            return self.get(self.key(client, name, args, kwargs), lambda: method(*args, **kwargs))
+
+        return cached
@@ -0,0 +1,186 @@
+#!/usr/bin/python
+from __future__ import print_function
+from __future__ import absolute_import
+
+from .helpers import mapConcurrently
+
+
+class ReservationPlanner(object):
+    def __init__(self, client, schemaclassid, fieldids=None, maxWorkers=8, limiter=None):
+        """
+        Prefetches and caches the reservation metadata needed to build
+        reservation payloads for many compute resources and business groups.
+        Parameters:
+            client = ReservationClient
+            schemaclassid = schemaClassId of supported reservation Type. E.g Infrastructure.Reservation.Virtual.vSphere
+            fieldids = extension fields to look up per compute resource. if this is None the
+                       schema fields that depend on computeResource are used
+            maxWorkers = maximum number of concurrent metadata calls
+            limiter = limiter.AdaptiveLimiter that sets the number of concurrent metadata
+                      calls instead of maxWorkers
+        """
+
+        self.client = client
+        self.schemaclassid = schemaclassid
+        self.fieldids = fieldids
+        self.maxWorkers = maxWorkers
+        self.limiter = limiter
+        self._schema = None
+        self._computeResources = None
+        self._fieldValues = {}
+
+    def getSchema(self):
+        """
+        Function that returns the cached reservation schema fields.
+        """
+
+        if self._schema is None:
+            self._schema = self.client.getReservationSchema(self.schemaclassid)
+
+        return self._schema
+
+    def getFieldIds(self):
+        """
+        Function that returns the extension fields looked up per compute resource.
+        """
+
+        if self.fieldids is None:
+            self.fieldids = [field['id'] for field in self.getSchema()
+                             if 'computeResource' in (field.get('state') or {}).get('dependencies', [])]
+
+        return self.fieldids
+
+    def getComputeResources(self):
+        """
+        Function that returns the cached compute resources as {id: entityRef}.
+        """
+
+        if self._computeResources is None:
+            values = self.client.getComputeResourceForReservation(self.schemaclassid)
+            self._computeResources = {value['underlyingValue']['id']: value['underlyingValue']
+                                      for value in values.get('values', [])}
+
+        return self._computeResources
+
+    def getFieldValues(self, computeresourceid, fieldid):
+        """
+        Function that returns the cached values of an extension field for a compute resource.
+        Parameters:
+            computeresourceid = Id of the compute resource
+            fieldid = Extension field supported in the reservation... E.g resourcePool
+        """
+
+        key = (computeresourceid, fieldid)
+        if key not in self._fieldValues:
+            self._fieldValues[key] = self.client.getResourceSchemaForReservation(
+                self.schemaclassid, fieldid, computeresourceid).get('values', [])
+
+        return self._fieldValues[key]
+
+    def prefetch(self, computeresourceids=None):
+        """
+        Fetch the schema, compute resources and every extension field value in one
+        concurrent pass. Values already in the cache are not fetched again.
+        Parameters:
+            computeresourceids = compute resources to prefetch. if this is None all are fetched
+        """
+
+        # The schema and the compute resource list are independent of each other
+        mapConcurrently(lambda fetch: fetch(), [self.getSchema, self.getComputeResources],
+                        maxWorkers=self.maxWorkers, limiter=self.limiter)
+
+        if computeresourceids is None:
+            computeresourceids = list(self.getComputeResources())
+
+        pending = [(computeresourceid, fieldid)
+                   for computeresourceid in computeresourceids
+                   for fieldid in self.getFieldIds()
+                   if (computeresourceid, fieldid) not in self._fieldValues]
+
+        mapConcurrently(lambda key: self.getFieldValues(*key), pending, maxWorkers=self.maxWorkers,
+                        limiter=self.limiter)
+
+    def invalidate(self):
+        """
+        Drop all cached metadata.
+        """
+
+        self._schema = None
+        self._computeResources = None
+        self._fieldValues = {}
+
+    def buildReservation(self, computeresourceid, businessGroupId, name, tenant=None,
+                         priority=1, enabled=True, extension=None):
+        """
+        Function that returns a reservation payload ready for createReservation.
+        Parameters:
+            computeresourceid = Id of the compute resource to reserve
+            businessGroupId = Id of the business group (subtenant) the reservation belongs to
+            name = name of the reservation
+            tenant = tenant for the reservation. if this is None the client tenant is used
+            priority = reservation priority
+            enabled = create the reservation enabled
+            extension = {fieldid: value} for extension fields. value may be a callable that
+                        receives the cached field values and returns the value to use. fields
+                        that are not given default to their first value if they are single valued
+        """
+
+        if tenant is None:
+            tenant = self.client.tenant
+
+        extension = extension or {}
+        computeResource = dict(self.getComputeResources()[computeresourceid])
+        computeResource.setdefault('type', 'entityRef')
+        entries = [{'key': 'computeResource', 'value': computeResource}]
+
+        multiValued = {field['id']: field.get('isMultiValued', False) for field in self.getSchema()}
+        fieldids = list(self.getFieldIds())
+        fieldids.extend(fieldid for fieldid in extension if fieldid not in fieldids)
+
+        for fieldid in fieldids:
+            if fieldid in extension:
+                value = extension[fieldid]
+                if callable(value):
+                    value = value(self.getFieldValues(computeresourceid, fieldid))
+            else:
+                values = self.getFieldValues(computeresourceid, fieldid)
+                if multiValued.get(fieldid) or not values:
+                    continue
+                value = values[0]['underlyingValue']
+            if value is not None:
+                entries.append({'key': fieldid, 'value': value})
+
+        return {
+            'name': name,
+            'reservationTypeId': self.schemaclassid,
+            'tenantId': tenant,
+            'subTenantId': businessGroupId,
+            'enabled': enabled,
+            'priority': priority,
+            'reservationPolicyId': None,
+            'alertSettings': [],
+            'extensionData': {
+                'entries': entries
+            }
+        }
+
+    def buildReservations(self, pairs, nameFormat='{computeResource}-{businessGroup}', **kwargs):
+        """
+        Function that returns reservation payloads for many (compute resource, business group)
+        pairs, prefetching any metadata they need in a single concurrent pass.
+        Parameters:
+            pairs = iterable of (computeresourceid, businessGroupId)
+            nameFormat = format string for reservation names. computeResource is the compute
+                         resource label and businessGroup the business group id
+            kwargs = passed on to buildReservation
+        """
+
+        pairs = list(pairs)
+        self.prefetch(sorted(set(pair[0] for pair in pairs)))
+        computeResources = self.getComputeResources()
+
+        return [self.buildReservation(computeresourceid, businessGroupId,
+                                      nameFormat.format(computeResource=computeResources[computeresourceid].get('label', computeresourceid),
+                                                        businessGroup=businessGroupId),
+                                      **kwargs)
+                for computeresourceid, businessGroupId in pairs]
@@ -0,0 +1,189 @@
+#!/usr/bin/python
+from __future__ import print_function
+from __future__ import absolute_import
+import threading
+
+from .catalog import ConsumerClient
+from .helpers import TokenManager, mapConcurrently, newSession
+from .limiter import AdaptiveLimiter
+from .reservation import ReservationClient
+
+
+class ClientPool(object):
+    def __init__(self, maxWorkers=8, poolSize=10, adaptive=False):
+        """
+        Holds clients for several vRA appliances and tenants, keyed by (host, tenant).
+        Clients for the same host share one connection pool and clients for the
+        same (host, tenant) share one token.
+        Parameters:
+            maxWorkers = maximum number of appliances queried at the same time
+            poolSize = number of pooled connections per host
+            adaptive = limit the requests in flight per host with a limiter.AdaptiveLimiter
+                       that grows up to poolSize while the host keeps up
+        """
+
+        self.maxWorkers = maxWorkers
+        self.poolSize = poolSize
+        self.adaptive = adaptive
+        self._credentials = {}
+        self._sessions = {}
+        self._limiters = {}
+        self._tokenManagers = {}
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def add(self, host, username, password, tenant=None, token=''):
+        """
+        Register credentials for an appliance and tenant. Nothing is fetched until
+        a client for the key is used.
+        Parameters:
+            host = vRA Appliance fqdn
+            username = user account with access to the vRA portal
+            password = valid password for above user
+            tenant = tenant for user. if this is NONE it will default to "vsphere.local"
+            token = auth token if already acquired
+        """
+
+        if tenant is None:
+            tenant = "vsphere.local"
+
+        key = (host, tenant)
+        self._credentials[key] = (username, password, token)
+
+        return key
+
+    def keys(self):
+        """
+        Function that returns the registered (host, tenant) keys.
+        """
+
+        return list(self._credentials)
+
+    def getSession(self, host):
+        """
+        Function that returns the shared session for a host.
+        Parameters:
+            host = vRA Appliance fqdn
+        """
+
+        with self._lock:
+            if host not in self._sessions:
+                if self.adaptive:
+                    self._limiters[host] = AdaptiveLimiter(maxLimit=self.poolSize)
+                self._sessions[host] = newSession(self.poolSize, limiter=self._limiters.get(host))
+            return self._sessions[host]
+
+    def metrics(self):
+        """
+        Function that returns {host: limiter metrics} for the hosts with an adaptive limit.
+        """
+
+        with self._lock:
+            return {host: limiter.metrics() for host, limiter in self._limiters.items()}
+
+    def getTokenManager(self, key):
+        """
+        Function that returns the shared TokenManager for a (host, tenant) key.
+        Parameters:
+            key = (host, tenant)
+        """
+
+        host, tenant = key
+        session = self.getSession(host)
+        with self._lock:
+            if key not in self._tokenManagers:
+                username, password, token = self._credentials[key]
+                self._tokenManagers[key] = TokenManager(host, username, password, tenant,
+                                                        token=token, session=session)
+            return self._tokenManagers[key]
+
+    def _getClient(self, clientClass, key):
+        host, tenant = key
+        session = self.getSession(host)
+        tokenManager = self.getTokenManager(key)
+        with self._lock:
+            if (clientClass, key) not in self._clients:
+                username, password, token = self._credentials[key]
+                self._clients[(clientClass, key)] = clientClass(host, username, password, tenant=tenant,
+                                                                session=session, tokenManager=tokenManager)
+            return self._clients[(clientClass, key)]
+
+    def getConsumerClient(self, key):
+        """
+        Function that returns the ConsumerClient for a (host, tenant) key.
+        Parameters:
+            key = (host, tenant)
+        """
+
+        return self._getClient(ConsumerClient, key)
+
+    def getReservationClient(self, key):
+        """
+        Function that returns the ReservationClient for a (host, tenant) key.
+        Parameters:
+            key = (host, tenant)
+        """
+
+        return self._getClient(ReservationClient, key)
+
+    def fanOut(self, func, keys=None, client='consumer', errors=None):
+        """
+        Calls func(client) for every appliance and tenant at the same time and
+        returns {(host, tenant): result}.
+        Parameters:
+            func = callable taking a client
+            keys = (host, tenant) keys to query. if this is None all keys are queried
+            client = 'consumer' or 'reservation'
+            errors = dict that collects {(host, tenant): exception} instead of raising
+        """
+
+        if keys is None:
+            keys = self.keys()
+        getClient = self.getConsumerClient if client == 'consumer' else self.getReservationClient
+
+        def call(key):
+            try:
+                return func(getClient(key))
+            except Exception as e:
+                if errors is None:
+                    raise
+                errors[key] = e
+                return None
+
+        results = mapConcurrently(call, keys, maxWorkers=self.maxWorkers)
+
+        return {key: result for key, result in zip(keys, results)
+                if errors is None or key not in errors}
+
+    def merge(self, results):
+        """
+        Function that merges fanOut results holding lists into a single list.
+        Every item is tagged with the host and tenant it came from.
+        Parameters:
+            results = {(host, tenant): list} as returned by fanOut
+        """
+
+        merged = []
+        for (host, tenant), items in results.items():
+            for item in items or []:
+                merged.append(dict(item, _host=host, _tenant=tenant))
+
+        return merged
+
+    def findResourceByName(self, name, keys=None, errors=None):
+        """
+        Function that looks up a resource by name on every appliance at the same time.
+        Returns a list of the matching resources tagged with their host and tenant.
+        Parameters:
+            name = name of the vRA resource
+            keys = (host, tenant) keys to query. if this is None all keys are queried
+            errors = dict that collects {(host, tenant): exception} instead of raising
+        """
+
+        def find(client):
+            try:
+                return [client.getResourceByName(name)]
+            except IndexError:
+                return []
+
+        return self.merge(self.fanOut(find, keys=keys, errors=errors))
@@ -0,0 +1,272 @@
+#!/usr/bin/python
+from __future__ import print_function
+from __future__ import absolute_import
+import functools
+import threading
+import time
+
+from prettytable import PrettyTable
+
+PHASES = ('connect', 'wait', 'download', 'decode', 'transform', 'render', 'other')
+
+# The enabled Profiler, if any. phase() does nothing while this is None
+_active = None
+_local = threading.local()
+
+
+class _NoPhase(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+_NO_PHASE = _NoPhase()
+
+
+class _Phase(object):
+    def __init__(self, call, name):
+        self.call = call
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.time()
+        return self
+
+    def __exit__(self, *args):
+        self.call[self.name] = self.call.get(self.name, 0.0) + time.time() - self.started
+        return False
+
+
+def _currentCall():
+    return getattr(_local, 'call', None)
+
+
+def phase(name):
+    """
+    Context manager that adds the time spent inside it to a phase of the client call
+    running on this thread. It does nothing unless a Profiler is enabled.
+
+    Parameters:
+        name = one of PHASES
+    """
+
+    if _active is None:
+        return _NO_PHASE
+    call = _currentCall()
+    if call is None:
+        return _NO_PHASE
+    return _Phase(call, name)
+
+
+def _addTime(name, seconds):
+    call = _currentCall()
+    if _active is not None and call is not None:
+        call[name] = call.get(name, 0.0) + seconds
+
+
+def _patchConnect(connectionClass):
+    connect = connectionClass.__dict__.get('connect')
+    if connect is None:
+        return None
+
+    @functools.wraps(connect)
+    def timedConnect(self, *args, **kwargs):
+        started = time.time()
+        try:
+            return connect(self, *args, **kwargs)
+        finally:
+            _addTime('connect', time.time() - started)
+
+    connectionClass.connect = timedConnect
+    return connect
+
+
+class ProfilingSession(object):
+    def __init__(self, session):
+        """
+        Session wrapper that splits the time of every request into connection setup,
+        server wait and download for the profiled client call running on the thread.
+        Parameters:
+            session = session to send requests with
+        """
+
+        self.session = session
+
+    def _timed(self, send, url, kwargs):
+        call = _currentCall()
+        connectBefore = call.get('connect', 0.0) if call is not None else 0.0
+        started = time.time()
+        r = send(url, **kwargs)
+        total = time.time() - started
+
+        if call is not None:
+            connect = call.get('connect', 0.0) - connectBefore
+            elapsed = r.elapsed.total_seconds() if getattr(r, 'elapsed', None) is not None else total
+            # requests sets elapsed once the headers are in, the body is read after that
+            _addTime('wait', max(0.0, min(elapsed, total) - connect))
+            _addTime('download', max(0.0, total - max(elapsed, connect)))
+            call['requests'] = call.get('requests', 0) + 1
+
+        return r
+
+    def get(self, url, **kwargs):
+        return self._timed(self.session.get, url, kwargs)
+
+    def post(self, url, **kwargs):
+        return self._timed(self.session.post, url, kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+
+class Profiler(object):
+    def __init__(self, backend=None):
+        """
+        Opt-in profiler that breaks client calls down into connect/TLS, server wait,
+        download, decode, transform and render phases and aggregates them per method.
+        Parameters:
+            backend = None, 'cprofile' or 'pyinstrument' to also profile the whole run
+        """
+
+        self.backend = backend
+        self.stats = {}
+        self._lock = threading.Lock()
+        self._patched = []
+        self._backend = None
+
+    def attach(self, client):
+        """
+        Time the public methods of a client and route its requests through a
+        ProfilingSession. Returns the client.
+        Parameters:
+            client = ConsumerClient or ReservationClient
+        """
+
+        if not isinstance(client.session, ProfilingSession):
+            client.session = ProfilingSession(client.session)
+
+        for name in dir(type(client)):
+            if name.startswith('_') or isinstance(getattr(type(client), name), property):
+                continue
+            method = getattr(client, name)
+            if callable(method):
+                setattr(client, name, self._wrap(name, method))
+
+        return client
+
+    def _wrap(self, name, method):
+        @functools.wraps(method)
+        def profiled(*args, **kwargs):
+            if _active is not self or _currentCall() is not None:
+                # Nested calls are counted in the outer call
+                return method(*args, **kwargs)
+
+            call = _local.call = {}
+            started = time.time()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                total = time.time() - started
+                _local.call = None
+                self._record(name, total, call)
+
+        return profiled
+
+    def _record(self, name, total, call):
+        with self._lock:
+            stats = self.stats.setdefault(name, dict({'calls': 0, 'requests': 0, 'total': 0.0},
+                                                     **{phase: 0.0 for phase in PHASES}))
+            stats['calls'] += 1
+            stats['requests'] += call.pop('requests', 0)
+            stats['total'] += total
+            for phase in PHASES[:-1]:
+                stats[phase] += call.get(phase, 0.0)
+            stats['other'] += max(0.0, total - sum(call.get(phase, 0.0) for phase in PHASES[:-1]))
+
+    def enable(self):
+        """
+        Start profiling.
+        """
+
+        global _active
+        if _active is not None and _active is not self:
+            raise RuntimeError('Another Profiler is already enabled')
+        _active = self
+
+        try:
+            import urllib3.connection
+            for connectionClass in (urllib3.connection.HTTPConnection, urllib3.connection.HTTPSConnection):
+                original = _patchConnect(connectionClass)
+                if original is not None:
+                    self._patched.append((connectionClass, original))
+        except ImportError:
+            pass
+
+        if self.backend == 'cprofile':
+            import cProfile
+            self._backend = cProfile.Profile()
+            self._backend.enable()
+        elif self.backend == 'pyinstrument':
+            import pyinstrument
+            self._backend = pyinstrument.Profiler()
+            self._backend.start()
+
+    def disable(self):
+        """
+        Stop profiling.
+        """
+
+        global _active
+
+        if self.backend == 'cprofile' and self._backend is not None:
+            self._backend.disable()
+        elif self.backend == 'pyinstrument' and self._backend is not None:
+            self._backend.stop()
+
+        for connectionClass, original in self._patched:
+            connectionClass.connect = original
+        self._patched = []
+        _active = None
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *args):
+        self.disable()
+        return False
+
+    def summary(self):
+        """
+        Function that returns the per method breakdown as a table. Times are in milliseconds.
+        """
+
+        table = PrettyTable(['Method', 'Calls', 'Requests', 'Total'] + [phase.capitalize() for phase in PHASES])
+        table.align = 'r'
+        table.align['Method'] = 'l'
+        with self._lock:
+            for name, stats in sorted(self.stats.items(), key=lambda item: -item[1]['total']):
+                table.add_row([name, stats['calls'], stats['requests'], '{0:.1f}'.format(stats['total'] * 1000)] +
+                              ['{0:.1f}'.format(stats[phase] * 1000) for phase in PHASES])
+
+        return table
+
+    def printSummary(self):
+        print(self.summary())
+
+    def dump(self, path):
+        """
+        Write the whole run profile of the backend: pstats for cprofile, html for pyinstrument.
+        Parameters:
+            path = file to write
+        """
+
+        if self.backend == 'cprofile':
+            self._backend.dump_stats(path)
+        elif self.backend == 'pyinstrument':
+            with open(path, 'w') as f:
+                f.write(self._backend.output_html())
+        else:
+            raise ValueError('dump needs a cprofile or pyinstrument backend')
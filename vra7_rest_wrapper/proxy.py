@@ -0,0 +1,300 @@
+#!/usr/bin/python
+from __future__ import print_function
+from __future__ import absolute_import
+import collections
+import hashlib
+import re
+import threading
+import time
+from argparse import ArgumentParser
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+from .codec import decode, encode
+from .deadline import DEFAULT_TIMEOUT
+from .helpers import newSession, parseTimestamp
+from .transport import PROXY_ADDRESS, PROXY_HOST_HEADER, CoalescingSession
+
+# Request states change all the time and are polled, so they are never served from the cache
+DEFAULT_UNCACHED = (r'/consumer/requests', r'/identity/api/tokens')
+FORWARDED_REQUEST_HEADERS = ('Authorization', 'Content-Type', 'Accept', 'If-None-Match', 'If-Modified-Since')
+FORWARDED_RESPONSE_HEADERS = ('Content-Type', 'Location', 'ETag', 'Last-Modified')
+
+
+class _Entry(object):
+    def __init__(self, expires, status, headers, body):
+        self.expires = expires
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+
+def _error(status, message):
+    body = encode({'errors': [{'message': message}]})
+    if not isinstance(body, bytes):
+        body = body.encode('utf-8')
+    return _Entry(0, status, {'Content-Type': 'application/json'}, body)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        if self.server.proxy.verbose:
+            BaseHTTPRequestHandler.log_message(self, *args)
+
+    def _handle(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else None
+        host = self.headers.get(PROXY_HOST_HEADER)
+        if not host:
+            return self._send(_error(400, 'Missing {0} header'.format(PROXY_HOST_HEADER)))
+
+        headers = {key: self.headers[key] for key in FORWARDED_REQUEST_HEADERS if self.headers.get(key)}
+        noCache = 'no-cache' in (self.headers.get('Cache-Control') or '')
+        try:
+            entry = self.server.proxy.handle(self.command, host, self.path, headers, body, noCache)
+        except Exception as e:
+            entry = _error(502, str(e))
+        self._send(entry)
+
+    def _send(self, entry):
+        self.send_response(entry.status)
+        for key, value in entry.headers.items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(entry.body)))
+        self.end_headers()
+        self.wfile.write(entry.body)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class CachingProxy(object):
+    def __init__(self, address=PROXY_ADDRESS, hosts=(), ttl=30, tokenTtl=3600, uncached=DEFAULT_UNCACHED, poolSize=10,
+                 timeout=DEFAULT_TIMEOUT, maxEntries=10000, verbose=False):
+        """
+        Local daemon shared by many short-lived scripts on one host. It keeps pooled
+        connections to the appliances, caches tokens per set of credentials and caches
+        GET responses per token, so scripts that route through it (ConsumerClient(...,
+        proxy=transport.PROXY_ADDRESS)) skip TLS and authentication and get cache hits.
+        A token the appliance answers 401 for is dropped from the token cache, so the
+        client's next authentication gets a new one.
+        It only listens on the given address, keep that on localhost, and only forwards
+        to the appliances in hosts, anything else is refused with 403.
+        Parameters:
+            address = host:port to listen on
+            hosts = appliance hostnames, optionally with :port, requests may be forwarded to
+            ttl = seconds a GET response is served from the cache
+            tokenTtl = seconds a token is served from the cache, if the appliance does not
+                       say when it expires earlier
+            uncached = regular expressions of paths that are never served from the cache
+            poolSize = number of pooled connections per appliance
+            timeout = (connect, read) timeout for requests to the appliances
+            maxEntries = maximum number of cached responses, least recently used go first
+            verbose = log every request
+        """
+
+        if not hosts:
+            raise ValueError('Give the appliance hosts the proxy may forward to')
+
+        host, port = address.rsplit(':', 1)
+        self.address = (host, int(port))
+        self.hosts = frozenset(host.lower() for host in hosts)
+        self.ttl = ttl
+        self.tokenTtl = tokenTtl
+        self.uncached = [re.compile(pattern) for pattern in uncached]
+        self.timeout = timeout
+        self.maxEntries = maxEntries
+        self.verbose = verbose
+        self.hits = 0
+        self.misses = 0
+        self.tokenHits = 0
+        # Concurrent identical misses, e.g. cron jobs starting on the same minute, share one request
+        self.session = CoalescingSession(newSession(poolSize, timeout=None))
+        self._cache = collections.OrderedDict()
+        self._tokens = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def allowed(self, host):
+        """
+        Function that returns whether requests may be forwarded to host.
+        """
+
+        host = host.strip().lower()
+        return host in self.hosts or (host.endswith(':443') and host[:-4] in self.hosts)
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            if entry.expires < time.time():
+                del self._cache[key]
+                return None
+            self._cache.pop(key)
+            self._cache[key] = entry
+            return entry
+
+    def _store(self, key, entry):
+        with self._lock:
+            self._cache.pop(key, None)
+            self._cache[key] = entry
+            while len(self._cache) > self.maxEntries:
+                self._cache.popitem(last=False)
+
+    def invalidate(self, host=None, authorization=None):
+        """
+        Drop cached responses, all of them or those of one appliance and token.
+        """
+
+        with self._lock:
+            for key in list(self._cache):
+                if (host is None or key[0] == host) and (authorization is None or key[2] == authorization):
+                    del self._cache[key]
+
+    def _evictToken(self, host, authorization):
+        # A token the appliance rejects must not be handed out again by the token cache
+        token = authorization.split(' ', 1)[-1]
+        with self._lock:
+            for key, entry in list(self._tokens.items()):
+                try:
+                    if decode(entry.body).get('id') == token:
+                        del self._tokens[key]
+                except (ValueError, AttributeError):
+                    pass
+        self.invalidate(host, authorization)
+
+    def _forward(self, method, host, path, headers, body):
+        url = 'https://{host}{path}'.format(host=host, path=path)
+        if method == 'GET':
+            r = self.session.get(url, headers=headers, timeout=self.timeout, verify=False)
+        else:
+            r = self.session.request(method, url, headers=headers, data=body, timeout=self.timeout, verify=False)
+
+        responseHeaders = {key: r.headers[key] for key in FORWARDED_RESPONSE_HEADERS if key in r.headers}
+        return _Entry(0, r.status_code, responseHeaders, r.content)
+
+    def _tokenExpiry(self, entry):
+        expires = time.time() + self.tokenTtl
+        try:
+            stated = decode(entry.body).get('expires')
+            if stated:
+                seconds = (parseTimestamp(stated) - datetime.utcnow()).total_seconds()
+                expires = min(expires, time.time() + seconds - 60)
+        except (ValueError, AttributeError):
+            pass
+        return expires
+
+    def handle(self, method, host, path, headers, body, noCache=False):
+        """
+        Function that answers one request from the cache or the appliance.
+        """
+
+        if not self.allowed(host):
+            return _error(403, '{0} is not an allowed appliance'.format(host))
+
+        if method == 'POST' and path.rstrip('/').endswith('/identity/api/tokens'):
+            # Tokens are keyed by a hash of the credentials, which are never kept
+            key = hashlib.sha256(host.encode('utf-8') + b'\0' + (body or b'')).hexdigest()
+            with self._lock:
+                entry = self._tokens.get(key)
+            if entry is not None and entry.expires > time.time() and not noCache:
+                with self._lock:
+                    self.tokenHits += 1
+                return entry
+            entry = self._forward(method, host, path, headers, body)
+            if entry.status == 200:
+                entry.expires = self._tokenExpiry(entry)
+                with self._lock:
+                    self._tokens[key] = entry
+            return entry
+
+        if method != 'GET':
+            entry = self._forward(method, host, path, headers, body)
+            if entry.status == 401 and headers.get('Authorization'):
+                self._evictToken(host, headers['Authorization'])
+            elif entry.status < 400:
+                # The change may show up in any collection of this appliance
+                self.invalidate(host, headers.get('Authorization'))
+            return entry
+
+        cacheable = not any(pattern.search(path) for pattern in self.uncached)
+        key = (host, path, headers.get('Authorization'), headers.get('Accept'))
+        if cacheable and not noCache:
+            entry = self._lookup(key)
+            if entry is not None:
+                with self._lock:
+                    self.hits += 1
+                return entry
+
+        with self._lock:
+            self.misses += 1
+        entry = self._forward(method, host, path, headers, body)
+        if entry.status == 401 and headers.get('Authorization'):
+            self._evictToken(host, headers['Authorization'])
+        if cacheable and entry.status == 200:
+            entry.expires = time.time() + self.ttl
+            self._store(key, entry)
+        return entry
+
+    def start(self):
+        """
+        Start serving on a background thread. Returns the host:port listened on.
+        """
+
+        self._server = _Server(self.address, _Handler)
+        self._server.proxy = self
+        thread = threading.Thread(target=self._server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        return '{0}:{1}'.format(*self._server.server_address[:2])
+
+    def serveForever(self):
+        """
+        Serve on the calling thread until interrupted.
+        """
+
+        self._server = _Server(self.address, _Handler)
+        self._server.proxy = self
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def main():
+    parser = ArgumentParser(description='Local caching proxy for vRA clients')
+    parser.add_argument('--address', default=PROXY_ADDRESS, help='host:port to listen on')
+    parser.add_argument('--host', dest='hosts', action='append', required=True,
+                        help='appliance the proxy may forward to, repeat for several')
+    parser.add_argument('--ttl', type=float, default=30, help='seconds GET responses are cached')
+    parser.add_argument('--token-ttl', type=float, default=3600, help='seconds tokens are cached')
+    parser.add_argument('--pool-size', type=int, default=10, help='pooled connections per appliance')
+    parser.add_argument('--verbose', action='store_true', help='log every request')
+    args = parser.parse_args()
+
+    proxy = CachingProxy(args.address, hosts=args.hosts, ttl=args.ttl, tokenTtl=args.token_ttl, poolSize=args.pool_size,
+                         verbose=args.verbose)
+    print('Listening on {address}'.format(address=args.address))
+    proxy.serveForever()
+
+
+if __name__ == '__main__':
+    main()
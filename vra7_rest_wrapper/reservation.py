@@ -2,17 +2,18 @@
 from __future__ import print_function
 from __future__ import absolute_import
 __author__ = 'https://github.com/chelnak'
-import json
 
-import requests
-
-from .helpers import authenticate, checkResponse
+from .codec import decodeResponse, encode
+from .deadline import DEFAULT_TIMEOUT
+from .helpers import TokenManager, checkResponse, newSession, printTable
+from .transport import RefreshingSession
 from prettytable import PrettyTable
 
 
 class ReservationClient(object):
     #http://pubs.vmware.com/vra-62/index.jsp#com.vmware.vra.programming.doc/GUID-7697320D-F3BD-4A42-8721-FBC971B47195.html
-    def __init__(self, host, username, password, tenant=None):
+    def __init__(self, host, username, password, tenant=None, session=None, tokenManager=None,
+                 http2=False, compression=True, timeout=DEFAULT_TIMEOUT, proxy=None):
         """
         Creates a connection to the vRA REST API using the provided
         username and password.
@@ -21,6 +22,12 @@ class ReservationClient(object):
             user = user account with access to the vRA portal
             passowrd = valid password for above user
             tenant = tenant for user. if this is NONE it will default to "vsphere.local"
+            session = requests session to share a connection pool with other clients
+            tokenManager = TokenManager to share a token with other clients
+            http2 = send requests over HTTP/2 with httpx. ignored if a session is given
+            compression = ask for compressed responses. ignored if a session is given
+            timeout = (connect, read) request timeout in seconds. ignored if a session is given
+            proxy = host:port of a local proxy.CachingProxy to send requests through. ignored if a session is given
         """
 
         if tenant is None:
@@ -30,7 +37,25 @@ class ReservationClient(object):
         self.username = username
         self.password = password
         self.tenant = tenant
-        self.token = authenticate(host, username, password, tenant)
+        if session is None:
+            session = newSession(http2=http2, compression=compression, timeout=timeout, proxy=proxy)
+        elif isinstance(session, RefreshingSession):
+            # The session of another client, which refreshes that client's token
+            session = session.session
+        if tokenManager is None:
+            tokenManager = TokenManager(host, username, password, tenant, session=session)
+            tokenManager.getToken()
+        self.tokenManager = tokenManager
+        # A request whose token expired is sent once more with a new token
+        self.session = RefreshingSession(session, tokenManager)
+
+    @property
+    def token(self):
+        return self.tokenManager.getToken()
+
+    @token.setter
+    def token(self, token):
+        self.tokenManager.token = token
 
     def getToken(self):
         """
@@ -63,10 +88,10 @@ class ReservationClient(object):
             'Accept': 'application/json',
             'Authorization': token
         }
-        r = requests.get(url=url, headers=headers, verify=False)
+        r = self.session.get(url=url, headers=headers, verify=False)
         checkResponse(r)
 
-        businessGroups = r.json()
+        businessGroups = decodeResponse(r)
 
         if show == 'table':
             table = PrettyTable(['Id', 'Name'])
@@ -74,7 +99,7 @@ class ReservationClient(object):
             for i in businessGroups['content']:
                 table.add_row([i['id'], i['name']])
 
-            print(table)
+            printTable(table)
         elif show == 'json':
             return businessGroups['content']
 
@@ -96,17 +121,17 @@ class ReservationClient(object):
             'Accept': 'application/json',
             'Authorization': token
         }
-        r = requests.get(url=url, headers=headers, verify=False)
+        r = self.session.get(url=url, headers=headers, verify=False)
         checkResponse(r)
 
-        reservation = r.json()
+        reservation = decodeResponse(r)
 
         if show == 'table':
             table = PrettyTable(['Id', 'Name'])
             table.add_row([
             reservation['id'], reservation['name']])
 
-            print(table)
+            printTable(table)
 
         elif show == 'json':
             return reservation
@@ -128,17 +153,17 @@ class ReservationClient(object):
             'Accept': 'application/json',
             'Authorization': token
         }
-        r = requests.get(url=url, headers=headers, verify=False)
+        r = self.session.get(url=url, headers=headers, verify=False)
         checkResponse(r)
 
-        reservation = r.json()
+        reservation = decodeResponse(r)
 
         if show == 'table':
                     table = PrettyTable(['Id', 'Name'])
                     table.add_row([
                         reservation['content'][0]['id'], reservation['content'][0]['name']])
 
-                    print(table)
+                    printTable(table)
 
         elif show == 'json':
                 return reservation['content'][0]
@@ -162,10 +187,10 @@ class ReservationClient(object):
             'Accept': 'application/json',
             'Authorization': token
         }
-        r = requests.get(url=url, headers=headers, verify=False)
+        r = self.session.get(url=url, headers=headers, verify=False)
         checkResponse(r)
 
-        reservations = r.json()
+        reservations = decodeResponse(r)
 
         if show == 'table':
             table = PrettyTable(['Id', 'Name'])
@@ -173,7 +198,7 @@ class ReservationClient(object):
             for i in reservations['content']:
                 table.add_row([i['id'], i['name']])
 
-            print(table)
+            printTable(table)
         elif show == 'json':
             return reservations['content']
 
@@ -194,10 +219,10 @@ class ReservationClient(object):
             'Accept': 'application/json',
             'Authorization': token
         }
-        r = requests.post(url=url,
-                          headers=headers,
-                          data=json.dumps(payload),
-                          verify=False)
+        r = self.session.post(url=url,
+                              headers=headers,
+                              data=encode(payload),
+                              verify=False)
         checkResponse(r)
 
         reservationId = r.headers['location'].split('/')[6]
@@ -219,9 +244,9 @@ class ReservationClient(object):
             'Accept': 'application/json',
             'Authorization': token
         }
-        r = requests.get(url=url, headers=headers, verify=False)
+        r = self.session.get(url=url, headers=headers, verify=False)
         checkResponse(r)
-        reservationTypes = r.json()
+        reservationTypes = decodeResponse(r)
 
         return reservationTypes[u'content']
 
@@ -242,9 +267,9 @@ class ReservationClient(object):
             'Accept': 'application/json',
             'Authorization': token
         }
-        r = requests.get(url=url, headers=headers, verify=False)
+        r = self.session.get(url=url, headers=headers, verify=False)
         checkResponse(r)
-        reservationSchema = r.json()
+        reservationSchema = decodeResponse(r)
 
         return reservationSchema[u'fields']
 
@@ -269,10 +294,10 @@ class ReservationClient(object):
             'Accept': 'application/json',
             'Authorization': token
         }
-        r = requests.get(url=url, headers=headers, verify=False)
+        r = self.session.get(url=url, headers=headers, verify=False)
         checkResponse(r)
 
-        businessGroupId = r.json()
+        businessGroupId = decodeResponse(r)
 
         return businessGroupId
 
@@ -294,13 +319,13 @@ class ReservationClient(object):
             'Authorization': token
         }
         payload = {}
-        r = requests.post(url=url,
-                          headers=headers,
-                          data=json.dumps(payload),
-                          verify=False)
+        r = self.session.post(url=url,
+                              headers=headers,
+                              data=encode(payload),
+                              verify=False)
         checkResponse(r)
 
-        computeResource = r.json()
+        computeResource = decodeResponse(r)
 
         return computeResource
 
@@ -338,11 +363,11 @@ class ReservationClient(object):
             }
         }
 
-        r = requests.post(url=url,
-                          headers=headers,
-                          data=json.dumps(payload),
-                          verify=False)
+        r = self.session.post(url=url,
+                              headers=headers,
+                              data=encode(payload),
+                              verify=False)
         checkResponse(r)
-        resourceSchema = r.json()
+        resourceSchema = decodeResponse(r)
 
         return resourceSchema
@@ -0,0 +1,551 @@
+#!/usr/bin/python
+from __future__ import print_function
+from __future__ import absolute_import
+import collections
+import functools
+import re
+import threading
+import time
+import weakref
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+
+from .codec import decode
+from .deadline import DEFAULT_TIMEOUT, DeadlineExceeded, current, remaining, timeoutFor
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+_UNSET = object()
+
+# Headers that make a GET return something else than the plain document, e.g. 304 Not Modified
+CONDITIONAL_HEADERS = ('if-none-match', 'if-modified-since', 'if-match', 'if-unmodified-since', 'if-range', 'range')
+
+# Address of a local proxy.CachingProxy and the header that tells it which appliance to use
+PROXY_ADDRESS = '127.0.0.1:8487'
+PROXY_HOST_HEADER = 'X-Vra-Host'
+
+_TIMEOUT_ERRORS = (requests.exceptions.Timeout,)
+if httpx is not None:
+    _TIMEOUT_ERRORS += (httpx.TimeoutException,)
+
+
+def acceptEncoding(compression=True):
+    """
+    Function that returns the Accept-Encoding header value to send.
+
+    Parameters:
+        compression = ask for compressed responses. brotli is only asked for when a
+                      brotli decoder is installed.
+    """
+
+    if not compression:
+        return 'identity'
+
+    encodings = ['gzip', 'deflate']
+    for module in ('brotli', 'brotlicffi'):
+        try:
+            __import__(module)
+        except ImportError:
+            continue
+        encodings.append('br')
+        break
+
+    return ', '.join(encodings)
+
+
+class HttpxSession(object):
+    def __init__(self, http2=True, poolSize=10, compression=True, verify=False):
+        """
+        Session with the get/post interface of a requests session that sends requests
+        with httpx, so requests to the same host can be multiplexed over one HTTP/2
+        connection. Needs httpx, and h2 for http2 (pip install httpx[http2]).
+        Parameters:
+            http2 = negotiate HTTP/2 with the appliance
+            poolSize = number of pooled connections per host
+            compression = ask for compressed responses
+            verify = verify TLS certificates. httpx does this per session, not per request
+        """
+
+        if httpx is None:
+            raise ImportError('HttpxSession needs httpx, pip install httpx[http2]')
+
+        limits = httpx.Limits(max_connections=poolSize, max_keepalive_connections=poolSize)
+        self.client = httpx.Client(http2=http2, verify=verify, limits=limits,
+                                   headers={'Accept-Encoding': acceptEncoding(compression)})
+
+    def request(self, method, url, headers=None, data=None, params=None, timeout=None, **kwargs):
+        options = {'headers': headers, 'params': params}
+        if isinstance(data, (str, bytes)):
+            options['content'] = data
+        elif data is not None:
+            options['data'] = data
+        if timeout is not None:
+            if isinstance(timeout, tuple):
+                timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+            options['timeout'] = timeout
+
+        return self.client.request(method, url, **options)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def close(self):
+        self.client.close()
+
+
+class SharedResponse(object):
+    def __init__(self, response):
+        """
+        Wraps a response handed to several callers so the body is parsed only once.
+        The parsed document is shared too, callers must not modify it.
+        Parameters:
+            response = requests response
+        """
+
+        self._response = response
+        self._json = _UNSET
+        self._lock = threading.Lock()
+
+    def sharedJson(self):
+        with self._lock:
+            if self._json is _UNSET:
+                self._json = decode(self._response.content)
+        return self._json
+
+    def json(self, **kwargs):
+        return self.sharedJson()
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+
+class _Call(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+class CoalescingSession(object):
+    def __init__(self, session):
+        """
+        Session wrapper that lets identical GETs running at the same time share one
+        network call. GETs are identical when the url, the headers and the params match.
+        Conditional GETs are never shared, and everything else is passed on to the
+        wrapped session. Waiting for a shared call is cut to the current deadline.Deadline.
+        Parameters:
+            session = requests session (or another session wrapper) to send requests with
+        """
+
+        self.session = session
+        self._inFlight = {}
+        self._lock = threading.Lock()
+
+    def get(self, url, **kwargs):
+        if kwargs.get('stream'):
+            return self.session.get(url, **kwargs)
+
+        headers = kwargs.get('headers') or {}
+        if any(name.lower() in CONDITIONAL_HEADERS for name in headers):
+            return self.session.get(url, **kwargs)
+        params = kwargs.get('params')
+        if isinstance(params, dict):
+            params = sorted(params.items())
+        key = (url, tuple(sorted((name.lower(), value) for name, value in headers.items())), repr(params))
+
+        with self._lock:
+            call = self._inFlight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inFlight[key] = _Call()
+
+        if not leader:
+            if not call.done.wait(remaining()):
+                raise DeadlineExceeded('GET {url} ran out of the deadline waiting for a shared call'.format(url=url))
+            if call.error is not None:
+                raise call.error
+            return call.response
+
+        try:
+            call.response = SharedResponse(self.session.get(url, **kwargs))
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inFlight[key]
+            call.done.set()
+
+        return call.response
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+
+class DeadlineSession(object):
+    def __init__(self, session, timeout=DEFAULT_TIMEOUT):
+        """
+        Session wrapper that sends every request with connect and read timeouts, cut to
+        the remaining budget of the deadline.Deadline entered on the calling thread.
+        Requests that time out because the budget ran out raise deadline.DeadlineExceeded.
+        Parameters:
+            session = session to send requests with
+            timeout = (connect, read) timeout in seconds, or one number for both
+        """
+
+        self.session = session
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs['timeout'] = timeoutFor(kwargs.get('timeout', self.timeout))
+        try:
+            return self.session.request(method, url, **kwargs)
+        except _TIMEOUT_ERRORS as e:
+            deadline = current()
+            if deadline is not None and deadline.expired():
+                raise DeadlineExceeded('{method} {url} ran out of the deadline: {error}'.format(
+                    method=method, url=url, error=e))
+            raise
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+
+class HedgingSession(object):
+    def __init__(self, session, percentile=95, minDelay=0.05, budget=0.1, maxTokens=10, window=500,
+                 minSamples=20, maxWorkers=16):
+        """
+        Session wrapper that hedges GETs: when a GET has not answered after the given
+        percentile of recently observed GET latencies, the same GET is sent again and
+        whichever response arrives first is returned. The slower request cannot be
+        aborted once it is on the wire, its response is closed when it arrives.
+        Only GETs are hedged, everything else is passed on to the wrapped session.
+        Hedged GETs are sent from a pool of maxWorkers threads; when those are all busy
+        GETs are sent on the caller's thread without hedging, so the pool never limits
+        or queues GETs below the connection pool or limiter of the wrapped session.
+        Parameters:
+            session = session to send requests with
+            percentile = latency percentile after which a GET is hedged
+            minDelay = never hedge sooner than this many seconds
+            budget = hedges earned per GET, e.g. 0.1 allows at most about 10% extra GETs
+            maxTokens = maximum number of hedges that can be saved up for a burst
+            window = number of recent GET latencies the delay is learned from
+            minSamples = GETs observed before hedging starts
+            maxWorkers = maximum number of GETs sent from the hedging threads. size it to the
+                         connection pool of the wrapped session, e.g. twice its poolSize
+        """
+
+        self.session = session
+        self.percentile = percentile
+        self.minDelay = minDelay
+        self.budget = budget
+        self.maxTokens = maxTokens
+        self.minSamples = minSamples
+        self.maxWorkers = maxWorkers
+        self.requests = 0
+        self.hedged = 0
+        self.hedgeWins = 0
+        self._latencies = collections.deque(maxlen=window)
+        self._tokens = 0.0
+        self._delay = None
+        self._busy = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=maxWorkers)
+
+    def delay(self):
+        """
+        Function that returns the seconds after which a GET is hedged, or None while
+        too few GETs have been observed.
+        """
+
+        with self._lock:
+            if self._delay is None and len(self._latencies) >= self.minSamples:
+                latencies = sorted(self._latencies)
+                index = min(len(latencies) - 1, int(len(latencies) * self.percentile / 100.0))
+                self._delay = max(self.minDelay, latencies[index])
+            return self._delay
+
+    def _observe(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+            if len(self._latencies) % 10 == 0:
+                self._delay = None
+
+    def _send(self, url, kwargs):
+        started = time.time()
+        r = self.session.get(url, **kwargs)
+        self._observe(time.time() - started)
+        return r
+
+    def _submit(self, send, url, kwargs):
+        # Returns None instead of queueing when every hedging thread is busy
+        with self._lock:
+            if self._busy >= self.maxWorkers:
+                return None
+            self._busy += 1
+        future = self._executor.submit(send, url, kwargs)
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future):
+        with self._lock:
+            self._busy -= 1
+
+    def _takeToken(self):
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def _returnToken(self):
+        with self._lock:
+            self._tokens += 1
+
+    def get(self, url, **kwargs):
+        with self._lock:
+            self.requests += 1
+            self._tokens = min(self.maxTokens, self._tokens + self.budget)
+
+        delay = self.delay()
+        if delay is None or kwargs.get('stream'):
+            return self._send(url, kwargs)
+
+        send = self._send
+        deadline = current()
+        if deadline is not None:
+            send = deadline.bind(send)
+
+        primary = self._submit(send, url, kwargs)
+        if primary is None:
+            return self._send(url, kwargs)
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._takeToken():
+            return primary.result()
+
+        hedge = self._submit(send, url, kwargs)
+        if hedge is None:
+            self._returnToken()
+            return primary.result()
+        with self._lock:
+            self.hedged += 1
+
+        winner = None
+        error = None
+        pending = {primary, hedge}
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in sorted(done, key=lambda future: future is hedge):
+                if future.exception() is not None:
+                    error = future.exception()
+                elif winner is None:
+                    winner = future
+
+        # Every other response is closed, now or when it arrives, so its connection goes back to the pool
+        for future in (primary, hedge):
+            if future is not winner and not future.cancel():
+                future.add_done_callback(_closeResponse)
+
+        if winner is None:
+            raise error
+        if winner is hedge:
+            with self._lock:
+                self.hedgeWins += 1
+        return winner.result()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        close = getattr(self.session, 'close', None)
+        if close is not None:
+            close()
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+
+def _closeResponse(future):
+    if not future.cancelled() and future.exception() is None:
+        close = getattr(future.result(), 'close', None)
+        if close is not None:
+            close()
+
+
+class LimitingSession(object):
+    def __init__(self, session, limiter):
+        """
+        Session wrapper that sends requests within the concurrency limit of a
+        limiter.AdaptiveLimiter, which adapts to the latency of the responses.
+        Exceptions, 429 and 5xx responses count as errors.
+        Parameters:
+            session = session to send requests with
+            limiter = AdaptiveLimiter, shared by everything that talks to the appliance
+        """
+
+        self.session = session
+        self.limiter = limiter
+
+    def request(self, method, url, **kwargs):
+        with self.limiter.slot() as slot:
+            r = getattr(self.session, method.lower())(url, **kwargs)
+            slot.error = r.status_code == 429 or r.status_code >= 500
+        return r
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+
+class RefreshingSession(object):
+    def __init__(self, session, tokenManager):
+        """
+        Session wrapper that authenticates again when the appliance rejects the bearer
+        token of a request with 401, and sends the request once more with the new token.
+        Threads that are rejected at the same time authenticate once, see
+        helpers.TokenManager.refresh. Every verb goes through this, also PUT and DELETE.
+        Parameters:
+            session = session to send requests with
+            tokenManager = helpers.TokenManager whose tokens the requests carry
+        """
+
+        self.session = session
+        self.tokenManager = tokenManager
+
+    def request(self, method, url, **kwargs):
+        # Sessions given by the caller may only have get and post
+        send = getattr(self.session, method.lower(), None)
+        if send is None:
+            send = functools.partial(self.session.request, method)
+        r = send(url, **kwargs)
+        headers = kwargs.get('headers') or {}
+        stale = headers.get('Authorization')
+        if r.status_code != 401 or not stale:
+            return r
+
+        close = getattr(r, 'close', None)
+        if close is not None:
+            close()
+        kwargs['headers'] = dict(headers, Authorization=self.tokenManager.refresh(stale=stale))
+        return send(url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+
+class ThreadLocalSession(object):
+    def __init__(self, adapter, headers=None):
+        """
+        Session with the interface of a requests session that gives every thread its own
+        requests session, so cookies, headers and hooks are never shared between threads,
+        while all of them send through one adapter and its thread-safe connection pool.
+        Parameters:
+            adapter = requests HTTPAdapter mounted for http:// and https://
+            headers = default headers of every session
+        """
+
+        self.adapter = adapter
+        self.headers = dict(headers or {})
+        self._local = threading.local()
+        self._sessions = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            session.headers.update(self.headers)
+            session.mount('https://', self.adapter)
+            session.mount('http://', self.adapter)
+            with self._lock:
+                self._sessions.add(session)
+        return session
+
+    def request(self, method, url, **kwargs):
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.session.get(url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.session.post(url, **kwargs)
+
+    def close(self):
+        with self._lock:
+            sessions = list(self._sessions)
+        for session in sessions:
+            session.close()
+        self.adapter.close()
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+
+class ProxySession(object):
+    def __init__(self, address=PROXY_ADDRESS, poolSize=10):
+        """
+        Session with the get/post interface of a requests session that sends requests
+        for any appliance through a local proxy.CachingProxy, which holds the warm
+        connections, tokens and cached responses.
+        Parameters:
+            address = host:port the proxy listens on
+            poolSize = number of pooled connections to the proxy
+        """
+
+        self.address = address
+        self.session = ThreadLocalSession(requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=poolSize))
+
+    def request(self, method, url, headers=None, verify=None, **kwargs):
+        match = re.match(r'^https?://([^/]+)(.*)$', url)
+        if match is None:
+            raise ValueError('Can not send {url} through the proxy'.format(url=url))
+
+        headers = dict(headers or {})
+        headers[PROXY_HOST_HEADER] = match.group(1)
+        url = 'http://{address}{path}'.format(address=self.address, path=match.group(2) or '/')
+
+        return self.session.request(method, url, headers=headers, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def close(self):
+        self.session.close()
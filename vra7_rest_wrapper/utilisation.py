@@ -0,0 +1,192 @@
+#!/usr/bin/python
+from __future__ import print_function
+from __future__ import absolute_import
+
+from prettytable import PrettyTable
+
+from .helpers import entriesAsDict, iterPages, mapConcurrently
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Where the figures live in the extensionData of a reservation: (entry, key inside its values)
+FIGURES = {
+    'memoryReserved': ('reservationMemory', 'memoryReservedSizeMb'),
+    'memoryUsed': ('reservationMemory', 'memoryAllocatedSizeMb'),
+    'storageReserved': ('reservationStorages', 'storageReservedSizeGB'),
+    'storageUsed': ('reservationStorages', 'storageAllocatedSizeGB')
+}
+
+
+def _number(value):
+    if isinstance(value, dict):
+        value = value.get('value')
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _items(value):
+    # Memory is a single complex value, storages a list of them
+    if not isinstance(value, dict):
+        return []
+    if value.get('type') == 'multiple':
+        return value.get('items', [])
+    return [value]
+
+
+class ReservationUtilisation(object):
+    def __init__(self, client, maxWorkers=8, limit=100, limiter=None, figures=None):
+        """
+        Reserved against used memory and storage of every reservation, with totals per
+        business group and per compute resource. Reservations are paged and their
+        details fetched concurrently. Allocation changes with every machine provisioned
+        or destroyed without changing the version of a reservation, and the listing carries
+        no allocation figures, so refresh() fetches every reservation. Business groups are
+        re-listed on a full refresh or when a reservation names one not seen before.
+        Parameters:
+            client = ReservationClient
+            maxWorkers = maximum number of reservation details fetched at the same time
+            limit = The number of entries per page.
+            limiter = limiter.AdaptiveLimiter that sets the number of concurrent fetches
+                      instead of maxWorkers
+            figures = {figure: (entry, key)} overrides of FIGURES, for appliances that name
+                      the figures differently
+        """
+
+        self.client = client
+        self.maxWorkers = maxWorkers
+        self.limit = limit
+        self.limiter = limiter
+        self.figures = dict(FIGURES, **(figures or {}))
+        self.rows = {}
+        self.businessGroups = {}
+        self._columns = None
+
+    def extract(self, reservation):
+        """
+        Function that returns the utilisation row of a reservation.
+        Parameters:
+            reservation = reservation as returned by getReservation
+        """
+
+        entries = entriesAsDict((reservation.get('extensionData') or {}).get('entries', []),
+                                keys=set(entry for entry, _ in self.figures.values()) | {'computeResource'})
+        computeResource = (entries.get('computeResource') or [{}])[0] or {}
+
+        row = {
+            'id': reservation['id'],
+            'name': reservation.get('name'),
+            'businessGroupId': reservation.get('subTenantId'),
+            'computeResource': computeResource.get('label') or computeResource.get('id'),
+            'enabled': reservation.get('enabled', True)
+        }
+        for figure, (entry, key) in self.figures.items():
+            total = 0.0
+            for item in _items((entries.get(entry) or [None])[0]):
+                values = entriesAsDict((item.get('values') or {}).get('entries', []), keys=(key,))
+                total += sum(_number(value) for value in values.get(key, []))
+            row[figure] = total
+
+        return row
+
+    def refresh(self, full=False):
+        """
+        Page the reservations and fetch their details. Returns the number of reservations
+        fetched.
+        Parameters:
+            full = start over, also re-listing the business groups
+        """
+
+        url = 'https://{host}/reservation-service/api/reservations'.format(host=self.client.host)
+        listed = {reservation['id']: reservation
+                  for page in iterPages(self.client, url, limit=self.limit) for reservation in page.get('content', [])}
+
+        ids = list(listed)
+        details = mapConcurrently(lambda id: self.client.getReservation(id, show='json'), ids,
+                                  maxWorkers=self.maxWorkers, limiter=self.limiter)
+        self.rows = {id: self.extract(reservation) for id, reservation in zip(ids, details)}
+
+        groupIds = set(row['businessGroupId'] for row in self.rows.values()) - {None}
+        if full or not self.businessGroups or not groupIds <= set(self.businessGroups):
+            groupsUrl = 'https://{host}/identity/api/tenants/{tenant}/subtenants'.format(
+                host=self.client.host, tenant=self.client.tenant)
+            self.businessGroups = {group['id']: group['name'] for page in iterPages(self.client, groupsUrl, limit=self.limit)
+                                   for group in page.get('content', [])}
+
+        self._columns = None
+        return len(ids)
+
+    def columns(self):
+        """
+        Function that returns (rows, {figure: array}) with the figures of every reservation
+        as arrays in row order, numpy arrays when numpy is installed.
+        """
+
+        if self._columns is None:
+            rows = sorted(self.rows.values(), key=lambda row: row['name'] or '')
+            columns = {figure: [row[figure] for row in rows] for figure in self.figures}
+            if numpy is not None:
+                columns = {figure: numpy.asarray(values, dtype=float) for figure, values in columns.items()}
+            self._columns = rows, columns
+
+        return self._columns
+
+    def totals(self, by='businessGroup'):
+        """
+        Function that returns {group: {figure: total, 'reservations': count}}.
+        Parameters:
+            by = 'businessGroup' or 'computeResource'
+        """
+
+        rows, columns = self.columns()
+        if by == 'businessGroup':
+            keys = [self.businessGroups.get(row['businessGroupId'], row['businessGroupId']) for row in rows]
+        elif by == 'computeResource':
+            keys = [row['computeResource'] for row in rows]
+        else:
+            raise ValueError("by must be 'businessGroup' or 'computeResource'")
+
+        groups = sorted(set(keys), key=lambda key: (key is None, key))
+        position = {key: i for i, key in enumerate(groups)}
+        indexes = [position[key] for key in keys]
+
+        totals = {key: {'reservations': 0} for key in groups}
+        for index in indexes:
+            totals[groups[index]]['reservations'] += 1
+        for figure, values in columns.items():
+            if numpy is not None:
+                sums = numpy.bincount(numpy.asarray(indexes, dtype=int), weights=values, minlength=len(groups))
+            else:
+                sums = [0.0] * len(groups)
+                for index, value in zip(indexes, values):
+                    sums[index] += value
+            for key, total in zip(groups, sums):
+                totals[key][figure] = float(total)
+
+        return totals
+
+    def table(self, by='businessGroup'):
+        """
+        Function that returns the totals as a PrettyTable.
+        Parameters:
+            by = 'businessGroup' or 'computeResource'
+        """
+
+        def percent(used, reserved):
+            return '{0:.1f}%'.format(100.0 * used / reserved) if reserved else '-'
+
+        label = 'Business Group' if by == 'businessGroup' else 'Compute Resource'
+        table = PrettyTable([label, 'Reservations', 'Memory Reserved (MB)', 'Memory Used (MB)', 'Memory %',
+                             'Storage Reserved (GB)', 'Storage Used (GB)', 'Storage %'])
+        for key, total in sorted(self.totals(by).items(), key=lambda item: (item[0] is None, item[0])):
+            table.add_row([key, total['reservations'],
+                           '{0:.0f}'.format(total['memoryReserved']), '{0:.0f}'.format(total['memoryUsed']),
+                           percent(total['memoryUsed'], total['memoryReserved']),
+                           '{0:.0f}'.format(total['storageReserved']), '{0:.0f}'.format(total['storageUsed']),
+                           percent(total['storageUsed'], total['storageReserved'])])
+
+        return table
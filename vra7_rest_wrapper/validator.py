@@ -0,0 +1,290 @@
+#!/usr/bin/python
+from __future__ import print_function
+from __future__ import absolute_import
+
+# vRA primitive type ids and the python types their values may have
+PRIMITIVE_TYPES = {
+    'STRING': (str,),
+    'SECURE_STRING': (str,),
+    'DATE_TIME': (str,),
+    'INTEGER': (int,),
+    'DECIMAL': (int, float),
+    'BOOLEAN': (bool,)
+}
+LITERAL_TYPES = ('string', 'secureString', 'dateTime', 'integer', 'decimal', 'boolean')
+# requestData keys of form fields carry this prefix, the form field ids do not
+PROVIDER_PREFIX = 'provider-'
+
+
+def _literal(value):
+    # Entries carry typed literals, {"type": "string", "value": "x"}, and entity references
+    if isinstance(value, dict):
+        if value.get('type') in LITERAL_TYPES:
+            return value.get('value')
+        if value.get('type') == 'multiple':
+            return [_literal(item) for item in value.get('items', [])]
+    return value
+
+
+def _fieldId(key):
+    return key[len(PROVIDER_PREFIX):] if key.startswith(PROVIDER_PREFIX) else key
+
+
+def _hashable(value):
+    if isinstance(value, dict):
+        return value.get('id', value.get('componentId', repr(sorted(value.items()))))
+    if isinstance(value, list):
+        return tuple(_hashable(item) for item in value)
+    return value
+
+
+def _constant(facet):
+    # Only constant facets can be checked without asking vRA, expressions are skipped
+    value = facet.get('value') or {}
+    if value.get('type') == 'constantClause':
+        return True, _literal(value.get('value'))
+    return False, None
+
+
+def findFields(document):
+    """
+    Function that returns every field definition (a dict with an id and a dataType) in
+    a catalog item form or a reservation schema, in document order.
+    Parameters:
+        document = form, form section or list of schema fields
+    """
+
+    fields = []
+    stack = [document]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if 'id' in node and isinstance(node.get('dataType'), dict):
+                fields.append(node)
+            stack.extend(reversed(list(node.values())))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+
+    return fields
+
+
+def indexPayload(payload):
+    """
+    Function that returns {field id: value} for a request or reservation payload, from
+    its requestData/extensionData entries and its template style data section. Entry keys
+    are indexed without their provider- prefix, like the form field ids. Template fields
+    are indexed as component~field and by their dotted path.
+    Parameters:
+        payload = request or reservation payload
+    """
+
+    index = {}
+    for section in ('requestData', 'extensionData'):
+        for entry in (payload.get(section) or {}).get('entries', []):
+            index[_fieldId(entry['key'])] = _literal(entry.get('value'))
+
+    data = payload.get('data')
+    if isinstance(data, dict):
+        for name, value in data.items():
+            index[name] = value
+            index['data.' + name] = value
+            if isinstance(value, dict) and isinstance(value.get('data'), dict):
+                for field, fieldValue in value['data'].items():
+                    index['{0}~{1}'.format(name, field)] = fieldValue
+                    index['data.{0}.data.{1}'.format(name, field)] = fieldValue
+
+    for key, value in payload.items():
+        if key not in ('requestData', 'extensionData', 'data'):
+            index.setdefault(key, value)
+
+    return index
+
+
+class _Rule(object):
+    def __init__(self, field, defaults):
+        self.id = field['id']
+        self.key = _fieldId(self.id)
+        self.label = field.get('label') or self.id
+        dataType = field['dataType']
+        self.types = PRIMITIVE_TYPES.get(dataType.get('typeId')) if dataType.get('type') == 'primitive' else (dict,)
+        # Values of exactly these types are checked a column at a time
+        self.exact = frozenset(self.types) if self.types is not None and dict not in self.types else None
+        self.multiValued = field.get('isMultiValued', False)
+        self.mandatory = False
+        self.bounds = {}
+
+        for facet in (field.get('state') or {}).get('facets', []):
+            constant, value = _constant(facet)
+            if not constant:
+                continue
+            if facet.get('type') == 'mandatory':
+                self.mandatory = bool(value)
+            elif facet.get('type') in ('minValue', 'maxValue', 'minLength', 'maxLength'):
+                self.bounds[facet['type']] = value
+
+        # A mandatory field with a default on the form is filled in by vRA
+        if self.key in defaults:
+            self.mandatory = False
+
+        self.allowed = None
+        permissible = field.get('permissibleValues') or {}
+        if permissible.get('type') == 'static' and not permissible.get('customAllowed', False):
+            self.allowed = set(_hashable(_literal(value.get('underlyingValue'))) for value in permissible.get('values', []))
+
+    def check(self, value):
+        if value is None or value == '' or value == []:
+            return 'is required' if self.mandatory else None
+
+        values = value if isinstance(value, list) else [value]
+        if isinstance(value, list) and not self.multiValued:
+            return 'takes a single value'
+
+        for item in values:
+            if self.types is not None and (not isinstance(item, self.types) or
+                                           (isinstance(item, bool) and bool not in self.types)):
+                return 'must be of type {0}, got {1!r}'.format('/'.join(t.__name__ for t in self.types), item)
+            if self.allowed is not None and _hashable(item) not in self.allowed:
+                return '{0!r} is not one of the permitted values'.format(item)
+            if self.types is None or dict in self.types:
+                continue
+            if 'minValue' in self.bounds and item < self.bounds['minValue']:
+                return 'must be at least {0}'.format(self.bounds['minValue'])
+            if 'maxValue' in self.bounds and item > self.bounds['maxValue']:
+                return 'must be at most {0}'.format(self.bounds['maxValue'])
+            if 'minLength' in self.bounds and len(item) < self.bounds['minLength']:
+                return 'must be at least {0} characters'.format(self.bounds['minLength'])
+            if 'maxLength' in self.bounds and len(item) > self.bounds['maxLength']:
+                return 'must be at most {0} characters'.format(self.bounds['maxLength'])
+
+        return None
+
+    def checkColumn(self, column):
+        """
+        Function that returns [(position, message)] for the values of this field across payloads.
+        Scalars of a permitted type are matched against the permitted values and bounds a column
+        at a time; the values that fail, and anything else, are described by check.
+        Parameters:
+            column = list of values, None where a payload does not set the field
+        """
+
+        if self.exact is None:
+            suspects = set(range(len(column)))
+        else:
+            exact = self.exact
+            mandatory = self.mandatory
+            suspects = set(i for i, value in enumerate(column)
+                           if value == '' or type(value) not in exact and (value is not None or mandatory))
+            positions = [i for i, value in enumerate(column) if type(value) in exact and value != '']
+            values = [column[i] for i in positions]
+
+            allowed = self.allowed
+            if allowed is not None:
+                suspects.update(i for i, value in zip(positions, values) if value not in allowed)
+            bounds = self.bounds
+            if 'minValue' in bounds:
+                low = bounds['minValue']
+                suspects.update(i for i, value in zip(positions, values) if value < low)
+            if 'maxValue' in bounds:
+                high = bounds['maxValue']
+                suspects.update(i for i, value in zip(positions, values) if value > high)
+            if 'minLength' in bounds:
+                low = bounds['minLength']
+                suspects.update(i for i, value in zip(positions, values) if len(value) < low)
+            if 'maxLength' in bounds:
+                high = bounds['maxLength']
+                suspects.update(i for i, value in zip(positions, values) if len(value) > high)
+
+        failures = []
+        for i in sorted(suspects):
+            message = self.check(column[i])
+            if message is not None:
+                failures.append((i, message))
+
+        return failures
+
+
+class PayloadValidator(object):
+    def __init__(self, fields, defaults=None):
+        """
+        Checks request and reservation payloads locally, before they are submitted,
+        against the required fields, types, bounds and static permitted values of a
+        catalog item form or a reservation schema. Rules are compiled once, then the
+        payloads are indexed and each rule checks its field across all of them at once.
+        Parameters:
+            fields = field definitions, see findFields
+            defaults = field ids that have a default on the form
+        """
+
+        self.rules = [_Rule(field, set(_fieldId(key) for key in defaults or ())) for field in fields]
+
+    @classmethod
+    def forCatalogItem(cls, client, catalogItem):
+        """
+        Function that returns a validator for the request form of a catalog item.
+        Attach a metacache.MetadataCache to the client to keep the forms on disk.
+        Parameters:
+            client = ConsumerClient
+            catalogItem = catalog item as returned by getEntitledCatalogItemsAsDict
+        """
+
+        form = client.getCatalogItemForm(catalogItem)
+        details = client.getCatalogItemFormDetails(catalogItem)
+        defaults = [entry['key'] for entry in ((details or {}).get('values') or {}).get('entries', [])
+                    if _literal(entry.get('value')) not in (None, '')]
+
+        return cls(findFields(form), defaults)
+
+    @classmethod
+    def forReservation(cls, client, schemaclassid):
+        """
+        Function that returns a validator for the extension data of a reservation type.
+        Parameters:
+            client = ReservationClient
+            schemaclassid = schemaClassId of supported reservation Type. E.g Infrastructure.Reservation.Virtual.vSphere
+        """
+
+        return cls(findFields(client.getReservationSchema(schemaclassid)))
+
+    def validateMany(self, payloads):
+        """
+        Function that returns one list of error messages per payload, empty for valid payloads.
+        Parameters:
+            payloads = list of request or reservation payloads
+        """
+
+        indexes = [indexPayload(payload) for payload in payloads]
+        errors = [[] for _ in indexes]
+
+        for rule in self.rules:
+            for position, message in rule.checkColumn([index.get(rule.key) for index in indexes]):
+                errors[position].append('{0} ({1}) {2}'.format(rule.label, rule.id, message))
+
+        return errors
+
+    def validate(self, payload):
+        """
+        Function that returns the error messages of a payload, empty if it is valid.
+        """
+
+        index = indexPayload(payload)
+        errors = []
+        for rule in self.rules:
+            message = rule.check(index.get(rule.key))
+            if message is not None:
+                errors.append('{0} ({1}) {2}'.format(rule.label, rule.id, message))
+
+        return errors
+
+    def check(self, payloads):
+        """
+        Raise ValueError listing every problem if any of the payloads is invalid.
+        Parameters:
+            payloads = list of request or reservation payloads
+        """
+
+        errors = self.validateMany(payloads)
+        invalid = [i for i, messages in enumerate(errors) if messages]
+        if invalid:
+            raise ValueError('{0} of {1} payloads are invalid:\n{2}'.format(
+                len(invalid), len(payloads),
+                '\n'.join('payload {0}: {1}'.format(i, message) for i in invalid for message in errors[i])))
@@ -0,0 +1,120 @@
+#!/usr/bin/python
+from __future__ import print_function
+from __future__ import absolute_import
+import time
+from datetime import datetime, timedelta
+
+from .catalog import REQUEST_FINAL_STATES
+from .helpers import formatTimestamp, iterUpdated, parseTimestamp
+
+
+class RequestWatcher(object):
+    def __init__(self, client, interval=10, watermark=None, overlap=2, limit=100, allChanges=False):
+        """
+        Watches the requests of the tenant for state changes. Every poll is a single
+        delta query for requests updated since the high-water mark, paged by lastUpdated
+        rather than by page number so updates made while paging do not shift requests
+        past the pages already read.
+        Parameters:
+            client = ConsumerClient
+            interval = seconds between polls
+            watermark = lastUpdated timestamp (or naive UTC datetime) to start from. if this
+                        is None only changes from now on are reported
+            overlap = seconds the delta query reaches back behind the watermark so that
+                      updates committed out of order are not missed. repeats are dropped
+            limit = The number of entries per page.
+            allChanges = also report updates that did not change the state
+        """
+
+        if watermark is None:
+            watermark = datetime.utcnow()
+        elif not isinstance(watermark, datetime):
+            watermark = parseTimestamp(watermark)
+        # Watermarks are compared as strings, so they all have the format of formatTimestamp
+        watermark = formatTimestamp(watermark)
+
+        self.client = client
+        self.interval = interval
+        self.watermark = watermark
+        self.overlap = timedelta(seconds=overlap)
+        self.limit = limit
+        self.allChanges = allChanges
+        self._states = {}
+        self._seen = {}
+
+    def poll(self):
+        """
+        Function that runs one delta query and returns the new state transition events.
+        An event is a dict with id, requestNumber, previousState, state, lastUpdated and request.
+        """
+
+        events = []
+        watermark = self.watermark
+        url = 'https://{host}/catalog-service/api/consumer/requests'.format(host=self.client.host)
+        since = formatTimestamp(parseTimestamp(self.watermark) - self.overlap)
+
+        for request in iterUpdated(self.client, url, since, limit=self.limit):
+            lastUpdated = request.get('lastUpdated')
+            lastUpdated = formatTimestamp(parseTimestamp(lastUpdated)) if lastUpdated else watermark
+            if self._seen.get(request['id']) == lastUpdated:
+                continue
+            self._seen[request['id']] = lastUpdated
+            if lastUpdated > watermark:
+                watermark = lastUpdated
+
+            previousState = self._states.get(request['id'])
+            if request['state'] in REQUEST_FINAL_STATES:
+                self._states.pop(request['id'], None)
+            else:
+                self._states[request['id']] = request['state']
+            if previousState == request['state'] and not self.allChanges:
+                continue
+
+            events.append({
+                'id': request['id'],
+                'requestNumber': request.get('requestNumber'),
+                'previousState': previousState,
+                'state': request['state'],
+                'lastUpdated': lastUpdated,
+                'request': request
+            })
+
+        self.watermark = watermark
+        self._prune()
+
+        return events
+
+    def _prune(self):
+        # Only updates inside the overlap window can be returned again
+        horizon = formatTimestamp(parseTimestamp(self.watermark) - self.overlap)
+        for id, lastUpdated in list(self._seen.items()):
+            if lastUpdated < horizon:
+                del self._seen[id]
+
+    def watch(self, stop=None):
+        """
+        Generator that polls every interval and yields state transition events.
+        Parameters:
+            stop = threading.Event that ends the watch when set
+        """
+
+        while stop is None or not stop.is_set():
+            started = time.time()
+            for event in self.poll():
+                yield event
+            wait = max(0, self.interval - (time.time() - started))
+            if stop is None:
+                time.sleep(wait)
+            else:
+                stop.wait(wait)
+
+    def run(self, callback, stop=None):
+        """
+        Poll every interval and call callback(event) for every state transition.
+        Parameters:
+            callback = callable taking an event
+            stop = threading.Event that ends the watch when set
+        """
+
+        for event in self.watch(stop=stop):
+            callback(event)